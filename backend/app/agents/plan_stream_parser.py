@@ -0,0 +1,201 @@
+"""行程规划流式输出解析 - 在LLM逐token输出的过程中识别并校验已完整输出的行程片段"""
+
+import json
+from typing import List, Dict, Any, Optional
+from ..models.schemas import DayPlan, WeatherInfo
+
+
+# 代码块标记: 出现时从标记之后开始寻找根对象
+JSON_FENCE = "```json"
+# 行程计划根对象的字段,闭合的"根对象"不含其中任何字段时视为说明文字中的括号
+PLAN_FIELDS = {"city", "start_date", "end_date", "days", "weather_info", "overall_suggestions", "budget"}
+
+
+class PlanStreamParser:
+    """
+    增量JSON扫描器
+
+    逐块接收行程规划Agent的输出文本,跟踪JSON的嵌套结构(忽略字符串内的括号):
+    - 根对象下 "days" 数组中的元素对象闭合时,立即校验为DayPlan
+    - 根对象下 "weather_info" 数组中的元素对象闭合时,立即校验为WeatherInfo
+    - 根对象的字符串字段(city、overall_suggestions等)和对象字段(budget)闭合时记录下来
+
+    每个片段独立解析,某一片段无效或输出尾部被截断时,之前已闭合的有效片段全部保留。
+    根对象之前的说明文字、代码块标记等会被自动跳过: 有 ```json 代码块时从代码块内开始扫描,
+    说明文字中的括号(如 "{city}")闭合后若不含任何行程字段,则丢弃并继续寻找根对象。
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0                        # 已扫描的字符数
+        self._fenced = False                 # 是否已跳到代码块内
+        self.invalid_count = 0               # 校验失败被丢弃的片段数
+        self._reset_root()
+
+    def _reset_root(self):
+        """清空根对象的扫描状态(说明文字中的括号被误当作根对象时重新开始)"""
+        self._started = False                # 是否已进入根对象
+        self._finished = False               # 根对象是否已闭合
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        # 容器栈: 每项为 [类型('{'或'['), 起始位置, 该容器在父对象中的键]
+        self._stack: List[list] = []
+        self._pending_key: Optional[str] = None
+
+        self.days: List[DayPlan] = []
+        self.weather_info: List[WeatherInfo] = []
+        self.fields: Dict[str, Any] = {}     # 根对象中已闭合的其他字段
+
+    @property
+    def text(self) -> str:
+        """已接收的全部文本"""
+        return self._text
+
+    @property
+    def finished(self) -> bool:
+        """根对象是否已完整输出"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[DayPlan]:
+        """
+        输入一段新的输出文本
+
+        Args:
+            chunk: LLM输出的文本片段
+
+        Returns:
+            本次新闭合并通过校验的每日行程列表
+        """
+        if not chunk:
+            return []
+
+        self._text += chunk
+        text = self._text
+
+        days: List[DayPlan] = []
+        while self._pos < len(text) and not self._finished:
+            ch = text[self._pos]
+            index = self._pos
+            self._pos += 1
+
+            if not self._started:
+                if not self._fenced:
+                    # 已收到代码块标记时直接跳到代码块内
+                    fence = text.find(JSON_FENCE, index)
+                    if fence >= 0:
+                        self._fenced = True
+                        self._pos = fence + len(JSON_FENCE)
+                        continue
+                if ch == "{":
+                    self._started = True
+                    self._stack.append(["{", index, None])
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:index]
+                    self._on_string_closed()
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = index + 1
+            elif ch == ":":
+                # 对象中冒号前的字符串即为键
+                self._pending_key = self._last_string
+            elif ch in "{[":
+                key = self._pending_key if self._stack[-1][0] == "{" else None
+                self._stack.append([ch, index, key])
+                self._pending_key = None
+            elif ch in "}]":
+                container_type, start, key = self._stack.pop()
+                self._pending_key = None
+                if container_type == "{":
+                    day = self._on_object_closed(text[start:index + 1], key)
+                    if day is not None:
+                        days.append(day)
+                if not self._stack:
+                    if self._is_plan_root():
+                        self._finished = True
+                    else:
+                        self._reset_root()
+            elif ch == ",":
+                self._pending_key = None
+
+        return days
+
+    def _is_plan_root(self) -> bool:
+        """闭合的根对象是否为行程计划(含每日行程或任一行程字段)"""
+        return bool(self.days or self.weather_info or PLAN_FIELDS.intersection(self.fields))
+
+    def _on_string_closed(self):
+        """根对象中键后的字符串值(如city、overall_suggestions)"""
+        if len(self._stack) != 1 or self._pending_key is None:
+            return
+        try:
+            self.fields[self._pending_key] = json.loads(f'"{self._last_string}"')
+        except json.JSONDecodeError:
+            pass
+        self._pending_key = None
+
+    def _on_object_closed(self, fragment: str, key: Optional[str]) -> Optional[DayPlan]:
+        """
+        处理刚闭合的对象
+
+        Returns:
+            若为通过校验的每日行程则返回DayPlan,否则返回None
+        """
+        if not self._stack:
+            return None
+
+        # 根对象的对象字段,如 budget
+        if len(self._stack) == 1:
+            data = self._load(fragment)
+            if data is not None and key:
+                self.fields[key] = data
+            return None
+
+        array_key = self._root_array_key()
+        if array_key == "days":
+            day = self._validate(fragment, DayPlan)
+            if day is not None:
+                self.days.append(day)
+            return day
+        if array_key == "weather_info":
+            weather = self._validate(fragment, WeatherInfo)
+            if weather is not None:
+                self.weather_info.append(weather)
+        return None
+
+    def _root_array_key(self) -> Optional[str]:
+        """刚闭合的对象若为根对象某个数组的直接元素,返回该数组的键"""
+        if len(self._stack) == 2 and self._stack[1][0] == "[":
+            return self._stack[1][2]
+        return None
+
+    def _validate(self, fragment: str, model):
+        """解析并校验单个片段,失败时返回None"""
+        data = self._load(fragment)
+        if data is not None:
+            try:
+                return model(**data)
+            except Exception as e:
+                print(f"⚠️  丢弃无效的{model.__name__}片段: {str(e)}")
+        self.invalid_count += 1
+        return None
+
+    @staticmethod
+    def _load(fragment: str) -> Optional[Dict[str, Any]]:
+        """解析单个对象片段,失败时返回None"""
+        try:
+            data = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) else None
@@ -1,13 +1,33 @@
 """多智能体旅行规划系统 - 基于LangChain框架"""
 
-import json
-from typing import Dict, Any, List
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Awaitable, Optional, AsyncIterator, Tuple, Callable
 from langchain_classic.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from ..services.llm_service import get_llm_nvidia
-from ..services.langchain_tools import get_amap_tools
+from ..services.langchain_tools import get_amap_tools, get_projected_tools, call_tool
+from ..services.plan_cache import get_plan_cache
+from ..services.poi_utils import extract_pois, merge_poi_results
+from ..services.poi_index import get_poi_index
+from ..services.city_snapshot import KIND_ATTRACTION, KIND_HOTEL, get_snapshot_store
+from ..services.itinerary_optimizer import optimize_itinerary
+from ..services.distance_service import get_distance_service
+from ..services.budget_service import compute_budget
+from ..services.metrics import llm_config, record_agent_iterations, record_stage
+from ..services.tool_projection import PoiRecord, parse_poi_table, project_pois, project_tool_output, render_poi_table
 from ..models.schemas import TripRequest, TripPlan, DayPlan, Attraction, Meal, WeatherInfo, Location, Hotel
 from ..config import get_settings
+from .plan_stream_parser import PlanStreamParser
+
+# ============ 检索模式 ============
+
+# agent: 由LLM工具调用Agent决定如何调用高德工具
+# direct: 参数已由TripRequest确定,直接调用高德工具,LLM只用于最终行程规划
+RETRIEVAL_MODE_AGENT = "agent"
+RETRIEVAL_MODE_DIRECT = "direct"
+RETRIEVAL_MODES = (RETRIEVAL_MODE_AGENT, RETRIEVAL_MODE_DIRECT)
 
 # ============ Agent提示词 ============
 
@@ -125,14 +145,7 @@ PLANNER_AGENT_PROMPT = """你是行程规划专家。你的任务是根据景点
       "wind_power": "1-3级"
     }}
   ],
-  "overall_suggestions": "总体建议",
-  "budget": {{
-    "total_attractions": 180,
-    "total_hotels": 1200,
-    "total_meals": 480,
-    "total_transportation": 200,
-    "total": 2060
-  }}
+  "overall_suggestions": "总体建议"
 }}
 ```
 
@@ -143,18 +156,29 @@ PLANNER_AGENT_PROMPT = """你是行程规划专家。你的任务是根据景点
 4. 考虑景点之间的距离和游览时间
 5. 每天必须包含早中晚三餐
 6. 提供实用的旅行建议
-7. **必须包含预算信息**:
+7. **必须包含费用信息**:
    - 景点门票价格(ticket_price)
    - 餐饮预估费用(estimated_cost)
    - 酒店预估费用(estimated_cost)
-   - 预算汇总(budget)包含各项总费用
+   - 不需要输出预算汇总,系统会根据以上各项费用自动计算
 """
 
 
 class MultiAgentTripPlanner:
     """多智能体旅行规划系统"""
 
-    def __init__(self):
+    def __init__(self, retrieval_mode: Optional[str] = None):
+        """
+        初始化
+
+        Args:
+            retrieval_mode: 检索模式(agent/direct),默认读取配置
+        """
+        mode = retrieval_mode or get_settings().retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"不支持的检索模式: {mode},可选: {', '.join(RETRIEVAL_MODES)}")
+
+        self.retrieval_mode = mode
         self.llm = None
         self.amap_tools = []
         self.attraction_agent = None
@@ -174,26 +198,31 @@ class MultiAgentTripPlanner:
             print("  - 创建共享工具...")
             self.amap_tools = await get_amap_tools()
 
-            # 创建景点搜索Agent
-            print("  - 创建景点搜索Agent...")
-            self.attraction_agent = self._create_agent(
-                ATTRACTION_AGENT_PROMPT,
-                self.amap_tools
-            )
-
-            # 创建天气查询Agent
-            print("  - 创建天气查询Agent...")
-            self.weather_agent = self._create_agent(
-                WEATHER_AGENT_PROMPT,
-                self.amap_tools
-            )
-
-            # 创建酒店推荐Agent
-            print("  - 创建酒店推荐Agent...")
-            self.hotel_agent = self._create_agent(
-                HOTEL_AGENT_PROMPT,
-                self.amap_tools
-            )
+            # direct模式下检索阶段直接调用工具,无需创建检索Agent
+            if self.retrieval_mode == RETRIEVAL_MODE_AGENT:
+                # 检索Agent使用输出经过精简的工具副本,减少提示词token
+                agent_tools = get_projected_tools(self.amap_tools)
+
+                # 创建景点搜索Agent
+                print("  - 创建景点搜索Agent...")
+                self.attraction_agent = self._create_agent(
+                    ATTRACTION_AGENT_PROMPT,
+                    agent_tools
+                )
+
+                # 创建天气查询Agent
+                print("  - 创建天气查询Agent...")
+                self.weather_agent = self._create_agent(
+                    WEATHER_AGENT_PROMPT,
+                    agent_tools
+                )
+
+                # 创建酒店推荐Agent
+                print("  - 创建酒店推荐Agent...")
+                self.hotel_agent = self._create_agent(
+                    HOTEL_AGENT_PROMPT,
+                    agent_tools
+                )
 
             # 创建行程规划Agent(不需要工具)
             print("  - 创建行程规划Agent...")
@@ -203,9 +232,13 @@ class MultiAgentTripPlanner:
             )
 
             print(f"✅ 多智能体系统初始化成功")
-            print(f"   景点搜索Agent: {len(self.amap_tools)} 个工具")
-            print(f"   天气查询Agent: {len(self.amap_tools)} 个工具")
-            print(f"   酒店推荐Agent: {len(self.amap_tools)} 个工具")
+            print(f"   检索模式: {self.retrieval_mode}")
+            if self.retrieval_mode == RETRIEVAL_MODE_AGENT:
+                print(f"   景点搜索Agent: {len(self.amap_tools)} 个工具")
+                print(f"   天气查询Agent: {len(self.amap_tools)} 个工具")
+                print(f"   酒店推荐Agent: {len(self.amap_tools)} 个工具")
+            else:
+                print(f"   景点/天气/酒店: 直接调用高德工具")
             print(f"   行程规划Agent: 0 个工具")
 
         except Exception as e:
@@ -246,7 +279,8 @@ class MultiAgentTripPlanner:
                 tools=tools,
                 verbose=True,
                 handle_parsing_errors=True,  # 依然建议开启，防止偶发的模型抽风
-                max_iterations=10  # Tool calling 可能会有多步，稍微调大一点
+                max_iterations=10,  # Tool calling 可能会有多步，稍微调大一点
+                return_intermediate_steps=True  # 用于统计工具调用轮数
             )
 
             return agent_executor
@@ -272,10 +306,15 @@ class MultiAgentTripPlanner:
                     return self._format_output(result)
 
                 # 添加 ainvoke 支持
-                async def ainvoke(self, input_data):
-                    result = await self.chain.ainvoke(input_data)
+                async def ainvoke(self, input_data, config=None):
+                    result = await self.chain.ainvoke(input_data, config=config)
                     return self._format_output(result)
 
+                # 流式输出,逐块返回LLM生成的文本
+                async def astream(self, input_data, config=None):
+                    async for chunk in self.chain.astream(input_data, config=config):
+                        yield chunk
+
                 def _format_output(self, result):
                     if isinstance(result, dict):
                         return result
@@ -293,6 +332,13 @@ class MultiAgentTripPlanner:
         Returns:
             旅行计划
         """
+        plan_cache = get_plan_cache()
+        if plan_cache is not None:
+            cached_plan = await plan_cache.get(request)
+            if cached_plan is not None:
+                print(f"⚡ 命中旅行计划缓存: {request.city} {request.travel_days}天")
+                return cached_plan
+
         try:
             print(f"\n{'='*60}")
             print(f"🚀 开始多智能体协作规划旅行...")
@@ -302,36 +348,26 @@ class MultiAgentTripPlanner:
             print(f"偏好: {', '.join(request.preferences) if request.preferences else '无'}")
             print(f"{'='*60}\n")
 
-            # 步骤1: 景点搜索Agent搜索景点
-            print("📍 步骤1: 搜索景点...")
-            attraction_query = self._build_attraction_query(request)
-            attraction_response =await self.attraction_agent.ainvoke({"input": attraction_query})
-            attraction_result = attraction_response.get("output", str(attraction_response))
-            print(f"景点搜索结果: {attraction_result}...\n")
-
-            # 步骤2: 天气查询Agent查询天气
-            print("🌤️  步骤2: 查询天气...")
-            weather_query = f"请查询{request.city}从{request.start_date} 至 {request.end_date}的天气信息"
-            weather_response =await self.weather_agent.ainvoke({"input": weather_query})
-            weather_result = weather_response.get("output", str(weather_response))
-            print(f"天气查询结果: {weather_result}...\n")
-
-            # 步骤3: 酒店推荐Agent搜索酒店
-            print("🏨 步骤3: 搜索酒店...")
-            hotel_query = f"请搜索{request.city}的{request.accommodation}酒店"
-            hotel_response =await self.hotel_agent.ainvoke({"input": hotel_query})
-            hotel_result = hotel_response.get("output", str(hotel_response))
-            print(f"酒店搜索结果: {hotel_result}...\n")
-
-            # 步骤4: 行程规划Agent整合信息生成计划
+            timings: Dict[str, float] = {}
+            degraded: List[str] = []
+            pipeline_start = time.perf_counter()
+
+            # 步骤1-3: 景点/天气/酒店三个检索阶段互不依赖,并行执行
+            print("📍🌤️🏨 步骤1-3: 并行搜索景点、查询天气、搜索酒店...")
+            attraction_result, weather_result, hotel_result = await self._retrieve(request, timings, degraded)
+            timings["retrieval"] = time.perf_counter() - pipeline_start
+
+            # 步骤4: 行程规划Agent整合信息生成计划(依赖前三个阶段的结果)
             print("📋 步骤4: 生成行程计划...")
-            planner_query = self._build_planner_query(request, attraction_result, weather_result, hotel_result)
-            planner_response =await self.planner_agent.ainvoke({"input": planner_query})
-            planner_result = planner_response.get("output", str(planner_response))
-            print(f"行程规划结果: {planner_result}...\n")
+            planner_start = time.perf_counter()
+            trip_plan = await self._generate_plan(
+                request, attraction_result, weather_result, hotel_result, degraded=degraded
+            )
+            timings["planner"] = time.perf_counter() - planner_start
+            timings["total"] = time.perf_counter() - pipeline_start
+            self._report_stage_timings(timings)
 
-            # 解析最终计划
-            trip_plan = self._parse_response(planner_result, request)
+            await self._cache_plan(plan_cache, request, trip_plan, degraded)
 
             print(f"{'='*60}")
             print(f"✅ 旅行计划生成完成!")
@@ -345,16 +381,687 @@ class MultiAgentTripPlanner:
             traceback.print_exc()
             return self._create_fallback_plan(request)
     
+    async def plan_trip_stream(self, request: TripRequest) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成旅行计划
+
+        先推送各阶段进度,行程规划阶段使用LLM的token流,
+        每当输出中出现一个完整的每日行程对象就立即推送该天的DayPlan,
+        最后推送完整的TripPlan。
+
+        Args:
+            request: 旅行请求
+
+        Yields:
+            事件字典 {"event": 事件类型, "data": 事件数据}
+            事件类型: stage(阶段进度) / day(单日行程) / plan(完整计划)
+        """
+        plan_cache = get_plan_cache()
+        if plan_cache is not None:
+            cached_plan = await plan_cache.get(request)
+            if cached_plan is not None:
+                print(f"⚡ 命中旅行计划缓存: {request.city} {request.travel_days}天")
+                yield self._stage_event("cache", "completed", "已找到相同需求的旅行计划")
+                for day in cached_plan.days:
+                    yield {"event": "day", "data": day.model_dump()}
+                yield {"event": "plan", "data": cached_plan.model_dump()}
+                return
+
+        try:
+            print(f"\n{'='*60}")
+            print(f"🚀 开始流式规划旅行: {request.city} {request.travel_days}天")
+            print(f"{'='*60}\n")
+
+            timings: Dict[str, float] = {}
+            degraded: List[str] = []
+            pipeline_start = time.perf_counter()
+
+            yield self._stage_event("retrieval", "started", "正在搜索景点、查询天气、搜索酒店...")
+            attraction_result, weather_result, hotel_result = await self._retrieve(request, timings, degraded)
+            timings["retrieval"] = time.perf_counter() - pipeline_start
+            yield self._stage_event("retrieval", "completed", "景点、天气、酒店信息检索完成")
+
+            yield self._stage_event("planner", "started", "正在生成行程计划...")
+            planner_start = time.perf_counter()
+
+            # 规划在后台任务中进行,每完成一天就经由队列推送出去
+            day_queue: asyncio.Queue = asyncio.Queue()
+            planner_task = asyncio.ensure_future(self._generate_plan(
+                request, attraction_result, weather_result, hotel_result,
+                on_day=day_queue.put_nowait, degraded=degraded
+            ))
+            planner_task.add_done_callback(lambda _: day_queue.put_nowait(None))
+            try:
+                while True:
+                    day = await day_queue.get()
+                    if day is None:
+                        break
+                    print(f"📤 推送第{day.day_index + 1}天行程 ({time.perf_counter() - pipeline_start:.2f}s)")
+                    yield {"event": "day", "data": day.model_dump()}
+                trip_plan = await planner_task
+            finally:
+                if not planner_task.done():
+                    planner_task.cancel()
+            timings["planner"] = time.perf_counter() - planner_start
+            yield self._stage_event("planner", "completed", "行程计划生成完成")
+
+            timings["total"] = time.perf_counter() - pipeline_start
+            self._report_stage_timings(timings)
+
+            await self._cache_plan(plan_cache, request, trip_plan, degraded)
+
+        except Exception as e:
+            print(f"❌ 流式生成旅行计划失败: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            trip_plan = self._create_fallback_plan(request)
+
+        yield {"event": "plan", "data": trip_plan.model_dump()}
+
+    async def _generate_plan(
+        self,
+        request: TripRequest,
+        attractions: str,
+        weather: str,
+        hotels: str,
+        on_day: Optional[Callable[[DayPlan], None]] = None,
+        degraded: Optional[List[str]] = None
+    ) -> TripPlan:
+        """
+        行程规划阶段
+
+        行程天数不超过阈值时一次生成完整计划;更长的行程先把景点分配到各天,
+        再按时间窗口(若干天)并行调用行程规划Agent,最后合并为一个计划。
+
+        Args:
+            request: 旅行请求
+            attractions: 景点检索结果
+            weather: 天气检索结果
+            hotels: 酒店检索结果
+            on_day: 每完成一天行程时的回调(用于流式推送)
+            degraded: 降级原因记录,输出被截断或有时间窗口使用备用行程时原地追加
+
+        Returns:
+            旅行计划
+
+        Raises:
+            ValueError: 没有生成任何有效的每日行程
+        """
+        settings = get_settings()
+        if degraded is None:
+            degraded = []
+        # 景点为表格时先在本地确定每天去哪些景点及顺序,LLM只负责描述
+        skeleton = self._build_skeleton(attractions, request.travel_days)
+        day_hotels = self._suggest_hotels(skeleton, hotels, request.city) if skeleton else []
+
+        if request.travel_days <= settings.planner_chunk_threshold_days:
+            day_attractions = self._render_skeleton(skeleton, 0, day_hotels) if skeleton else attractions
+            planner_query = self._build_planner_query(request, day_attractions, weather, hotels)
+            parser = await self._run_planner(planner_query, on_day)
+            print(f"行程规划结果: {parser.text}...\n")
+            trip_plan = self._build_plan(parser, request)
+            if not parser.finished or len(trip_plan.days) < request.travel_days:
+                degraded.append("planner_incomplete")
+            trip_plan.budget = compute_budget(trip_plan)
+            return trip_plan
+
+        windows = self._split_windows(request.travel_days, settings.planner_window_days)
+        # 无法确定骨架时(如Agent模式下的自由文本)各窗口共用完整的景点结果
+        window_attractions = [
+            self._render_skeleton(skeleton[start:start + days], start, day_hotels[start:start + days])
+            if skeleton else attractions
+            for start, days in windows
+        ]
+        print(f"   行程较长,分为 {len(windows)} 个时间窗口并行规划: {[days for _, days in windows]}")
+
+        window_plans = await asyncio.gather(*[
+            self._plan_window(request, start, days, window_attractions[i], weather, hotels, on_day)
+            for i, (start, days) in enumerate(windows)
+        ])
+        trip_plan = self._merge_window_plans(request, windows, window_plans, degraded)
+        trip_plan.budget = compute_budget(trip_plan)
+        return trip_plan
+
+    async def _run_planner(
+        self,
+        planner_query: str,
+        on_day: Optional[Callable[[DayPlan], None]] = None
+    ) -> PlanStreamParser:
+        """
+        调用行程规划Agent并消费其token流
+
+        每个DayPlan/WeatherInfo闭合时即完成校验
+
+        Args:
+            planner_query: 规划查询
+            on_day: 每完成一天行程时的回调
+
+        Returns:
+            已输入完整输出的解析器
+        """
+        parser = PlanStreamParser()
+        config = llm_config("planner")
+        async for chunk in self.planner_agent.astream({"input": planner_query}, config=config):
+            for day in parser.feed(chunk):
+                # 用真实距离覆盖LLM编写的酒店距离描述
+                get_distance_service().annotate_day(day)
+                if on_day is not None:
+                    on_day(day)
+        return parser
+
+    async def _plan_window(
+        self,
+        request: TripRequest,
+        start: int,
+        days: int,
+        attractions: str,
+        weather: str,
+        hotels: str,
+        on_day: Optional[Callable[[DayPlan], None]] = None
+    ) -> Optional[TripPlan]:
+        """
+        规划单个时间窗口
+
+        Args:
+            request: 完整行程的旅行请求
+            start: 窗口第一天在完整行程中的序号(从0开始)
+            days: 窗口天数
+            attractions: 分配给该窗口的景点信息
+            weather: 天气检索结果
+            hotels: 酒店检索结果
+            on_day: 每完成一天行程时的回调,传入的DayPlan已换算为完整行程中的序号和日期
+
+        Returns:
+            窗口计划,失败时返回None
+        """
+        window_request = request.model_copy(update={
+            "start_date": self._day_date(request, start),
+            "end_date": self._day_date(request, start + days - 1),
+            "travel_days": days,
+        })
+        planner_query = self._build_planner_query(window_request, attractions, weather, hotels)
+        planner_query += (
+            f"\n**说明:** 这是{request.travel_days}天完整行程中的第{start + 1}-{start + days}天,"
+            f"只需规划这{days}天,不要安排其他时间窗口的景点。"
+        )
+
+        emitted = 0
+
+        def on_window_day(day: DayPlan):
+            nonlocal emitted
+            # 模型多输出的天数属于其他窗口,不推送(合并时同样按窗口天数截断)
+            if emitted >= days:
+                return
+            self._place_day(day, request, start + emitted)
+            emitted += 1
+            if on_day is not None:
+                on_day(day)
+
+        try:
+            parser = await self._run_planner(planner_query, on_window_day)
+            return self._build_plan(parser, window_request)
+        except Exception as e:
+            print(f"⚠️  第{start + 1}-{start + days}天规划失败: {str(e)}")
+            return None
+
+    def _split_windows(self, travel_days: int, window_days: int) -> List[Tuple[int, int]]:
+        """将行程天数切分为若干时间窗口,返回 [(起始序号, 天数), ...]"""
+        window_days = max(window_days, 1)
+        return [
+            (start, min(window_days, travel_days - start))
+            for start in range(0, travel_days, window_days)
+        ]
+
+    def _build_skeleton(self, attractions: str, travel_days: int) -> Optional[List[List[PoiRecord]]]:
+        """
+        生成每日景点骨架: 按地理位置把候选景点聚类到各天,并确定每天的游览顺序
+
+        Args:
+            attractions: 景点检索结果
+            travel_days: 旅行天数
+
+        Returns:
+            每天的景点列表(已按游览顺序排列),景点结果不是带坐标的表格时返回None
+        """
+        records = [r for r in parse_poi_table(attractions) if r.lng is not None and r.lat is not None]
+        if not records:
+            return None
+
+        # 检索结果已按相关度排序,只保留排在前面的候选
+        records = records[:travel_days * get_settings().attractions_per_day]
+        start = time.perf_counter()
+        days = optimize_itinerary(
+            [Location(longitude=r.lng, latitude=r.lat) for r in records],
+            travel_days
+        )
+        print(f"   行程地理优化: {len(records)} 个景点 -> {travel_days} 天 ({(time.perf_counter() - start) * 1000:.1f}ms)")
+        return [[records[i] for i in day] for day in days]
+
+    def _suggest_hotels(
+        self,
+        skeleton: List[List[PoiRecord]],
+        hotels: str,
+        city: str
+    ) -> List[Optional[Tuple[PoiRecord, float]]]:
+        """
+        为每天挑选离当日景点平均距离最近的酒店
+
+        候选为本次酒店检索结果,加上POI空间索引中离当日景点中心最近的同类酒店
+        (之前的请求中见过的酒店,不额外调用高德)。
+
+        Args:
+            skeleton: 每日景点骨架
+            hotels: 酒店检索结果
+            city: 城市
+
+        Returns:
+            每天的 (酒店, 平均距离公里) ,无法挑选时为None
+        """
+        searched = [r for r in parse_poi_table(hotels) if r.lng is not None and r.lat is not None]
+        poi_index = get_poi_index()
+        if not searched and poi_index is None:
+            return [None for _ in skeleton]
+
+        # 索引中只取与本次检索结果同类型的酒店(如都是"经济型连锁酒店"),检索结果无类型时取全部住宿
+        hotel_types = {r.type for r in searched if r.type} or {"住宿服务"}
+        k = get_settings().hotel_candidates_per_day
+
+        distance_service = get_distance_service()
+        suggestions = []
+        for records in skeleton:
+            if not records:
+                suggestions.append(None)
+                continue
+
+            locations = [Location(longitude=r.lng, latitude=r.lat) for r in records]
+            candidates = list(searched)
+            if poi_index is not None:
+                centroid = Location(
+                    longitude=sum(l.longitude for l in locations) / len(locations),
+                    latitude=sum(l.latitude for l in locations) / len(locations)
+                )
+                known = {r.id or r.name for r in candidates}
+                for record, _ in poi_index.nearest(city, centroid, k=k, poi_types=hotel_types):
+                    if (record.id or record.name) not in known:
+                        candidates.append(record)
+            if not candidates:
+                suggestions.append(None)
+                continue
+
+            distances = distance_service.matrix(
+                [Location(longitude=r.lng, latitude=r.lat) for r in candidates],
+                locations
+            ).mean(axis=1)
+            best = int(distances.argmin())
+            suggestions.append((candidates[best], float(distances[best])))
+        return suggestions
+
+    def _render_skeleton(
+        self,
+        day_records: List[List[PoiRecord]],
+        start: int,
+        day_hotels: Optional[List[Optional[Tuple[PoiRecord, float]]]] = None
+    ) -> str:
+        """
+        将每日景点骨架渲染为提示词文本
+
+        Args:
+            day_records: 各天的景点列表
+            start: 第一天在完整行程中的序号(从0开始)
+            day_hotels: 各天建议的酒店及其到当日景点的平均距离
+        """
+        lines = ["以下景点已按地理位置分配到各天并排好游览顺序,请按此安排每天的景点及先后顺序,不要调整:"]
+        for offset, records in enumerate(day_records):
+            if records:
+                lines.append(f"第{start + offset + 1}天:")
+                lines.append(render_poi_table(records))
+            else:
+                lines.append(f"第{start + offset + 1}天: 无候选景点,可根据城市特色自行安排")
+
+            suggestion = day_hotels[offset] if day_hotels and offset < len(day_hotels) else None
+            if suggestion is not None:
+                hotel, distance = suggestion
+                lines.append(
+                    f"建议住宿: {hotel.name}(地址: {hotel.address or '未知'}, 坐标: {hotel.lng},{hotel.lat}, "
+                    f"距当日景点平均{distance:.1f}公里)"
+                )
+        return "\n".join(lines)
+
+    def _merge_window_plans(
+        self,
+        request: TripRequest,
+        windows: List[Tuple[int, int]],
+        window_plans: List[Optional[TripPlan]],
+        degraded: Optional[List[str]] = None
+    ) -> TripPlan:
+        """
+        合并各时间窗口的计划
+
+        每日行程按窗口顺序拼接并统一day_index和日期,天气按日期去重;
+        失败的窗口使用备用行程占位,保证天数完整(并在degraded中记录)。
+
+        Raises:
+            ValueError: 所有窗口均失败
+        """
+        if not any(window_plans):
+            raise ValueError("所有时间窗口均未生成有效的每日行程")
+
+        fallback = self._create_fallback_plan(request)
+        days: List[DayPlan] = []
+        weather_by_date: Dict[str, WeatherInfo] = {}
+        suggestions = ""
+
+        for (start, window_days), plan in zip(windows, window_plans):
+            if plan is None:
+                days.extend(fallback.days[start:start + window_days])
+                if degraded is not None:
+                    degraded.append(f"window_{start + 1}_failed")
+                continue
+
+            for offset, day in enumerate(plan.days[:window_days]):
+                self._place_day(day, request, start + offset)
+                days.append(day)
+            # 窗口输出天数不足时用备用行程补齐
+            if len(plan.days) < window_days and degraded is not None:
+                degraded.append(f"window_{start + 1}_padded")
+            days.extend(fallback.days[start + len(plan.days):start + window_days])
+
+            for weather in plan.weather_info:
+                weather_by_date.setdefault(weather.date, weather)
+            suggestions = suggestions or plan.overall_suggestions
+
+        return TripPlan(
+            city=request.city,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            days=days,
+            weather_info=[weather_by_date[d] for d in sorted(weather_by_date)],
+            overall_suggestions=suggestions or fallback.overall_suggestions
+        )
+
+    def _day_date(self, request: TripRequest, index: int) -> str:
+        """完整行程中第index天的日期"""
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
+        return (start_date + timedelta(days=index)).strftime("%Y-%m-%d")
+
+    def _place_day(self, day: DayPlan, request: TripRequest, index: int):
+        """将每日行程的序号和日期设为完整行程中的第index天(原地修改)"""
+        day.day_index = index
+        day.date = self._day_date(request, index)
+
+    def _stage_event(self, stage: str, status: str, message: str) -> Dict[str, Any]:
+        """构建阶段进度事件"""
+        return {
+            "event": "stage",
+            "data": {"stage": stage, "status": status, "message": message}
+        }
+
+    async def _retrieve(
+        self,
+        request: TripRequest,
+        timings: Dict[str, float],
+        degraded: Optional[List[str]] = None
+    ) -> Tuple[str, str, str]:
+        """
+        并行执行景点/天气/酒店三个检索阶段
+
+        每个阶段有独立超时,某个阶段失败时保留其余阶段的结果继续规划
+
+        Args:
+            request: 旅行请求
+            timings: 阶段耗时记录(秒),原地写入
+            degraded: 降级原因记录,失败或超时的阶段原地追加
+
+        Returns:
+            (景点结果, 天气结果, 酒店结果)
+        """
+        settings = get_settings()
+        attraction_result, weather_result, hotel_result = await asyncio.gather(
+            self._run_stage(
+                "attractions", "景点搜索",
+                self._search_attractions(request),
+                settings.attraction_stage_timeout, timings, degraded
+            ),
+            self._run_stage(
+                "weather", "天气查询",
+                self._query_weather(request),
+                settings.weather_stage_timeout, timings, degraded
+            ),
+            self._run_stage(
+                "hotels", "酒店搜索",
+                self._search_hotels(request),
+                settings.hotel_stage_timeout, timings, degraded
+            ),
+        )
+        return attraction_result, weather_result, hotel_result
+
+    async def _search_attractions(self, request: TripRequest) -> str:
+        """景点检索阶段"""
+        snapshot_result = self._snapshot_attractions(request)
+        if snapshot_result is not None:
+            return snapshot_result
+
+        if self.retrieval_mode == RETRIEVAL_MODE_DIRECT:
+            return await self._search_attractions_direct(request)
+
+        return await self._invoke_agent(self.attraction_agent, self._build_attraction_query(request), "attraction")
+
+    async def _search_attractions_direct(self, request: TripRequest) -> str:
+        """
+        按所有偏好关键词(及可选的额外结果页)并行搜索景点,合并后按POI id去重排序
+
+        Args:
+            request: 旅行请求
+
+        Returns:
+            合并后的景点结果(JSON字符串)
+        """
+        settings = get_settings()
+        searches = []
+        search_keywords = []
+        for keywords in self._attraction_keywords(request):
+            for page in range(1, max(settings.attraction_search_pages, 1) + 1):
+                arguments = {"keywords": keywords, "city": request.city, "citylimit": "true"}
+                if page > 1:
+                    arguments["page"] = str(page)
+                searches.append(call_tool("maps_text_search", arguments))
+                search_keywords.append(keywords)
+
+        results = await asyncio.gather(*searches, return_exceptions=True)
+        raw_results = []
+        # 同一关键词的各页按页码顺序拼接成一个列表,第2页的名次接在第1页之后
+        keyword_pois: Dict[str, List[Any]] = {}
+        for keywords, result in zip(search_keywords, results):
+            if isinstance(result, Exception):
+                print(f"⚠️  景点搜索子查询失败: {str(result)}")
+                continue
+            raw_results.append(result)
+            keyword_pois.setdefault(keywords, []).extend(extract_pois(result))
+
+        if not raw_results:
+            raise RuntimeError("所有景点搜索子查询均失败")
+
+        result_lists = list(keyword_pois.values())
+        if not any(result_lists):
+            # 无法识别的输出格式,原样交给行程规划Agent
+            return "\n\n".join(raw_results)
+
+        pois = merge_poi_results(result_lists, limit=settings.attraction_max_pois)
+        print(f"   景点搜索: {len(searches)} 次查询, 合并去重后 {len(pois)} 个景点")
+        return render_poi_table(project_pois(pois))
+
+    def _snapshot_attractions(self, request: TripRequest) -> Optional[str]:
+        """
+        从城市离线快照读取景点检索结果(与直接检索的合并规则相同)
+
+        Returns:
+            景点表格,快照不存在或未覆盖全部偏好关键词时返回None
+        """
+        snapshot_store = get_snapshot_store()
+        snapshot = snapshot_store.get(request.city) if snapshot_store else None
+        if snapshot is None:
+            return None
+
+        settings = get_settings()
+        pages = max(settings.attraction_search_pages, 1)
+        result_lists = []
+        for keywords in self._attraction_keywords(request):
+            keyword_pages = snapshot.search(KIND_ATTRACTION, keywords, pages)
+            if keyword_pages is None:
+                return None
+            # 与直接检索一致: 同一关键词的各页拼接后再参与合并
+            result_lists.append([row for page_rows in keyword_pages for row in page_rows])
+
+        records = snapshot.merged_records(result_lists, limit=settings.attraction_max_pois)
+        if not records:
+            return None
+        print(f"   景点检索: 命中{snapshot.city}离线快照({snapshot.version}), {len(records)} 个景点")
+        return render_poi_table(records)
+
+    def _snapshot_hotels(self, request: TripRequest) -> Optional[str]:
+        """
+        从城市离线快照读取酒店检索结果
+
+        Returns:
+            酒店表格,快照不存在或未包含该住宿关键词时返回None
+        """
+        snapshot_store = get_snapshot_store()
+        snapshot = snapshot_store.get(request.city) if snapshot_store else None
+        if snapshot is None:
+            return None
+
+        keyword_pages = snapshot.search(KIND_HOTEL, self._hotel_keywords(request))
+        if not keyword_pages or not keyword_pages[0]:
+            return None
+        print(f"   酒店检索: 命中{snapshot.city}离线快照({snapshot.version})")
+        return render_poi_table(snapshot.records(keyword_pages[0]))
+
+    async def _query_weather(self, request: TripRequest) -> str:
+        """天气检索阶段"""
+        if self.retrieval_mode == RETRIEVAL_MODE_DIRECT:
+            result = await call_tool("maps_weather", {"city": request.city})
+            return project_tool_output("maps_weather", result)
+
+        weather_query = f"请查询{request.city}从{request.start_date} 至 {request.end_date}的天气信息"
+        return await self._invoke_agent(self.weather_agent, weather_query, "weather")
+
+    async def _search_hotels(self, request: TripRequest) -> str:
+        """酒店检索阶段"""
+        snapshot_result = self._snapshot_hotels(request)
+        if snapshot_result is not None:
+            return snapshot_result
+
+        if self.retrieval_mode == RETRIEVAL_MODE_DIRECT:
+            result = await call_tool(
+                "maps_text_search",
+                {"keywords": self._hotel_keywords(request), "city": request.city, "citylimit": "true"}
+            )
+            return project_tool_output("maps_text_search", result)
+
+        hotel_query = f"请搜索{request.city}的{request.accommodation}酒店"
+        return await self._invoke_agent(self.hotel_agent, hotel_query, "hotel")
+
+    async def _invoke_agent(self, agent, query: str, name: str) -> str:
+        """
+        调用Agent并提取输出文本
+
+        Args:
+            agent: Agent实例
+            query: 查询
+            name: Agent名称(用于指标统计)
+        """
+        response = await agent.ainvoke({"input": query}, config=llm_config(name))
+        if "intermediate_steps" in response:
+            record_agent_iterations(name, len(response["intermediate_steps"]))
+        return response.get("output", str(response))
+
+    async def _run_stage(
+        self,
+        name: str,
+        label: str,
+        stage: Awaitable[str],
+        timeout: float,
+        timings: Dict[str, float],
+        degraded: Optional[List[str]] = None
+    ) -> str:
+        """
+        执行单个检索阶段(带独立超时)
+
+        阶段失败或超时不会中断整个规划,而是返回一段说明文字,
+        让行程规划Agent在缺少该信息的情况下继续生成计划。
+
+        Args:
+            name: 阶段名称(用于耗时统计)
+            label: 阶段中文描述(用于日志)
+            stage: 阶段协程,返回结果文本
+            timeout: 超时时间(秒)
+            timings: 阶段耗时记录(秒),原地写入
+            degraded: 降级原因记录,阶段失败或超时时原地追加阶段名称
+
+        Returns:
+            阶段结果文本
+        """
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(stage, timeout=timeout)
+            print(f"{label}结果: {result}...\n")
+            return result
+        except asyncio.TimeoutError:
+            print(f"⚠️  {label}超时({timeout}秒),将在缺少该信息的情况下继续规划")
+            if degraded is not None:
+                degraded.append(name)
+            return f"{label}超时,暂无数据"
+        except Exception as e:
+            print(f"⚠️  {label}失败: {str(e)},将在缺少该信息的情况下继续规划")
+            if degraded is not None:
+                degraded.append(name)
+            return f"{label}失败,暂无数据"
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    async def _cache_plan(self, plan_cache, request: TripRequest, trip_plan: TripPlan, degraded: List[str]):
+        """写入计划缓存;降级生成的计划(检索阶段失败、窗口使用备用行程等)不缓存,下次请求重新规划"""
+        if plan_cache is None:
+            return
+        if degraded:
+            print(f"⚠️  计划为降级结果({', '.join(degraded)}),不写入缓存")
+            return
+        await plan_cache.set(request, trip_plan)
+
+    def _report_stage_timings(self, timings: Dict[str, float]):
+        """打印各阶段耗时并记录到指标"""
+        print("⏱️  阶段耗时:")
+        for name, seconds in timings.items():
+            print(f"   {name}: {seconds:.2f}s")
+            record_stage(name, seconds)
+
+    def _attraction_keywords(self, request: TripRequest) -> List[str]:
+        """景点搜索关键词(每个偏好一个,去重并保持顺序)"""
+        keywords = []
+        for preference in request.preferences:
+            preference = preference.strip()
+            if preference and preference not in keywords:
+                keywords.append(preference)
+        return keywords or ["景点"]
+
+    def _hotel_keywords(self, request: TripRequest) -> str:
+        """酒店搜索关键词(如"经济型酒店")"""
+        accommodation = (request.accommodation or "").strip()
+        if not accommodation:
+            return "酒店"
+        if any(word in accommodation for word in ("酒店", "宾馆", "民宿", "客栈")):
+            return accommodation
+        return f"{accommodation}酒店"
+
     def _build_attraction_query(self, request: TripRequest) -> str:
         """构建景点搜索查询"""
-        keywords = []
-        if request.preferences:
-            # 只取第一个偏好作为关键词
-            keywords = request.preferences[0]
-        else:
-            keywords = "景点"
+        keywords = self._attraction_keywords(request)
 
-        query = f"请使用amap_maps_text_search工具搜索{request.city}的{keywords}相关景点。关键词: {keywords}, 城市: {request.city}"
+        query = (
+            f"请使用amap_maps_text_search工具搜索{request.city}的{'、'.join(keywords)}相关景点。"
+            f"每个关键词分别搜索一次(可同时发起多个工具调用),关键词: {', '.join(keywords)}, 城市: {request.city}。"
+            f"合并结果时去掉重复的景点"
+        )
         return query
 
     def _build_planner_query(self, request: TripRequest, attractions: str, weather: str, hotels: str = "") -> str:
@@ -385,6 +1092,7 @@ class MultiAgentTripPlanner:
 4. 考虑景点之间的距离和交通方式
 5. 返回完整的JSON格式数据
 6. 景点的经纬度坐标要真实准确
+7. 景点、天气、酒店信息为以|分隔的表格(首行为表头),坐标列格式为"经度,纬度",请直接使用其中的坐标
 """
         if request.free_text_input:
             query += f"\n**额外要求:** {request.free_text_input}"
@@ -402,37 +1110,50 @@ class MultiAgentTripPlanner:
         Returns:
             旅行计划
         """
+        parser = PlanStreamParser()
+        parser.feed(response)
         try:
-            # 尝试从响应中提取JSON
-            # 查找JSON代码块
-            if "```json" in response:
-                json_start = response.find("```json") + 7
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "```" in response:
-                json_start = response.find("```") + 3
-                json_end = response.find("```", json_start)
-                json_str = response[json_start:json_end].strip()
-            elif "{" in response and "}" in response:
-                # 直接查找JSON对象
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-            else:
-                raise ValueError("响应中未找到JSON数据")
-            
-            # 解析JSON
-            data = json.loads(json_str)
-            
-            # 转换为TripPlan对象
-            trip_plan = TripPlan(**data)
-            
-            return trip_plan
-            
-        except Exception as e:
+            return self._build_plan(parser, request)
+        except ValueError as e:
             print(f"⚠️  解析响应失败: {str(e)}")
             print(f"   将使用备用方案生成计划")
             return self._create_fallback_plan(request)
+
+    def _build_plan(self, parser: PlanStreamParser, request: TripRequest) -> TripPlan:
+        """
+        由增量解析器中已通过校验的片段组装旅行计划
+
+        输出尾部被截断或部分片段无效时,保留所有有效的每日行程和天气信息。
+
+        Args:
+            parser: 已输入完整输出的解析器
+            request: 原始请求
+
+        Returns:
+            旅行计划
+
+        Raises:
+            ValueError: 没有任何有效的每日行程
+        """
+        if not parser.days:
+            raise ValueError("响应中未找到有效的每日行程")
+
+        if not parser.finished or parser.invalid_count:
+            print(
+                f"⚠️  响应不完整或含无效片段(丢弃{parser.invalid_count}个),"
+                f"保留{len(parser.days)}天行程、{len(parser.weather_info)}条天气信息"
+            )
+
+        fields = parser.fields
+        return TripPlan(
+            city=fields.get("city") or request.city,
+            start_date=fields.get("start_date") or request.start_date,
+            end_date=fields.get("end_date") or request.end_date,
+            days=parser.days,
+            weather_info=parser.weather_info,
+            overall_suggestions=fields.get("overall_suggestions")
+                or f"这是为您规划的{request.city}{request.travel_days}日游行程,建议提前查看各景点的开放时间。"
+        )
     
     def _create_fallback_plan(self, request: TripRequest) -> TripPlan:
         """创建备用计划(当Agent失败时)"""
@@ -483,13 +1204,71 @@ class MultiAgentTripPlanner:
 
 # 全局多智能体系统实例
 _multi_agent_planner = None
+# 初始化锁: 并发的首批请求只初始化一次,不会重复启动MCP服务器
+_planner_lock = asyncio.Lock()
+# 预热状态: cold(未初始化) / warming(初始化中) / ready(可用) / failed(初始化失败,下次调用时重试)
+_planner_state = "cold"
+_planner_error: Optional[str] = None
 
-async def get_trip_planner_agent() -> MultiAgentTripPlanner:
-    """获取多智能体旅行规划系统实例(异步单例模式)"""
-    global _multi_agent_planner
 
-    if _multi_agent_planner is None:
-        _multi_agent_planner = MultiAgentTripPlanner()
-        await _multi_agent_planner.initialize() # 显式调用异步初始化
+async def get_trip_planner_agent() -> MultiAgentTripPlanner:
+    """获取多智能体旅行规划系统实例(异步单例模式,初始化完成后才对外可见)"""
+    global _multi_agent_planner, _planner_state, _planner_error
+
+    if _multi_agent_planner is not None:
+        return _multi_agent_planner
+
+    async with _planner_lock:
+        if _multi_agent_planner is None:
+            _planner_state = "warming"
+            try:
+                planner = MultiAgentTripPlanner()
+                await planner.initialize() # 显式调用异步初始化
+            except Exception as e:
+                _planner_state = "failed"
+                _planner_error = str(e)
+                raise
+            _multi_agent_planner = planner
+            _planner_state = "ready"
+            _planner_error = None
 
     return _multi_agent_planner
+
+
+def planner_status() -> Dict[str, Any]:
+    """规划系统的预热状态"""
+    return {
+        "state": _planner_state,
+        "error": _planner_error,
+        "retrieval_mode": _multi_agent_planner.retrieval_mode if _multi_agent_planner else None,
+        "tools_count": len(_multi_agent_planner.amap_tools or []) if _multi_agent_planner else 0,
+    }
+
+
+async def warm_up(synthetic_request: bool = False, city: str = "北京"):
+    """
+    预热规划系统: 创建LLM客户端、高德工具和各Agent
+
+    Args:
+        synthetic_request: 是否额外发起一次高德天气查询和一次极短的LLM调用,
+                           提前建立MCP会话/HTTP连接池和LLM的HTTPS连接
+        city: 合成请求使用的城市
+    """
+    start = time.perf_counter()
+    try:
+        planner = await get_trip_planner_agent()
+    except Exception as e:
+        print(f"❌ 规划系统预热失败,将在首次请求时重试: {str(e)}")
+        return
+
+    if synthetic_request:
+        results = await asyncio.gather(
+            call_tool("maps_weather", {"city": city}),
+            planner.llm.ainvoke("ping", config=llm_config("warmup")),
+            return_exceptions=True
+        )
+        for name, result in zip(("高德工具", "LLM"), results):
+            if isinstance(result, Exception):
+                print(f"⚠️  预热请求失败({name}): {str(result)}")
+
+    print(f"🔥 规划系统预热完成 ({time.perf_counter() - start:.1f}s)")
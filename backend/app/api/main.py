@@ -1,59 +1,27 @@
 """FastAPI主应用"""
-import sys
-import os
-import logging
-from logging.handlers import TimedRotatingFileHandler
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from ..config import get_settings, validate_config, print_config
+from ..logging_setup import setup_logging, shutdown_logging
+from ..services.metrics import render_metrics, METRICS_CONTENT_TYPE
+from ..services.langchain_tools import cleanup_mcp_client
+from ..services.unsplash_service import close_unsplash_service
+from ..services.city_snapshot import get_snapshot_store
+from ..agents.trip_planner_agent import planner_status, warm_up
 from .routes import trip, poi, map as map_routes
 
 
-log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, "app.log")
-
-# 2. 配置 logging (每天轮转一次日志，保留7天)
-logger = logging.getLogger("AppLogger")
-logger.setLevel(logging.INFO)
+# 获取配置
+settings = get_settings()
 
-# 创建文件处理器
-file_handler = TimedRotatingFileHandler(
-    log_file, when="midnight", interval=1, backupCount=7, encoding='utf-8'
+# 配置日志: print() 输出和日志记录进入队列,由后台线程写入控制台和按天轮转的文件
+setup_logging(
+    level=settings.log_level,
+    log_dir="logs",
+    max_message_chars=settings.log_max_message_chars
 )
-# 设置日志格式 (时间 - 级别 - 内容)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
-
-# 3. 定义双向输出类 (同时写控制台和文件)
-class LoggerWriter:
-    def __init__(self, level, original_stream):
-        self.level = level
-        self.terminal = original_stream  # 保存原本的输出流(控制台)
-
-    def write(self, message):
-        # 步骤A: 输出到控制台 (保持原有 print 的效果)
-        self.terminal.write(message)
-        self.terminal.flush() # 确保控制台实时显示
 
-        # 步骤B: 写入日志文件 (过滤掉纯换行符，避免日志空行过多)
-        if message and message.strip():
-            logger.log(self.level, message.strip())
-
-    def flush(self):
-        # 必须实现 flush 方法，因为 Python 的 IO流 需要它
-        self.terminal.flush()
-
-# 4. 执行重定向 (核心步骤)
-# 将 print() 的默认去向(stdout) 劫持到我们的 LoggerWriter
-sys.stdout = LoggerWriter(logging.INFO, sys.stdout)
-# 将 报错信息(stderr) 劫持到 LoggerWriter (标记为 ERROR)
-sys.stderr = LoggerWriter(logging.ERROR, sys.stderr)
-
-
-# 获取配置
-settings = get_settings()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -79,6 +47,10 @@ app.include_router(poi.router, prefix="/api")
 app.include_router(map_routes.router, prefix="/api")
 
 
+# 启动预热任务(保留引用,避免被垃圾回收)
+_warmup_task = None
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
@@ -98,6 +70,19 @@ async def startup_event():
         print("\n请检查.env文件并确保所有必要的配置项都已设置")
         raise
     
+    # 映射城市离线快照
+    snapshot_store = get_snapshot_store()
+    if snapshot_store is not None:
+        loaded = snapshot_store.preload(settings.get_snapshot_cities_list())
+        print(f"🗺️  城市离线快照: {loaded} 个城市已加载")
+
+    # 后台预热规划系统,首个请求不再承担初始化开销;预热期间到达的请求等待同一次初始化
+    global _warmup_task
+    if settings.warmup_on_startup:
+        _warmup_task = asyncio.create_task(
+            warm_up(synthetic_request=settings.warmup_synthetic_request, city=settings.warmup_city)
+        )
+
     print("\n" + "="*60)
     print("📚 API文档: http://localhost:8000/docs")
     print("📖 ReDoc文档: http://localhost:8000/redoc")
@@ -110,6 +95,11 @@ async def shutdown_event():
     print("\n" + "="*60)
     print("👋 应用正在关闭...")
     print("="*60 + "\n")
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    await cleanup_mcp_client()
+    await close_unsplash_service()
+    shutdown_logging()
 
 
 @app.get("/")
@@ -124,13 +114,20 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus指标"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health():
     """健康检查"""
     return {
         "status": "healthy",
         "service": settings.app_name,
-        "version": settings.app_version
+        "version": settings.app_version,
+        "planner": planner_status()
     }
 
 
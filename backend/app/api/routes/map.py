@@ -3,6 +3,8 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from ...models.schemas import (
+    Location,
+    POIInfo,
     POISearchRequest,
     POISearchResponse,
     RouteRequest,
@@ -10,6 +12,7 @@ from ...models.schemas import (
     WeatherResponse
 )
 from ...services.amap_service import get_amap_service
+from ...services.poi_index import get_poi_index
 
 router = APIRouter(prefix="/map", tags=["地图服务"])
 
@@ -57,6 +60,74 @@ async def search_poi(
         )
 
 
+@router.get(
+    "/nearby",
+    response_model=POISearchResponse,
+    summary="附近POI",
+    description="查询中心点附近的POI,优先从内存中的POI空间索引返回,索引中没有结果时调用高德周边搜索"
+)
+async def search_nearby(
+    city: str = Query(..., description="城市", example="北京"),
+    location: str = Query(..., description="中心点坐标 经度,纬度", example="116.397428,39.90923"),
+    radius: int = Query(1000, description="搜索半径(米)", ge=1, le=50000),
+    type: Optional[str] = Query(None, description="类型过滤,多个用逗号分隔,如 住宿服务 或 风景名胜", example="住宿服务"),
+    limit: int = Query(20, description="最多返回数量", ge=1, le=100)
+):
+    """
+    查询附近POI
+
+    Args:
+        city: 城市
+        location: 中心点坐标
+        radius: 搜索半径(米)
+        type: 类型过滤
+        limit: 最多返回数量
+
+    Returns:
+        按距离排序的POI列表
+    """
+    try:
+        lng, lat = (float(v) for v in location.split(","))
+        center = Location(longitude=lng, latitude=lat)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="location格式应为 经度,纬度")
+
+    try:
+        poi_types = {t.strip() for t in type.split(",") if t.strip()} if type else None
+        poi_index = get_poi_index()
+        nearby = poi_index.within(city, center, radius / 1000, poi_types=poi_types, limit=limit) if poi_index else []
+
+        if nearby:
+            pois = [
+                POIInfo(
+                    id=record.id,
+                    name=record.name,
+                    type=record.type,
+                    address=record.address,
+                    location=Location(longitude=record.lng, latitude=record.lat)
+                )
+                for record, _ in nearby
+            ]
+            message = "附近POI查询成功(缓存)"
+        else:
+            service = get_amap_service()
+            pois = (await service.search_nearby(center, radius, keywords=type.replace(",", "|") if type else ""))[:limit]
+            message = "附近POI查询成功"
+
+        return POISearchResponse(
+            success=True,
+            message=message,
+            data=pois
+        )
+
+    except Exception as e:
+        print(f"❌ 附近POI查询失败: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"附近POI查询失败: {str(e)}"
+        )
+
+
 @router.get(
     "/weather",
     response_model=WeatherResponse,
@@ -147,13 +218,12 @@ async def plan_route(request: RouteRequest):
 async def health_check():
     """健康检查"""
     try:
-        # 检查服务是否可用
-        service =await get_amap_service()
-        
-        # 获取工具列表
-        import asyncio
+        # 检查服务是否可用(get_amap_service是同步函数,不能await)
+        get_amap_service()
+
+        # 获取工具列表(已在事件循环中,不能用asyncio.run)
         from ...services.langchain_tools import get_amap_tools
-        tools = asyncio.run(get_amap_tools())
+        tools = await get_amap_tools()
         
         return {
             "status": "healthy",
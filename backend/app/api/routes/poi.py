@@ -2,7 +2,8 @@
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
+from ...config import get_settings
 from ...services.amap_service import get_amap_service
 from ...services.unsplash_service import get_unsplash_service
 
@@ -16,6 +17,31 @@ class POIDetailResponse(BaseModel):
     data: Optional[dict] = None
 
 
+class POIDetailsRequest(BaseModel):
+    """批量POI详情请求"""
+    ids: List[str] = Field(..., description="POI ID列表", example=["B000A8UIN8", "B000A7BM4H"])
+
+
+class POIDetailsResponse(BaseModel):
+    """批量POI详情响应"""
+    success: bool
+    message: str
+    data: Dict[str, dict] = Field(default_factory=dict, description="POI ID -> 详情")
+    errors: Dict[str, str] = Field(default_factory=dict, description="POI ID -> 错误信息")
+
+
+class AttractionPhotosRequest(BaseModel):
+    """批量景点图片请求"""
+    names: List[str] = Field(..., description="景点名称列表", example=["故宫博物院", "天坛公园"])
+
+
+class AttractionPhotosResponse(BaseModel):
+    """批量景点图片响应"""
+    success: bool
+    message: str
+    data: Dict[str, Optional[str]] = Field(default_factory=dict, description="景点名称 -> 图片URL")
+
+
 @router.get(
     "/detail/{poi_id}",
     response_model=POIDetailResponse,
@@ -52,6 +78,42 @@ async def get_poi_detail(poi_id: str):
         )
 
 
+@router.post(
+    "/details",
+    response_model=POIDetailsResponse,
+    summary="批量获取POI详情",
+    description="一次请求获取多个POI的详细信息,已缓存的直接返回,其余并发查询"
+)
+async def get_poi_details(request: POIDetailsRequest):
+    """
+    批量获取POI详情
+
+    Args:
+        request: POI ID列表
+
+    Returns:
+        POI ID -> 详情, 以及查询失败的POI ID -> 错误信息
+    """
+    settings = get_settings()
+    if len(request.ids) > settings.poi_detail_batch_max:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多查询{settings.poi_detail_batch_max}个POI"
+        )
+
+    amap_service = get_amap_service()
+    details, errors = await amap_service.get_poi_details(
+        request.ids, concurrency=settings.poi_detail_concurrency
+    )
+
+    return POIDetailsResponse(
+        success=not errors,
+        message="获取POI详情成功" if not errors else f"{len(errors)}个POI详情获取失败",
+        data=details,
+        errors=errors
+    )
+
+
 @router.get(
     "/search",
     summary="搜索POI",
@@ -104,12 +166,8 @@ async def get_attraction_photo(name: str):
     try:
         unsplash_service = get_unsplash_service()
 
-        # 搜索景点图片
-        photo_url = unsplash_service.get_photo_url(f"{name} China landmark")
-
-        if not photo_url:
-            # 如果没找到,尝试只用景点名称搜索
-            photo_url = unsplash_service.get_photo_url(name)
+        # 搜索景点图片(先带 "China landmark" 后缀,没有结果再只用名称)
+        photo_url = await unsplash_service.get_attraction_photo(name)
 
         return {
             "success": True,
@@ -127,3 +185,45 @@ async def get_attraction_photo(name: str):
             detail=f"获取景点图片失败: {str(e)}"
         )
 
+
+@router.post(
+    "/photos",
+    response_model=AttractionPhotosResponse,
+    summary="批量获取景点图片",
+    description="一次请求获取多个景点的图片,优先使用缓存,其余并发查询Unsplash"
+)
+async def get_attraction_photos(request: AttractionPhotosRequest):
+    """
+    批量获取景点图片
+
+    Args:
+        request: 景点名称列表
+
+    Returns:
+        景点名称 -> 图片URL(未找到时为null)
+    """
+    settings = get_settings()
+    # 按去重后的数量检查上限(同一景点在多天行程中重复出现很常见)
+    names = list(dict.fromkeys(request.names))
+    if len(names) > settings.photo_batch_max:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多查询{settings.photo_batch_max}个景点"
+        )
+
+    try:
+        unsplash_service = get_unsplash_service()
+        photos = await unsplash_service.get_attraction_photos(names)
+
+        return AttractionPhotosResponse(
+            success=True,
+            message="获取图片成功",
+            data=photos
+        )
+
+    except Exception as e:
+        print(f"❌ 批量获取景点图片失败: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"批量获取景点图片失败: {str(e)}"
+        )
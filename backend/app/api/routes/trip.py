@@ -1,15 +1,29 @@
 """旅行规划API路由"""
 
-from fastapi import APIRouter, HTTPException
+import json
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from ...models.schemas import (
     TripRequest,
     TripPlanResponse,
     ErrorResponse
 )
-from ...agents.trip_planner_agent import get_trip_planner_agent
+from ...config import get_settings
+from ...agents.trip_planner_agent import get_trip_planner_agent, planner_status
+from ...services.plan_cache import get_plan_cache, make_plan_key
+from ...services.single_flight import SingleFlight
+from ...services.tool_cache import get_tool_cache
+from ...services.langchain_tools import get_mcp_pool
+from ...services.poi_index import get_poi_index
+from ...services.city_snapshot import get_snapshot_store
+from ...services.metrics import start_request_metrics
+from ...services.llm_gateway import gateway_stats
 
 router = APIRouter(prefix="/trip", tags=["旅行规划"])
 
+# 合并同时到达的相同规划请求
+_plan_flights = SingleFlight()
+
 
 @router.post(
     "/plan",
@@ -17,16 +31,20 @@ router = APIRouter(prefix="/trip", tags=["旅行规划"])
     summary="生成旅行计划",
     description="根据用户输入的旅行需求,生成详细的旅行计划"
 )
-async def plan_trip(request: TripRequest):
+async def plan_trip(request: TripRequest, response: Response):
     """
     生成旅行计划
 
+    各阶段耗时通过 Server-Timing 响应头返回
+
     Args:
         request: 旅行请求参数
+        response: 响应对象(用于设置响应头)
 
     Returns:
         旅行计划响应
     """
+    metrics = start_request_metrics()
     try:
         print(f"\n{'='*60}")
         print(f"📥 收到旅行规划请求:")
@@ -39,11 +57,15 @@ async def plan_trip(request: TripRequest):
         print("🔄 获取多智能体系统实例...")
         agent = await get_trip_planner_agent()
 
-        # 生成旅行计划
+        # 生成旅行计划(相同请求正在生成时直接等待其结果)
         print("🚀 开始生成旅行计划...")
-        trip_plan =await agent.plan_trip(request)
+        flight_key = f"{make_plan_key(request)}@{request.start_date}"
+        trip_plan = await _plan_flights.run(flight_key, lambda: agent.plan_trip(request))
 
         print("✅ 旅行计划生成成功,准备返回响应\n")
+        print(f"📊 请求指标: {json.dumps(metrics.summary(), ensure_ascii=False)}")
+        if metrics.stages:
+            response.headers["Server-Timing"] = metrics.server_timing()
 
         return TripPlanResponse(
             success=True,
@@ -61,6 +83,58 @@ async def plan_trip(request: TripRequest):
         )
 
 
+@router.post(
+    "/plan/stream",
+    summary="流式生成旅行计划",
+    description="以Server-Sent Events形式推送规划进度、每日行程(生成一天推送一天)以及最终的完整计划"
+)
+async def plan_trip_stream(request: TripRequest):
+    """
+    流式生成旅行计划
+
+    事件类型:
+        stage: 阶段进度 {"stage", "status", "message"}
+        day: 单日行程(DayPlan)
+        plan: 完整旅行计划(TripPlan)
+        metrics: 本次请求的指标汇总
+        error: 错误信息 {"message"}
+
+    Args:
+        request: 旅行请求参数
+
+    Returns:
+        text/event-stream 流式响应
+    """
+    print(f"\n📥 收到流式旅行规划请求: {request.city} {request.start_date} - {request.end_date}")
+
+    async def event_stream():
+        metrics = start_request_metrics()
+        try:
+            agent = await get_trip_planner_agent()
+            async for event in agent.plan_trip_stream(request):
+                yield _format_sse(event["event"], event["data"])
+            yield _format_sse("metrics", metrics.summary())
+        except Exception as e:
+            print(f"❌ 流式生成旅行计划失败: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            yield _format_sse("error", {"message": f"生成旅行计划失败: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # 禁止反向代理缓冲,保证事件实时送达
+        }
+    )
+
+
+def _format_sse(event: str, data) -> str:
+    """格式化单条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.get(
     "/health",
     summary="健康检查",
@@ -68,15 +142,36 @@ async def plan_trip(request: TripRequest):
 )
 async def health_check():
     """健康检查"""
+    # 只读取预热状态,不等待Agent创建(预热期间健康检查也要立即返回)
+    status = planner_status()
+    if status["state"] == "failed":
+        raise HTTPException(
+            status_code=503,
+            detail=f"服务不可用: {status['error']}"
+        )
+
     try:
-        # 检查Agent是否可用
-        agent = await get_trip_planner_agent()
-        
+        plan_cache = get_plan_cache()
+        tool_cache = get_tool_cache()
+        mcp_pool = get_mcp_pool()
+        poi_index = get_poi_index()
+        snapshot_store = get_snapshot_store()
+
         return {
-            "status": "healthy",
+            "status": "healthy" if status["state"] == "ready" else "starting",
             "service": "trip-planner",
             "agent_type": "MultiAgentTripPlanner",
-            "tools_count": len(agent.amap_tools) if agent.amap_tools else 0
+            "planner": status,
+            "tools_count": status["tools_count"],
+            "plan_cache": plan_cache.stats() if plan_cache else None,
+            "tool_cache": tool_cache.stats() if tool_cache else None,
+            "amap_backend": get_settings().amap_backend,
+            "mcp_pool": mcp_pool.stats() if mcp_pool else None,
+            "poi_index": poi_index.stats() if poi_index else None,
+            "snapshots": snapshot_store.stats() if snapshot_store else None,
+            "llm_gateway": gateway_stats(),
+            "inflight_plans": _plan_flights.inflight(),
+            "coalesced_plans": _plan_flights.coalesced
         }
     except Exception as e:
         raise HTTPException(
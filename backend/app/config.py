@@ -49,8 +49,101 @@ class Settings(BaseSettings):
     nvidia_api_key: str = "xxxxxxxxxxxxxxx"
     nvidia_model: str = "meta/llama-3.3-70b-instruct"
 
+    # 多智能体规划配置
+    # 检索模式: agent(LLM工具调用Agent) / direct(直接调用高德工具,LLM仅用于行程规划)
+    retrieval_mode: str = "agent"
+
+    # 各检索阶段的独立超时(秒)
+    attraction_stage_timeout: float = 60.0
+    weather_stage_timeout: float = 30.0
+    hotel_stage_timeout: float = 45.0
+
+    # 景点检索: 每个偏好关键词搜索的结果页数, 合并去重后保留的景点数量上限
+    attraction_search_pages: int = 1
+    attraction_max_pois: int = 30
+    # 每天安排的景点数(本地地理优化生成每日骨架时使用)
+    attractions_per_day: int = 3
+
+    # 长行程分窗口规划: 天数超过阈值时按窗口天数拆分,各窗口并行调用行程规划Agent
+    planner_chunk_threshold_days: int = 5
+    planner_window_days: int = 3
+
+    # 旅行计划缓存
+    plan_cache_enabled: bool = True
+    plan_cache_path: str = "data/plan_cache.sqlite3"  # 为空时只使用内存缓存
+    plan_cache_ttl: float = 86400.0  # 过期时间(秒)
+    plan_cache_max_entries: int = 500
+
+    # 高德工具结果缓存(各工具的过期时间见 services/tool_cache.py)
+    tool_cache_enabled: bool = True
+    tool_cache_max_entries: int = 2000
+
+    # 批量POI详情: 同时查询的POI数上限 / 单次请求最多的POI数
+    poi_detail_concurrency: int = 5
+    poi_detail_batch_max: int = 50
+
+    # POI空间索引: 网格单元边长(公里) / 最多索引的POI数 / 每天挑选酒店时从索引补充的候选数
+    poi_index_enabled: bool = True
+    poi_index_cell_km: float = 1.0
+    poi_index_max_entries: int = 50000
+    hotel_candidates_per_day: int = 5
+
+    # 城市离线快照: 预取脚本(scripts/prefetch_city_snapshots.py)抓取的城市及关键词, 快照有效期(秒)
+    snapshot_enabled: bool = True
+    snapshot_dir: str = "data/snapshots"
+    snapshot_max_age: float = 7 * 86400.0
+    snapshot_cities: str = (
+        "北京,上海,广州,深圳,成都,杭州,西安,重庆,南京,武汉,苏州,长沙,天津,青岛,厦门,"
+        "昆明,大理,丽江,三亚,桂林,哈尔滨,拉萨,洛阳,开封,济南,郑州,沈阳,大连,贵阳,乌鲁木齐"
+    )
+    snapshot_attraction_keywords: str = "景点,历史文化,自然风光,美食,购物,艺术,休闲"
+    snapshot_hotel_keywords: str = "酒店,经济型酒店,舒适型酒店,豪华酒店,民宿"
+
+    # Unsplash景点图片: 请求超时(秒) / 同时查询数 / 批量接口单次最多的景点数
+    unsplash_timeout: float = 10.0
+    unsplash_concurrency: int = 4
+    photo_batch_max: int = 100
+    # 景点图片缓存: 找到图片的条目过期时间 / 未找到图片的条目过期时间(秒)
+    photo_cache_enabled: bool = True
+    photo_cache_path: str = "data/photo_cache.sqlite3"  # 为空时只使用内存缓存
+    photo_cache_ttl: float = 30 * 86400.0
+    photo_cache_negative_ttl: float = 86400.0
+    photo_cache_max_entries: int = 5000
+
+    # 高德工具后端: mcp(高德MCP服务器子进程) / rest(直接异步调用高德Web服务,复用HTTP连接)
+    amap_backend: str = "mcp"
+    amap_rest_base_url: str = "https://restapi.amap.com"  # 可指向本地桩服务器测试
+    amap_rest_timeout: float = 10.0
+    amap_rest_max_connections: int = 20
+
+    # 高德MCP会话池: 常驻会话数(0表示不使用会话池,每次调用新建会话), 会话空闲超过该时间(秒)后借出前先ping检查
+    mcp_pool_size: int = 4
+    mcp_health_check_interval: float = 60.0
+    # MCP工具定义缓存: 命中时启动无需等待MCP服务器即可创建工具,为空时不缓存
+    mcp_schema_cache_path: str = "data/mcp_tool_schemas.json"
+
+    # LLM网关: 每个提供商的最大并发调用数和每分钟token预算(0表示不限制),名额不足时排队,行程规划调用优先出队
+    llm_gateway_enabled: bool = True
+    llm_nvidia_max_concurrency: int = 4
+    llm_nvidia_tokens_per_minute: int = 0
+    llm_google_max_concurrency: int = 4
+    llm_google_tokens_per_minute: int = 0
+    # 遇到429或临时错误(5xx、超时、连接错误)时的重试: 最多重试次数, 指数退避基数/上限(秒),响应带Retry-After时以其为准
+    llm_max_retries: int = 4
+    llm_backoff_base: float = 1.0
+    llm_backoff_max: float = 30.0
+    # 排队时预留的输出token数(调用结束后按实际用量校正)
+    llm_completion_tokens_estimate: int = 1000
+
+    # 启动预热: 启动时在后台初始化规划系统(LLM客户端、高德工具、各Agent)
+    warmup_on_startup: bool = True
+    # 预热时额外发起一次高德天气查询和一次极短的LLM调用,提前建立连接(会消耗少量token)
+    warmup_synthetic_request: bool = False
+    warmup_city: str = "北京"
+
     # 日志配置
     log_level: str = "INFO"
+    log_max_message_chars: int = 2000  # 单条日志最大字符数,超出部分截断(0表示不截断)
 
     class Config:
         env_file = ".env"
@@ -61,6 +154,15 @@ class Settings(BaseSettings):
         """获取CORS origins列表"""
         return [origin.strip() for origin in self.cors_origins.split(',')]
 
+    def get_snapshot_cities_list(self) -> List[str]:
+        """获取需要离线快照的城市列表"""
+        return [city.strip() for city in self.snapshot_cities.split(',') if city.strip()]
+
+    def get_snapshot_keywords(self, kind: str) -> List[str]:
+        """获取离线快照预取的关键词列表(kind: attraction/hotel)"""
+        value = self.snapshot_attraction_keywords if kind == "attraction" else self.snapshot_hotel_keywords
+        return [keyword.strip() for keyword in value.split(',') if keyword.strip()]
+
 
 # 创建全局配置实例
 settings = Settings()
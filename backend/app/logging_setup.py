@@ -0,0 +1,142 @@
+"""日志配置 - 基于队列的非阻塞日志
+
+print() 和 logging 调用只把日志记录放入内存队列,
+控制台输出和按天轮转的文件写入由后台监听线程完成,不再阻塞事件循环。
+写入本身很快(本地终端/文件)时,事件循环延迟与同步写入相当;
+控制台写入会阻塞时(日志采集端处理不过来、管道写满)才有明显差别,
+见 scripts/bench_logging.py --console-delay-ms。
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Optional
+
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class _TruncatingFilter(logging.Filter):
+    """截断过长的日志消息(如完整的LLM输出),避免大量字符串进入队列和文件"""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.max_chars <= 0:
+            return True
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            record.msg = f"{message[:self.max_chars]}...(省略{len(message) - self.max_chars}字符)"
+            record.args = None
+        return True
+
+
+class StreamToLogger:
+    """
+    将 print() 输出转为日志记录
+
+    按行缓冲后交给logger,实际的控制台和文件写入在后台线程中完成。
+    """
+
+    def __init__(self, logger: logging.Logger, level: int, original_stream):
+        self.logger = logger
+        self.level = level
+        self.original_stream = original_stream  # 供需要真实文件描述符的库使用
+        self._buffer = ""
+
+    def write(self, message: str) -> int:
+        self._buffer += message
+        if "\n" in self._buffer:
+            *lines, self._buffer = self._buffer.split("\n")
+            for line in lines:
+                if line.strip():
+                    self.logger.log(self.level, line.rstrip())
+        return len(message)
+
+    def flush(self):
+        if self._buffer.strip():
+            self.logger.log(self.level, self._buffer.rstrip())
+        self._buffer = ""
+
+    def isatty(self) -> bool:
+        return False
+
+    def fileno(self) -> int:
+        return self.original_stream.fileno()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.original_stream, "encoding", "utf-8")
+
+
+def setup_logging(
+    level: str = "INFO",
+    log_dir: str = "logs",
+    max_message_chars: int = 2000,
+    redirect_print: bool = True
+) -> logging.Logger:
+    """
+    初始化非阻塞日志(重复调用无副作用)
+
+    Args:
+        level: 日志级别
+        log_dir: 日志目录,文件每天轮转一次,保留7天
+        max_message_chars: 单条日志的最大字符数, 0表示不截断
+        redirect_print: 是否将 print() 的 stdout/stderr 输出转为日志
+
+    Returns:
+        应用日志器
+    """
+    global _listener
+
+    logger = logging.getLogger("AppLogger")
+    if _listener is not None:
+        return logger
+
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    # 后台线程中的真实输出: 控制台 + 按天轮转的文件
+    console_handler = logging.StreamHandler(sys.__stdout__)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+    file_handler = TimedRotatingFileHandler(
+        os.path.join(log_dir, "app.log"), when="midnight", interval=1, backupCount=7, encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(_TruncatingFilter(max_message_chars))
+    logger.addHandler(queue_handler)
+    logger.setLevel(getattr(logging, level.upper(), logging.INFO))
+    logger.propagate = False
+
+    if redirect_print:
+        sys.stdout = StreamToLogger(logger, logging.INFO, sys.__stdout__)
+        sys.stderr = StreamToLogger(logger, logging.ERROR, sys.__stderr__)
+
+    return logger
+
+
+def shutdown_logging():
+    """停止后台监听线程并写出队列中剩余的日志"""
+    global _listener
+
+    if _listener is None:
+        return
+    for stream in (sys.stdout, sys.stderr):
+        if isinstance(stream, StreamToLogger):
+            stream.flush()
+    _listener.stop()
+    _listener = None
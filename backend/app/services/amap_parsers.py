@@ -0,0 +1,269 @@
+"""高德工具输出解析 - 将工具返回的JSON解析为POIInfo、WeatherInfo、RouteInfo、Location
+
+每个工具输出只做一次JSON解码,再由 pydantic model_validate 构建模型。
+同时兼容高德MCP服务器和REST后端的输出结构。
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+from pydantic import ValidationError
+from ..models.schemas import Location, POIInfo, RouteInfo, WeatherInfo
+
+
+_decoder = json.JSONDecoder()
+
+
+def decode_result(result: Any) -> Any:
+    """
+    解码工具输出
+
+    先整体解码;失败时(输出前后带有说明文字)从第一个 { 或 [ 起解码一个完整的JSON值,
+    不再用贪婪正则在整段输出上回溯。
+
+    Args:
+        result: 工具输出(JSON字符串或已解码的对象)
+
+    Returns:
+        解码后的对象,无法解码时返回None
+    """
+    if not isinstance(result, str):
+        return result
+    try:
+        return json.loads(result)
+    except json.JSONDecodeError:
+        pass
+
+    for index, char in enumerate(result):
+        if char in "{[":
+            try:
+                return _decoder.raw_decode(result, index)[0]
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def is_success_result(result: Any) -> bool:
+    """
+    工具输出是否为成功结果(用于决定能否缓存或写入城市快照)
+
+    高德MCP服务器把配额超限、Key无效等错误作为普通文本返回,不会抛出异常。
+    成功结果须能解码为JSON;带状态字段时须为 status="1" / errcode=0,且info为OK。
+
+    Args:
+        result: 工具原始输出(字符串、文本列表,或MCP适配器的 (content, artifact))
+
+    Returns:
+        是否为成功结果
+    """
+    if isinstance(result, tuple) and len(result) == 2:
+        result = result[0]
+    if isinstance(result, list):
+        texts = [item for item in result if isinstance(item, str)]
+        return bool(texts) and all(is_success_result(text) for text in texts)
+
+    data = decode_result(result)
+    if isinstance(data, list):
+        return True
+    if not isinstance(data, dict):
+        return False
+    if "status" in data and str(data["status"]) != "1":
+        return False
+    if data.get("errcode", 0) not in (0, "0"):
+        return False
+    info = data.get("info")
+    if isinstance(info, str) and info and info.upper() != "OK":
+        return False
+    return "error" not in data
+
+
+def _text(value: Any) -> str:
+    """高德字段取值: 空列表/None 视为空字符串"""
+    if value is None or isinstance(value, (list, dict)):
+        return ""
+    return str(value).strip()
+
+
+def _location(value: Any) -> Optional[Dict[str, float]]:
+    """解析 "lng,lat" 形式的坐标"""
+    if isinstance(value, dict):
+        return value if "longitude" in value and "latitude" in value else None
+    try:
+        lng, lat = _text(value).split(",")
+        return {"longitude": float(lng), "latitude": float(lat)}
+    except ValueError:
+        return None
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(_text(value))
+    except ValueError:
+        return default
+
+
+def parse_pois(result: Any) -> List[POIInfo]:
+    """
+    解析maps_text_search / maps_around_search的输出
+
+    Args:
+        result: 工具输出
+
+    Returns:
+        POI列表(跳过缺少名称或坐标的项)
+    """
+    data = decode_result(result)
+    pois = data.get("pois") if isinstance(data, dict) else data
+    if not isinstance(pois, list):
+        return []
+
+    parsed = []
+    for poi in pois:
+        if not isinstance(poi, dict):
+            continue
+        location = _location(poi.get("location"))
+        if location is None:
+            continue
+        try:
+            parsed.append(POIInfo.model_validate({
+                "id": _text(poi.get("id")),
+                "name": _text(poi.get("name")),
+                "type": _text(poi.get("type") or poi.get("typecode")),
+                "address": _text(poi.get("address")),
+                "location": location,
+                "tel": _text(poi.get("tel")) or None,
+            }))
+        except ValidationError:
+            continue
+    return [poi for poi in parsed if poi.name]
+
+
+def parse_weather(result: Any) -> List[WeatherInfo]:
+    """
+    解析maps_weather的输出
+
+    兼容 {"forecasts": [{...每日...}]} 与高德Web服务的 {"forecasts": [{"casts": [...]}]} 两种结构
+
+    Args:
+        result: 工具输出
+
+    Returns:
+        每日天气列表
+    """
+    data = decode_result(result)
+    if not isinstance(data, dict):
+        return []
+
+    forecasts = data.get("forecasts") or []
+    if forecasts and isinstance(forecasts[0], dict) and "casts" in forecasts[0]:
+        forecasts = forecasts[0].get("casts") or []
+
+    parsed = []
+    for cast in forecasts:
+        if not isinstance(cast, dict) or not cast.get("date"):
+            continue
+        parsed.append(WeatherInfo.model_validate({
+            "date": _text(cast.get("date")),
+            "day_weather": _text(cast.get("dayweather")),
+            "night_weather": _text(cast.get("nightweather")),
+            "day_temp": _text(cast.get("daytemp")),
+            "night_temp": _text(cast.get("nighttemp")),
+            "wind_direction": _text(cast.get("daywind")),
+            "wind_power": _text(cast.get("daypower")),
+        }))
+    return parsed
+
+
+def _route_description(path: Dict[str, Any]) -> str:
+    """路线描述: 步行/驾车取各步骤的导航指示,公交取各段的线路名称"""
+    steps = [_text(step.get("instruction")) for step in path.get("steps") or [] if isinstance(step, dict)]
+    if steps:
+        return ";".join(step for step in steps if step)
+
+    lines = []
+    for segment in path.get("segments") or []:
+        if not isinstance(segment, dict):
+            continue
+        buslines = (segment.get("bus") or {}).get("buslines") or []
+        if buslines and isinstance(buslines[0], dict):
+            lines.append(_text(buslines[0].get("name")))
+        elif isinstance(segment.get("walking"), dict) and segment["walking"].get("distance"):
+            lines.append(f"步行{_text(segment['walking'].get('distance'))}米")
+    return " → ".join(line for line in lines if line)
+
+
+def parse_route(result: Any, route_type: str) -> Optional[RouteInfo]:
+    """
+    解析路径规划工具的输出,取第一条方案
+
+    兼容 {"route": {"paths"/"transits": [...]}} 与直接包含 paths/transits 的结构
+
+    Args:
+        result: 工具输出
+        route_type: 路线类型 (walking/driving/transit)
+
+    Returns:
+        路线信息,无方案时返回None
+    """
+    data = decode_result(result)
+    if not isinstance(data, dict):
+        return None
+
+    route = data.get("route") if isinstance(data.get("route"), dict) else data
+    if isinstance(route.get("data"), dict):
+        route = route["data"]
+    paths = route.get("paths") or route.get("transits") or []
+    if not paths or not isinstance(paths[0], dict):
+        return None
+
+    path = paths[0]
+    return RouteInfo.model_validate({
+        "distance": _number(path.get("distance"), _number(route.get("distance"))),
+        "duration": int(_number(path.get("duration"))),
+        "route_type": route_type,
+        "description": _route_description(path),
+    })
+
+
+def parse_geocode(result: Any) -> Optional[Location]:
+    """
+    解析maps_geo的输出,取第一个匹配结果的坐标
+
+    Args:
+        result: 工具输出
+
+    Returns:
+        经纬度坐标,无结果时返回None
+    """
+    data = decode_result(result)
+    if isinstance(data, dict):
+        candidates = data.get("geocodes") or data.get("results") or [data]
+    elif isinstance(data, list):
+        candidates = data
+    else:
+        return None
+
+    for candidate in candidates:
+        if isinstance(candidate, dict):
+            location = _location(candidate.get("location"))
+            if location is not None:
+                return Location.model_validate(location)
+    return None
+
+
+def parse_poi_detail(result: Any) -> Dict[str, Any]:
+    """
+    解析maps_search_detail的输出
+
+    Args:
+        result: 工具输出
+
+    Returns:
+        POI详情字典,无法解码时返回 {"raw": 原始输出}
+    """
+    data = decode_result(result)
+    if isinstance(data, dict):
+        pois = data.get("pois")
+        if isinstance(pois, list) and pois and isinstance(pois[0], dict):
+            return pois[0]
+        return data
+    return {"raw": result}
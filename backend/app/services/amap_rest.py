@@ -0,0 +1,358 @@
+"""高德Web服务REST后端 - 直接以异步HTTP调用高德API,替代MCP子进程
+
+与高德MCP服务器提供同名工具(maps_text_search、maps_weather等),
+工具输出为高德REST接口返回的JSON(去掉status/info等状态字段),
+与MCP工具输出格式一致,下游的POI解析、表格投影和缓存均无需区分后端。
+"""
+
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+from langchain_core.tools import StructuredTool
+from pydantic import BaseModel, Field
+from ..config import get_settings
+
+
+# 高德REST响应中的状态字段,工具输出时去掉
+_STATUS_FIELDS = ("status", "info", "infocode", "errcode", "errmsg", "errdetail")
+
+
+class AmapRestError(RuntimeError):
+    """高德REST接口返回错误"""
+
+
+class AmapRestClient:
+    """
+    高德Web服务异步客户端
+
+    - 单个 httpx.AsyncClient 复用keep-alive连接,并发请求共享连接池
+    - base_url 可配置,便于指向本地桩服务器测试
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://restapi.amap.com",
+        timeout: float = 10.0,
+        max_connections: int = 20
+    ):
+        """
+        初始化
+
+        Args:
+            api_key: 高德Web服务Key
+            base_url: 接口地址
+            timeout: 单次请求超时(秒)
+            max_connections: 连接池最大连接数(同时也是保持的keep-alive连接数)
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.requests = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    async def request(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        调用高德REST接口
+
+        Args:
+            path: 接口路径,如 /v3/place/text
+            params: 查询参数(值为None的参数会被忽略)
+
+        Returns:
+            响应JSON
+
+        Raises:
+            AmapRestError: HTTP错误或高德返回 status != 1
+        """
+        query = {key: value for key, value in params.items() if value is not None and value != ""}
+        query["key"] = self.api_key
+
+        self.requests += 1
+        try:
+            response = await self._get_client().get(path, params=query)
+            response.raise_for_status()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise AmapRestError(f"高德接口 {path} 请求失败: {str(e)}") from e
+
+        # v3接口用 status="1" 表示成功, v4接口用 errcode=0
+        if str(data.get("status", "1")) != "1" or data.get("errcode", 0) not in (0, "0"):
+            raise AmapRestError(
+                f"高德接口 {path} 返回错误: {data.get('info') or data.get('errmsg')} "
+                f"({data.get('infocode') or data.get('errcode')})"
+            )
+        return data
+
+    async def close(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """客户端状态"""
+        return {
+            "base_url": self.base_url,
+            "requests": self.requests,
+            "max_connections": self.max_connections,
+        }
+
+    # ============ 工具实现(与高德MCP服务器同名同参) ============
+
+    async def text_search(self, keywords: str, city: str = "", citylimit: str = "false", page: str = "1") -> str:
+        data = await self.request("/v3/place/text", {
+            "keywords": keywords, "city": city, "citylimit": citylimit,
+            "page": page, "offset": 20, "extensions": "all"
+        })
+        return _dump(data)
+
+    async def around_search(self, location: str, radius: str = "1000", keywords: str = "") -> str:
+        data = await self.request("/v3/place/around", {
+            "location": location, "radius": radius, "keywords": keywords, "extensions": "all"
+        })
+        return _dump(data)
+
+    async def search_detail(self, id: str) -> str:
+        data = await self.request("/v3/place/detail", {"id": id, "extensions": "all"})
+        pois = data.get("pois") or []
+        return _dump(pois[0] if pois else data)
+
+    async def weather(self, city: str) -> str:
+        # 天气接口只接受adcode,城市名先经地理编码转换
+        adcode = city if city.isdigit() else await self._adcode(city)
+        data = await self.request("/v3/weather/weatherInfo", {"city": adcode, "extensions": "all"})
+        return _dump(data)
+
+    async def geo(self, address: str, city: str = "") -> str:
+        data = await self.request("/v3/geocode/geo", {"address": address, "city": city})
+        return _dump(data)
+
+    async def regeocode(self, location: str) -> str:
+        data = await self.request("/v3/geocode/regeo", {"location": location})
+        return _dump(data)
+
+    async def ip_location(self, ip: str) -> str:
+        data = await self.request("/v3/ip", {"ip": ip})
+        return _dump(data)
+
+    async def distance(self, origins: str, destination: str, type: str = "1") -> str:
+        data = await self.request("/v3/distance", {"origins": origins, "destination": destination, "type": type})
+        return _dump(data)
+
+    async def direction_walking(self, origin: str, destination: str) -> str:
+        data = await self.request("/v3/direction/walking", {"origin": origin, "destination": destination})
+        return _dump(data)
+
+    async def direction_driving(self, origin: str, destination: str) -> str:
+        data = await self.request("/v3/direction/driving", {"origin": origin, "destination": destination})
+        return _dump(data)
+
+    async def direction_bicycling(self, origin: str, destination: str) -> str:
+        data = await self.request("/v4/direction/bicycling", {"origin": origin, "destination": destination})
+        return _dump(data.get("data", data))
+
+    async def direction_transit_integrated(
+        self, origin: str, destination: str, city: str = "", cityd: str = ""
+    ) -> str:
+        data = await self.request("/v3/direction/transit/integrated", {
+            "origin": origin, "destination": destination, "city": city, "cityd": cityd or city
+        })
+        return _dump(data)
+
+    async def direction_walking_by_address(
+        self, origin_address: str, destination_address: str, origin_city: str = "", destination_city: str = ""
+    ) -> str:
+        origin, destination = await self._locate_pair(
+            origin_address, destination_address, origin_city, destination_city
+        )
+        return await self.direction_walking(origin, destination)
+
+    async def direction_driving_by_address(
+        self, origin_address: str, destination_address: str, origin_city: str = "", destination_city: str = ""
+    ) -> str:
+        origin, destination = await self._locate_pair(
+            origin_address, destination_address, origin_city, destination_city
+        )
+        return await self.direction_driving(origin, destination)
+
+    async def direction_transit_integrated_by_address(
+        self, origin_address: str, destination_address: str, origin_city: str = "", destination_city: str = ""
+    ) -> str:
+        origin, destination = await self._locate_pair(
+            origin_address, destination_address, origin_city, destination_city
+        )
+        return await self.direction_transit_integrated(origin, destination, origin_city, destination_city)
+
+    async def _geocode_first(self, address: str, city: str = "") -> Dict[str, Any]:
+        data = await self.request("/v3/geocode/geo", {"address": address, "city": city})
+        geocodes = data.get("geocodes") or []
+        if not geocodes:
+            raise AmapRestError(f"无法解析地址: {address}")
+        return geocodes[0]
+
+    async def _adcode(self, city: str) -> str:
+        return (await self._geocode_first(city)).get("adcode") or city
+
+    async def _locate_pair(self, origin_address: str, destination_address: str, origin_city: str, destination_city: str):
+        origin = await self._geocode_first(origin_address, origin_city)
+        destination = await self._geocode_first(destination_address, destination_city)
+        return origin.get("location"), destination.get("location")
+
+
+def _dump(data: Any) -> str:
+    """去掉状态字段后序列化为JSON字符串"""
+    if isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key not in _STATUS_FIELDS}
+    return json.dumps(data, ensure_ascii=False)
+
+
+# ============ LangChain工具定义 ============
+
+class _TextSearchInput(BaseModel):
+    keywords: str = Field(description="搜索关键词")
+    city: str = Field(default="", description="查询城市")
+    citylimit: str = Field(default="false", description="是否强制限制在设置的城市内搜索, true/false")
+    page: str = Field(default="1", description="结果页码")
+
+
+class _AroundSearchInput(BaseModel):
+    location: str = Field(description="中心点经纬度, 格式: 经度,纬度")
+    radius: str = Field(default="1000", description="搜索半径(米)")
+    keywords: str = Field(default="", description="搜索关键词")
+
+
+class _DetailInput(BaseModel):
+    id: str = Field(description="POI ID")
+
+
+class _WeatherInput(BaseModel):
+    city: str = Field(description="城市名称或adcode")
+
+
+class _GeoInput(BaseModel):
+    address: str = Field(description="结构化地址信息")
+    city: str = Field(default="", description="指定查询的城市")
+
+
+class _RegeoInput(BaseModel):
+    location: str = Field(description="经纬度, 格式: 经度,纬度")
+
+
+class _IpInput(BaseModel):
+    ip: str = Field(description="IP地址")
+
+
+class _DistanceInput(BaseModel):
+    origins: str = Field(description="起点经纬度,可多个,用|分隔")
+    destination: str = Field(description="终点经纬度")
+    type: str = Field(default="1", description="距离测量类型: 0直线距离, 1驾车距离, 3步行距离")
+
+
+class _DirectionInput(BaseModel):
+    origin: str = Field(description="起点经纬度, 格式: 经度,纬度")
+    destination: str = Field(description="终点经纬度, 格式: 经度,纬度")
+
+
+class _TransitInput(_DirectionInput):
+    city: str = Field(default="", description="起点城市")
+    cityd: str = Field(default="", description="终点城市")
+
+
+class _DirectionByAddressInput(BaseModel):
+    origin_address: str = Field(description="起点地址")
+    destination_address: str = Field(description="终点地址")
+    origin_city: str = Field(default="", description="起点城市")
+    destination_city: str = Field(default="", description="终点城市")
+
+
+# 工具名 -> (客户端方法名, 参数模型, 描述)
+REST_TOOL_SPECS: Dict[str, tuple] = {
+    "maps_text_search": ("text_search", _TextSearchInput, "关键词搜索POI,返回POI列表(名称、地址、坐标、评分等)"),
+    "maps_around_search": ("around_search", _AroundSearchInput, "周边搜索,根据中心点坐标和半径搜索POI"),
+    "maps_search_detail": ("search_detail", _DetailInput, "查询POI详细信息(营业时间、评分、图片等)"),
+    "maps_weather": ("weather", _WeatherInput, "根据城市名称或adcode查询未来几天的天气预报"),
+    "maps_geo": ("geo", _GeoInput, "地理编码,将地址转换为经纬度坐标"),
+    "maps_regeocode": ("regeocode", _RegeoInput, "逆地理编码,将经纬度坐标转换为地址"),
+    "maps_ip_location": ("ip_location", _IpInput, "IP定位,根据IP地址获取所在城市"),
+    "maps_distance": ("distance", _DistanceInput, "测量两点间的驾车、步行或直线距离"),
+    "maps_direction_walking": ("direction_walking", _DirectionInput, "步行路径规划(坐标)"),
+    "maps_direction_driving": ("direction_driving", _DirectionInput, "驾车路径规划(坐标)"),
+    "maps_direction_bicycling": ("direction_bicycling", _DirectionInput, "骑行路径规划(坐标)"),
+    "maps_direction_transit_integrated": ("direction_transit_integrated", _TransitInput, "公共交通路径规划(坐标)"),
+    "maps_direction_walking_by_address": (
+        "direction_walking_by_address", _DirectionByAddressInput, "步行路径规划(地址)"
+    ),
+    "maps_direction_driving_by_address": (
+        "direction_driving_by_address", _DirectionByAddressInput, "驾车路径规划(地址)"
+    ),
+    "maps_direction_transit_integrated_by_address": (
+        "direction_transit_integrated_by_address", _DirectionByAddressInput, "公共交通路径规划(地址)"
+    ),
+}
+
+
+def build_rest_tools(client: AmapRestClient) -> List[StructuredTool]:
+    """
+    构建与高德MCP工具同名的LangChain工具
+
+    Args:
+        client: 高德REST客户端
+
+    Returns:
+        LangChain工具列表
+    """
+    tools = []
+    for name, (method, args_schema, description) in REST_TOOL_SPECS.items():
+        coroutine: Callable[..., Awaitable[str]] = getattr(client, method)
+        tools.append(StructuredTool.from_function(
+            coroutine=coroutine,
+            name=name,
+            description=description,
+            args_schema=args_schema
+        ))
+    return tools
+
+
+# 全局客户端实例
+_amap_rest_client = None
+
+
+def get_amap_rest_client() -> AmapRestClient:
+    """获取高德REST客户端实例(单例模式)"""
+    global _amap_rest_client
+
+    if _amap_rest_client is None:
+        settings = get_settings()
+        if not settings.amap_api_key:
+            raise ValueError("高德地图API Key未配置,请在.env文件中设置AMAP_API_KEY")
+        _amap_rest_client = AmapRestClient(
+            api_key=settings.amap_api_key,
+            base_url=settings.amap_rest_base_url,
+            timeout=settings.amap_rest_timeout,
+            max_connections=settings.amap_rest_max_connections
+        )
+
+    return _amap_rest_client
+
+
+async def close_amap_rest_client():
+    """关闭高德REST客户端的连接池"""
+    global _amap_rest_client
+
+    if _amap_rest_client is not None:
+        await _amap_rest_client.close()
+        _amap_rest_client = None
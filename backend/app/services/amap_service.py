@@ -1,9 +1,14 @@
 """高德地图服务封装"""
 
-from typing import List, Dict, Any, Optional
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 from ..config import get_settings
-from ..models.schemas import Location, POIInfo, WeatherInfo
+from ..models.schemas import Location, POIInfo, RouteInfo, WeatherInfo
 from .langchain_tools import call_tool
+from .tool_cache import get_tool_cache
+from .amap_parsers import (
+    decode_result, is_success_result, parse_pois, parse_weather, parse_route, parse_geocode, parse_poi_detail
+)
 
 
 class AmapService:
@@ -36,18 +41,40 @@ class AmapService:
                 }
             )
             
-            # 解析结果
-            # 注意: MCP工具返回的是字符串,需要解析
-            # 这里简化处理,实际应该解析JSON
-            print(f"POI搜索结果: {result[:200]}...")  # 打印前200字符
-            
-            # TODO: 解析实际的POI数据
-            return []
+            return parse_pois(result)
             
         except Exception as e:
             print(f"❌ POI搜索失败: {str(e)}")
             return []
     
+    async def search_nearby(self, location: Location, radius: int = 1000, keywords: str = "") -> List[POIInfo]:
+        """
+        周边搜索POI
+
+        Args:
+            location: 中心点
+            radius: 搜索半径(米)
+            keywords: 搜索关键词
+
+        Returns:
+            POI信息列表
+        """
+        try:
+            result = await call_tool(
+                "maps_around_search",
+                {
+                    "location": f"{location.longitude},{location.latitude}",
+                    "radius": str(radius),
+                    "keywords": keywords
+                }
+            )
+
+            return parse_pois(result)
+
+        except Exception as e:
+            print(f"❌ 周边搜索失败: {str(e)}")
+            return []
+
     async def get_weather(self, city: str) -> List[WeatherInfo]:
         """
         查询天气
@@ -65,10 +92,7 @@ class AmapService:
                 {"city": city}
             )
             
-            print(f"天气查询结果: {result[:200]}...")
-            
-            # TODO: 解析实际的天气数据
-            return []
+            return parse_weather(result)
             
         except Exception as e:
             print(f"❌ 天气查询失败: {str(e)}")
@@ -81,7 +105,7 @@ class AmapService:
         origin_city: Optional[str] = None,
         destination_city: Optional[str] = None,
         route_type: str = "walking"
-    ) -> Dict[str, Any]:
+    ) -> Optional[RouteInfo]:
         """
         规划路线
         
@@ -93,7 +117,7 @@ class AmapService:
             route_type: 路线类型 (walking/driving/transit)
             
         Returns:
-            路线信息
+            路线信息,规划失败时返回None
         """
         try:
             # 根据路线类型选择工具
@@ -130,14 +154,11 @@ class AmapService:
                 arguments
             )
             
-            print(f"路线规划结果: {result[:200]}...")
-            
-            # TODO: 解析实际的路线数据
-            return {}
+            return parse_route(result, route_type)
             
         except Exception as e:
             print(f"❌ 路线规划失败: {str(e)}")
-            return {}
+            return None
     
     async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Location]:
         """
@@ -160,10 +181,7 @@ class AmapService:
                 arguments
             )
 
-            print(f"地理编码结果: {result[:200]}...")
-
-            # TODO: 解析实际的坐标数据
-            return None
+            return parse_geocode(result)
 
         except Exception as e:
             print(f"❌ 地理编码失败: {str(e)}")
@@ -180,28 +198,61 @@ class AmapService:
             POI详情信息
         """
         try:
-            result = await call_tool(
-                "maps_search_detail",
-                {"id": poi_id}
-            )
+            return await self._fetch_poi_detail(poi_id)
 
-            print(f"POI详情结果: {result[:200]}...")
+        except Exception as e:
+            print(f"❌ 获取POI详情失败: {str(e)}")
+            return {}
 
-            # 解析结果并提取图片
-            import json
-            import re
+    async def get_poi_details(
+        self,
+        poi_ids: List[str],
+        concurrency: int = 5
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """
+        批量获取POI详情
 
-            # 尝试从结果中提取JSON
-            json_match = re.search(r'\{.*\}', result, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
-                return data
+        已缓存的POI直接返回,其余POI在信号量限制下并发查询。
 
-            return {"raw": result}
+        Args:
+            poi_ids: POI ID列表(重复的ID只查询一次)
+            concurrency: 同时进行的查询数上限
 
-        except Exception as e:
-            print(f"❌ 获取POI详情失败: {str(e)}")
-            return {}
+        Returns:
+            (POI ID -> 详情, POI ID -> 错误信息)
+        """
+        tool_cache = get_tool_cache()
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def fetch(poi_id: str) -> Dict[str, Any]:
+            if tool_cache is not None and tool_cache.contains("maps_search_detail", {"id": poi_id}):
+                return await self._fetch_poi_detail(poi_id)
+            async with semaphore:
+                return await self._fetch_poi_detail(poi_id)
+
+        unique_ids = list(dict.fromkeys(poi_ids))
+        results = await asyncio.gather(*(fetch(poi_id) for poi_id in unique_ids), return_exceptions=True)
+
+        details: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, str] = {}
+        for poi_id, result in zip(unique_ids, results):
+            if isinstance(result, Exception):
+                errors[poi_id] = str(result)
+            else:
+                details[poi_id] = result
+        return details, errors
+
+    async def _fetch_poi_detail(self, poi_id: str) -> Dict[str, Any]:
+        """查询单个POI详情,失败(包括高德以普通文本返回的错误,如ID无效、配额超限)时抛出异常"""
+        result = await call_tool(
+            "maps_search_detail",
+            {"id": poi_id}
+        )
+        if not is_success_result(result):
+            data = decode_result(result)
+            info = data.get("info") if isinstance(data, dict) else None
+            raise ValueError(f"高德返回错误: {info or str(result)[:200]}")
+        return parse_poi_detail(result)
 
 
 # 创建全局服务实例
@@ -0,0 +1,84 @@
+"""预算计算服务 - 根据行程中的各项费用确定性地汇总预算"""
+
+from typing import Callable, Dict
+from ..models.schemas import Budget, TripPlan
+from .distance_service import get_distance_service
+
+
+def _walking_fare(km: float) -> float:
+    """步行: 不产生费用"""
+    return 0.0
+
+
+def _transit_fare(km: float) -> float:
+    """公共交通: 起步2元含6公里,之后每10公里加1元(参照主要城市地铁票价)"""
+    return 2.0 + max(0.0, (km - 6.0) / 10.0)
+
+
+def _taxi_fare(km: float) -> float:
+    """出租车: 起步13元含3公里,之后每公里2.5元"""
+    return 13.0 + max(0.0, km - 3.0) * 2.5
+
+
+def _driving_fare(km: float) -> float:
+    """自驾: 油费约每公里0.8元,每段另计停车费10元"""
+    return km * 0.8 + 10.0
+
+
+# 交通方式关键词 -> 单段费用估算(元), 按顺序匹配
+TRANSPORT_FARES: Dict[str, Callable[[float], float]] = {
+    "步行": _walking_fare,
+    "自驾": _driving_fare,
+    "驾车": _driving_fare,
+    "打车": _taxi_fare,
+    "出租": _taxi_fare,
+    "网约车": _taxi_fare,
+    "公共交通": _transit_fare,
+    "公交": _transit_fare,
+    "地铁": _transit_fare,
+}
+
+
+def fare_function(transportation: str) -> Callable[[float], float]:
+    """根据交通方式描述选择费用估算函数,无法识别时按公共交通估算"""
+    for keyword, fare in TRANSPORT_FARES.items():
+        if keyword in (transportation or ""):
+            return fare
+    return _transit_fare
+
+
+def compute_budget(plan: TripPlan) -> Budget:
+    """
+    由行程中的各项费用汇总预算
+
+    - 景点: 所有景点 ticket_price 之和
+    - 酒店: 除最后一天外每天(即每晚)的酒店 estimated_cost 之和
+    - 餐饮: 所有餐饮 estimated_cost 之和
+    - 交通: 按每天 酒店->景点->...->酒店 各段的直线距离和当天交通方式估算
+
+    Args:
+        plan: 旅行计划
+
+    Returns:
+        预算信息
+    """
+    distance_service = get_distance_service()
+
+    total_attractions = sum(a.ticket_price for day in plan.days for a in day.attractions)
+    total_meals = sum(m.estimated_cost for day in plan.days for m in day.meals)
+    nights = plan.days[:-1]
+    total_hotels = sum(day.hotel.estimated_cost for day in nights if day.hotel)
+
+    total_transportation = 0.0
+    for day in plan.days:
+        fare = fare_function(day.transportation)
+        total_transportation += sum(fare(km) for km in distance_service.day_legs(day))
+    total_transportation = int(round(total_transportation))
+
+    return Budget(
+        total_attractions=total_attractions,
+        total_hotels=total_hotels,
+        total_meals=total_meals,
+        total_transportation=total_transportation,
+        total=total_attractions + total_hotels + total_meals + total_transportation,
+    )
@@ -0,0 +1,413 @@
+"""城市离线快照 - 预先抓取热门城市的景点和酒店POI,以列式文件保存并在启动时内存映射
+
+每个城市一份快照,由三个文件组成:
+    <城市>.json                    元数据: 版本、各关键词的搜索结果(行号列表)
+    <城市>-<版本>.rows.npy          定长列: id、经纬度、评分、人均、字符串偏移、最近出现时间
+    <城市>-<版本>.strings.bin       名称/地址/类型的UTF-8字节串
+
+.npy 以 mmap_mode="r" 加载,字符串文件用 mmap 映射,查询时只解码用到的行。
+写入时先写新版本的数据文件,最后原子替换元数据,正在运行的服务不会读到半份快照。
+"""
+
+import json
+import math
+import mmap
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from ..config import get_settings
+from .poi_index import normalize_city
+from .poi_utils import merge_poi_results
+from .tool_projection import PoiRecord, to_poi_record
+
+
+KIND_ATTRACTION = "attraction"
+KIND_HOTEL = "hotel"
+
+ROW_DTYPE = np.dtype([
+    ("id", "S24"),
+    ("lng", "<f8"),
+    ("lat", "<f8"),
+    ("rating", "<f4"),      # 无评分时为NaN
+    ("cost", "<f4"),        # 无人均/价格时为NaN
+    ("name_off", "<u4"), ("name_len", "<u2"),
+    ("address_off", "<u4"), ("address_len", "<u2"),
+    ("type_off", "<u4"), ("type_len", "<u2"),
+    ("seen_at", "<f8"),     # 最近一次抓取到该POI的时间
+])
+
+FORMAT_VERSION = 1
+
+
+def _float(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _format_number(value: float) -> str:
+    if math.isnan(value):
+        return ""
+    return f"{value:g}"
+
+
+class CitySnapshot:
+    """单个城市的只读快照(内存映射)"""
+
+    def __init__(self, meta: Dict[str, Any], rows: np.ndarray, strings: Optional[mmap.mmap]):
+        self.meta = meta
+        self.city: str = meta["city"]
+        self.version: str = meta["version"]
+        self.created_at: float = meta["created_at"]
+        self.rows = rows
+        self._strings = strings
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    def search(self, kind: str, keywords: str, pages: int = 1) -> Optional[List[List[int]]]:
+        """
+        查询某个关键词在快照中的搜索结果
+
+        Args:
+            kind: KIND_ATTRACTION / KIND_HOTEL
+            keywords: 搜索关键词
+            pages: 需要的结果页数
+
+        Returns:
+            每页的行号列表,快照中没有该关键词或页数不足时返回None
+        """
+        page_rows = self.meta["searches"].get(kind, {}).get(keywords)
+        if page_rows is None or len(page_rows) < pages:
+            return None
+        return page_rows[:pages]
+
+    def records(self, rows: Iterable[int]) -> List[PoiRecord]:
+        """按行号解码POI记录"""
+        return [self._record(int(row)) for row in rows]
+
+    def merged_records(self, result_lists: List[List[int]], limit: int = 0) -> List[PoiRecord]:
+        """合并多次搜索的行号列表(规则同 merge_poi_results)并解码"""
+        rows = merge_poi_results(result_lists, limit=limit, key_func=lambda row: row)
+        return self.records(rows)
+
+    def close(self):
+        if self._strings is not None:
+            self._strings.close()
+            self._strings = None
+
+    def _string(self, offset: int, length: int) -> str:
+        if not length or self._strings is None:
+            return ""
+        return self._strings[offset:offset + length].decode("utf-8")
+
+    def _full_type(self, row: int) -> str:
+        item = self.rows[row]
+        return self._string(int(item["type_off"]), int(item["type_len"]))
+
+    def _record(self, row: int) -> PoiRecord:
+        item = self.rows[row]
+        return PoiRecord(
+            id=item["id"].decode("utf-8"),
+            name=self._string(int(item["name_off"]), int(item["name_len"])),
+            address=self._string(int(item["address_off"]), int(item["address_len"])),
+            lng=float(item["lng"]),
+            lat=float(item["lat"]),
+            rating=_format_number(float(item["rating"])),
+            cost=_format_number(float(item["cost"])),
+            type=self._full_type(row).split(";")[-1],
+        )
+
+
+class _SnapshotBuilder:
+    """构建新版本快照: 以已有快照为基础,按POI id增量合并新抓取的POI"""
+
+    def __init__(self, city: str, base: Optional[CitySnapshot]):
+        self.city = city
+        self.now = time.time()
+        # POI id -> (记录, 完整类型, 最近出现时间)
+        self.pois: Dict[str, Tuple[PoiRecord, str, float]] = {}
+        self.order: List[str] = []
+        self.searches: Dict[str, Dict[str, List[List[str]]]] = {KIND_ATTRACTION: {}, KIND_HOTEL: {}}
+
+        if base is not None:
+            for row in range(base.size):
+                record = base._record(row)
+                self._put(record, base._full_type(row), float(base.rows[row]["seen_at"]))
+            for kind, searches in base.meta["searches"].items():
+                for keywords, pages in searches.items():
+                    self.searches.setdefault(kind, {})[keywords] = [
+                        [base.rows[row]["id"].decode("utf-8") for row in page] for page in pages
+                    ]
+
+    def add_search(self, kind: str, keywords: str, pages: List[List[Dict[str, Any]]]) -> int:
+        """
+        加入一个关键词的搜索结果(覆盖该关键词之前的结果)
+
+        Returns:
+            新增的POI数
+        """
+        before = len(self.pois)
+        id_pages = []
+        for pois in pages:
+            ids = []
+            for poi in pois:
+                record = to_poi_record(poi)
+                if record is None or record.lng is None or record.lat is None or not record.id:
+                    continue
+                full_type = poi.get("type") if isinstance(poi.get("type"), str) else record.type
+                self._put(record, full_type, self.now)
+                ids.append(record.id)
+            id_pages.append(ids)
+        self.searches.setdefault(kind, {})[keywords] = id_pages
+        return len(self.pois) - before
+
+    def prune(self, max_age: float):
+        """去掉超过max_age秒未再出现、且不在任何搜索结果中的POI"""
+        referenced = {
+            poi_id
+            for searches in self.searches.values()
+            for pages in searches.values()
+            for page in pages
+            for poi_id in page
+        }
+        cutoff = self.now - max_age
+        self.order = [
+            poi_id for poi_id in self.order
+            if poi_id in referenced or self.pois[poi_id][2] >= cutoff
+        ]
+        self.pois = {poi_id: self.pois[poi_id] for poi_id in self.order}
+
+    def build(self) -> Tuple[Dict[str, Any], np.ndarray, bytes]:
+        """生成 (元数据, 行数组, 字符串字节)"""
+        rows = np.zeros(len(self.order), dtype=ROW_DTYPE)
+        strings = bytearray()
+        row_of: Dict[str, int] = {}
+
+        def put_string(value: str) -> Tuple[int, int]:
+            # 长度列为u2,按字符截断避免切断多字节字符
+            data = value[:16000].encode("utf-8")
+            offset = len(strings)
+            strings.extend(data)
+            return offset, len(data)
+
+        for i, poi_id in enumerate(self.order):
+            record, full_type, seen_at = self.pois[poi_id]
+            row_of[poi_id] = i
+            item = rows[i]
+            item["id"] = poi_id.encode("utf-8")[:24]
+            item["lng"] = record.lng
+            item["lat"] = record.lat
+            item["rating"] = _float(record.rating)
+            item["cost"] = _float(record.cost)
+            item["name_off"], item["name_len"] = put_string(record.name)
+            item["address_off"], item["address_len"] = put_string(record.address)
+            item["type_off"], item["type_len"] = put_string(full_type)
+            item["seen_at"] = seen_at
+
+        searches = {
+            kind: {
+                keywords: [[row_of[poi_id] for poi_id in page if poi_id in row_of] for page in pages]
+                for keywords, pages in kind_searches.items()
+            }
+            for kind, kind_searches in self.searches.items()
+        }
+        meta = {
+            "format": FORMAT_VERSION,
+            "city": self.city,
+            "version": time.strftime("%Y%m%d%H%M%S", time.localtime(self.now)) + f"{int(self.now * 1000) % 1000:03d}",
+            "created_at": self.now,
+            "rows": len(rows),
+            "searches": searches,
+        }
+        return meta, rows, bytes(strings)
+
+    def _put(self, record: PoiRecord, full_type: str, seen_at: float):
+        if record.id not in self.pois:
+            self.order.append(record.id)
+        self.pois[record.id] = (record, full_type, seen_at)
+
+
+class CitySnapshotStore:
+    """
+    城市快照存储
+
+    - get(): 首次访问某城市时映射其快照文件,之后直接复用;元数据文件变化(预取脚本写入了新版本,
+      或之前不存在的城市有了快照)时重新映射;超过max_age的快照视为不存在
+    - builder()/write(): 供预取脚本增量生成新版本
+    """
+
+    def __init__(self, directory: str, max_age: float):
+        """
+        初始化
+
+        Args:
+            directory: 快照目录
+            max_age: 快照有效期(秒)
+        """
+        self.directory = directory
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        # 城市 -> 快照;同时记录映射时元数据文件的修改时间,用于发现新版本
+        self._snapshots: Dict[str, Optional[CitySnapshot]] = {}
+        self._signatures: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, city: str) -> Optional[CitySnapshot]:
+        """
+        获取城市快照
+
+        Args:
+            city: 城市
+
+        Returns:
+            快照,不存在或已过期时返回None
+        """
+        city = normalize_city(city)
+        with self._lock:
+            snapshot = self._current(city)
+
+        if snapshot is None or time.time() - snapshot.created_at > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return snapshot
+
+    def preload(self, cities: Sequence[str]) -> int:
+        """
+        启动时映射各城市的快照
+
+        Returns:
+            成功加载的城市数
+        """
+        loaded = 0
+        for city in cities:
+            city = normalize_city(city)
+            with self._lock:
+                loaded += self._current(city) is not None
+        return loaded
+
+    def builder(self, city: str) -> _SnapshotBuilder:
+        """以现有快照(含已过期的)为基础创建构建器"""
+        city = normalize_city(city)
+        return _SnapshotBuilder(city, self._load(city))
+
+    def write(self, builder: _SnapshotBuilder) -> Dict[str, Any]:
+        """
+        写入新版本快照并切换
+
+        Returns:
+            新快照的元数据
+        """
+        meta, rows, strings = builder.build()
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, f"{builder.city}-{meta['version']}")
+
+        with open(f"{prefix}.strings.bin", "wb") as f:
+            f.write(strings)
+        with open(f"{prefix}.rows.npy", "wb") as f:
+            np.save(f, rows)
+
+        meta_path = self._meta_path(builder.city)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+        self._remove_old_versions(builder.city, meta["version"])
+        with self._lock:
+            previous = self._snapshots.pop(builder.city, None)
+            self._signatures.pop(builder.city, None)
+        if previous is not None:
+            previous.close()
+        return meta
+
+    def stats(self) -> Dict[str, Any]:
+        """快照命中统计"""
+        loaded = [s for s in self._snapshots.values() if s is not None]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cities": len(loaded),
+            "pois": sum(s.size for s in loaded),
+        }
+
+    def _current(self, city: str) -> Optional[CitySnapshot]:
+        """
+        已映射的快照,元数据文件变化时重新映射(调用方持有锁)
+
+        旧版本的映射不主动关闭,仍在使用它的请求读完后随引用释放。
+        """
+        signature = self._signature(city)
+        if city not in self._snapshots or self._signatures.get(city) != signature:
+            self._snapshots[city] = self._load(city) if signature is not None else None
+            self._signatures[city] = signature
+        return self._snapshots[city]
+
+    def _signature(self, city: str) -> Optional[int]:
+        """元数据文件的修改时间(纳秒),文件不存在时为None"""
+        try:
+            return os.stat(self._meta_path(city)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _meta_path(self, city: str) -> str:
+        return os.path.join(self.directory, f"{city}.json")
+
+    def _load(self, city: str) -> Optional[CitySnapshot]:
+        meta_path = self._meta_path(city)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != FORMAT_VERSION:
+                return None
+
+            prefix = os.path.join(self.directory, f"{city}-{meta['version']}")
+            rows = np.load(f"{prefix}.rows.npy", mmap_mode="r")
+            strings = None
+            if os.path.getsize(f"{prefix}.strings.bin") > 0:
+                with open(f"{prefix}.strings.bin", "rb") as f:
+                    strings = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return CitySnapshot(meta, rows, strings)
+        except Exception as e:
+            print(f"⚠️  加载城市快照失败({city}): {str(e)}")
+            return None
+
+    def _remove_old_versions(self, city: str, keep_version: str):
+        """删除旧版本的数据文件(已映射的旧文件在Linux下仍可继续读取)"""
+        keep = f"{city}-{keep_version}."
+        for name in os.listdir(self.directory):
+            if name.startswith(f"{city}-") and (name.endswith(".rows.npy") or name.endswith(".strings.bin")):
+                if not name.startswith(keep):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+
+# 全局快照存储实例
+_snapshot_store = None
+
+
+def get_snapshot_store() -> Optional[CitySnapshotStore]:
+    """获取城市快照存储实例(单例模式),未启用时返回None"""
+    global _snapshot_store
+
+    settings = get_settings()
+    if not settings.snapshot_enabled:
+        return None
+
+    if _snapshot_store is None:
+        _snapshot_store = CitySnapshotStore(
+            directory=settings.snapshot_dir,
+            max_age=settings.snapshot_max_age
+        )
+
+    return _snapshot_store
@@ -0,0 +1,198 @@
+"""距离计算服务 - 向量化计算地理位置之间的距离矩阵"""
+
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from ..models.schemas import Location, DayPlan
+
+
+# 地球平均半径(公里)
+EARTH_RADIUS_KM = 6371.0088
+
+METHOD_HAVERSINE = "haversine"
+METHOD_EQUIRECTANGULAR = "equirectangular"
+
+
+def haversine_matrix(
+    lng1: np.ndarray,
+    lat1: np.ndarray,
+    lng2: Optional[np.ndarray] = None,
+    lat2: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    球面距离矩阵(公里)
+
+    Args:
+        lng1, lat1: 起点经纬度数组(度), 长度m
+        lng2, lat2: 终点经纬度数组(度), 长度n, 为空时与起点相同
+
+    Returns:
+        m×n 距离矩阵
+    """
+    if lng2 is None or lat2 is None:
+        lng2, lat2 = lng1, lat1
+    lng1, lat1, lng2, lat2 = (np.radians(np.asarray(a, dtype=float)) for a in (lng1, lat1, lng2, lat2))
+
+    dlat = lat2[None, :] - lat1[:, None]
+    dlng = lng2[None, :] - lng1[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def equirectangular_matrix(
+    lng1: np.ndarray,
+    lat1: np.ndarray,
+    lng2: Optional[np.ndarray] = None,
+    lat2: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    等距圆柱近似距离矩阵(公里), 城市范围内误差很小且计算更快
+
+    参数与返回值同 haversine_matrix
+    """
+    if lng2 is None or lat2 is None:
+        lng2, lat2 = lng1, lat1
+    lng1, lat1, lng2, lat2 = (np.radians(np.asarray(a, dtype=float)) for a in (lng1, lat1, lng2, lat2))
+
+    mean_lat = (lat1[:, None] + lat2[None, :]) / 2
+    x = (lng2[None, :] - lng1[:, None]) * np.cos(mean_lat)
+    y = lat2[None, :] - lat1[:, None]
+    return EARTH_RADIUS_KM * np.hypot(x, y)
+
+
+_MATRIX_FUNCTIONS = {
+    METHOD_HAVERSINE: haversine_matrix,
+    METHOD_EQUIRECTANGULAR: equirectangular_matrix,
+}
+
+
+def _coords(locations: List[Location]) -> Tuple[np.ndarray, np.ndarray]:
+    """Location列表 -> (经度数组, 纬度数组)"""
+    return (
+        np.fromiter((loc.longitude for loc in locations), dtype=float, count=len(locations)),
+        np.fromiter((loc.latitude for loc in locations), dtype=float, count=len(locations)),
+    )
+
+
+def _locations_key(locations: List[Location]) -> Tuple[Tuple[float, float], ...]:
+    """坐标集合的缓存键(保留6位小数,约0.1米)"""
+    return tuple((round(loc.longitude, 6), round(loc.latitude, 6)) for loc in locations)
+
+
+class DistanceService:
+    """距离矩阵服务,对重复出现的坐标集合缓存计算结果"""
+
+    def __init__(self, max_entries: int = 256):
+        """
+        初始化服务
+
+        Args:
+            max_entries: 最多缓存的矩阵数量
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+
+    def matrix(
+        self,
+        origins: List[Location],
+        destinations: Optional[List[Location]] = None,
+        method: str = METHOD_HAVERSINE
+    ) -> np.ndarray:
+        """
+        计算距离矩阵(公里)
+
+        Args:
+            origins: 起点列表
+            destinations: 终点列表, 为空时计算起点之间的方阵
+            method: haversine / equirectangular
+
+        Returns:
+            只读的 len(origins)×len(destinations) 矩阵
+        """
+        if method not in _MATRIX_FUNCTIONS:
+            raise ValueError(f"不支持的距离计算方法: {method}")
+
+        key = (method, _locations_key(origins), _locations_key(destinations) if destinations is not None else None)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        lng1, lat1 = _coords(origins)
+        if destinations is None:
+            result = _MATRIX_FUNCTIONS[method](lng1, lat1)
+        else:
+            lng2, lat2 = _coords(destinations)
+            result = _MATRIX_FUNCTIONS[method](lng1, lat1, lng2, lat2)
+        result.setflags(write=False)
+
+        self._cache[key] = result
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    def distance(self, origin: Location, destination: Location) -> float:
+        """两点之间的球面距离(公里)"""
+        return float(haversine_matrix(
+            np.array([origin.longitude]), np.array([origin.latitude]),
+            np.array([destination.longitude]), np.array([destination.latitude])
+        )[0, 0])
+
+    def day_legs(self, day: DayPlan) -> List[float]:
+        """
+        单日行程各段的距离(公里)
+
+        路线为 酒店 -> 景点1 -> ... -> 景点n -> 酒店, 没有酒店坐标时只计算景点之间的路段
+
+        Args:
+            day: 单日行程
+
+        Returns:
+            各段距离列表
+        """
+        stops = [a.location for a in day.attractions]
+        hotel = day.hotel.location if day.hotel and day.hotel.location else None
+        if hotel is not None and stops:
+            stops = [hotel] + stops + [hotel]
+        if len(stops) < 2:
+            return []
+        lng, lat = _coords(stops)
+        return [float(d) for d in haversine_matrix(lng[:-1], lat[:-1], lng[1:], lat[1:]).diagonal()]
+
+    def annotate_day(self, day: DayPlan):
+        """
+        用真实距离填写酒店的 distance 字段(原地修改)
+
+        Args:
+            day: 单日行程
+        """
+        if not day.hotel or not day.hotel.location or not day.attractions:
+            return
+        distances = self.matrix([day.hotel.location], [a.location for a in day.attractions])[0]
+        nearest = int(np.argmin(distances))
+        day.hotel.distance = (
+            f"距{day.attractions[nearest].name}{distances[nearest]:.1f}公里,"
+            f"距当日景点平均{float(distances.mean()):.1f}公里"
+        )
+
+    def stats(self) -> dict:
+        """缓存命中统计"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+
+# 全局服务实例
+_distance_service = None
+
+
+def get_distance_service() -> DistanceService:
+    """获取距离计算服务实例(单例模式)"""
+    global _distance_service
+
+    if _distance_service is None:
+        _distance_service = DistanceService()
+
+    return _distance_service
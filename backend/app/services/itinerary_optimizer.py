@@ -0,0 +1,193 @@
+"""行程地理优化 - 将景点按地理位置聚类到各天,并确定每天的游览顺序"""
+
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+from ..models.schemas import Location
+from .distance_service import EARTH_RADIUS_KM, haversine_matrix
+
+Point = Tuple[float, float]
+
+
+def project_locations(locations: List[Location]) -> List[Point]:
+    """
+    将经纬度投影为以质心为原点的平面坐标(公里)
+
+    城市范围内等距圆柱投影的误差可以忽略,之后的聚类和路径计算都使用欧氏距离。
+    """
+    if not locations:
+        return []
+    lat0 = math.radians(sum(loc.latitude for loc in locations) / len(locations))
+    lng0 = sum(loc.longitude for loc in locations) / len(locations)
+    scale = math.pi / 180 * EARTH_RADIUS_KM
+    return [
+        ((loc.longitude - lng0) * scale * math.cos(lat0), (loc.latitude - math.degrees(lat0)) * scale)
+        for loc in locations
+    ]
+
+
+def _dist(a: Point, b: Point) -> float:
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def _centroid(points: List[Point]) -> Point:
+    return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+
+def cluster_points(lng: np.ndarray, lat: np.ndarray, k: int, max_iter: int = 20) -> List[List[int]]:
+    """
+    容量均衡的k-means聚类
+
+    初始中心使用确定性的最远点选取,分配时每组最多 ceil(n/k) 个点,
+    保证每天的景点数量大致相同。点到中心的距离矩阵一次向量化算出;
+    分配不再变化(或回到之前出现过的分配)时提前结束。结果可复现。
+
+    Args:
+        lng, lat: 经纬度数组(度)
+        k: 组数(天数)
+        max_iter: 最大迭代次数
+
+    Returns:
+        每组的点索引列表(共k组,点数不足时部分组为空)
+    """
+    n = len(lng)
+    if n == 0 or k <= 0:
+        return [[] for _ in range(max(k, 0))]
+    k_eff = min(k, n)
+    capacity = math.ceil(n / k_eff)
+
+    # 最远点初始化: 第一个中心取离质心最近的点
+    first = int(haversine_matrix(lng, lat, np.array([lng.mean()]), np.array([lat.mean()]))[:, 0].argmin())
+    chosen = [first]
+    nearest_center = haversine_matrix(lng, lat, lng[[first]], lat[[first]])[:, 0]
+    while len(chosen) < k_eff:
+        far = int(nearest_center.argmax())
+        chosen.append(far)
+        nearest_center = np.minimum(nearest_center, haversine_matrix(lng, lat, lng[[far]], lat[[far]])[:, 0])
+    center_lng, center_lat = lng[chosen].astype(float), lat[chosen].astype(float)
+
+    assignment = np.full(n, -1)
+    seen = set()
+    for _ in range(max_iter):
+        # 按距离从近到远贪心分配,组满则顺延到下一个最近的中心
+        distances = haversine_matrix(lng, lat, center_lng, center_lat)
+        order = np.argsort(distances, axis=None, kind="stable")
+        new_assignment = [-1] * n
+        sizes = [0] * k_eff
+        assigned = 0
+        for i, c in zip((order // k_eff).tolist(), (order % k_eff).tolist()):
+            if new_assignment[i] == -1 and sizes[c] < capacity:
+                new_assignment[i] = c
+                sizes[c] += 1
+                assigned += 1
+                if assigned == n:
+                    break
+
+        signature = tuple(new_assignment)
+        if signature in seen:
+            # 分配不再变化或在几个分配之间来回切换
+            break
+        seen.add(signature)
+        assignment = np.array(new_assignment)
+        counts = np.bincount(assignment, minlength=k_eff)
+        occupied = counts > 0
+        center_lng[occupied] = (np.bincount(assignment, weights=lng, minlength=k_eff) / np.maximum(counts, 1))[occupied]
+        center_lat[occupied] = (np.bincount(assignment, weights=lat, minlength=k_eff) / np.maximum(counts, 1))[occupied]
+
+    groups = [np.flatnonzero(assignment == c).tolist() for c in range(k_eff)]
+    return groups + [[] for _ in range(k - k_eff)]
+
+
+def path_length(points: List[Point], order: List[int]) -> float:
+    """按顺序游览的路径总长度(不回到起点)"""
+    return sum(_dist(points[order[i]], points[order[i + 1]]) for i in range(len(order) - 1))
+
+
+def order_route(points: List[Point], indices: List[int], start: Optional[Point] = None) -> List[int]:
+    """
+    确定一组点的游览顺序: 最近邻构造初始路径,再用2-opt消除交叉
+
+    Args:
+        points: 平面坐标
+        indices: 需要排序的点索引
+        start: 出发位置(如酒店),为空时从离组质心最远的点出发
+
+    Returns:
+        排序后的点索引
+    """
+    if len(indices) <= 2:
+        return list(indices)
+
+    remaining = list(indices)
+    if start is None:
+        center = _centroid([points[i] for i in indices])
+        current = max(remaining, key=lambda i: _dist(points[i], center))
+    else:
+        current = min(remaining, key=lambda i: _dist(points[i], start))
+    route = [current]
+    remaining.remove(current)
+    while remaining:
+        current = min(remaining, key=lambda i: _dist(points[i], points[route[-1]]))
+        route.append(current)
+        remaining.remove(current)
+
+    # 2-opt: 反转子路径,直到没有可缩短的交换
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(route) - 2):
+            for j in range(i + 2, len(route)):
+                a, b = points[route[i]], points[route[i + 1]]
+                c = points[route[j]]
+                d = points[route[j + 1]] if j + 1 < len(route) else None
+                before = _dist(a, b) + (_dist(c, d) if d else 0.0)
+                after = _dist(a, c) + (_dist(b, d) if d else 0.0)
+                if after < before - 1e-9:
+                    route[i + 1:j + 1] = reversed(route[i + 1:j + 1])
+                    improved = True
+    return route
+
+
+def optimize_itinerary(locations: List[Location], travel_days: int) -> List[List[int]]:
+    """
+    生成每日景点安排骨架
+
+    先把景点聚类为travel_days个地理上紧凑的组,各组按质心的最近邻顺序排成天,
+    使相邻两天的区域也尽量接近;每天内部再确定游览顺序。
+
+    Args:
+        locations: 候选景点坐标
+        travel_days: 旅行天数
+
+    Returns:
+        每天的景点索引列表(已按游览顺序排列)
+    """
+    points = project_locations(locations)
+    groups = cluster_points(
+        np.array([loc.longitude for loc in locations], dtype=float),
+        np.array([loc.latitude for loc in locations], dtype=float),
+        travel_days
+    )
+
+    # 天的先后顺序: 从离整体质心最远的组出发,依次前往最近的下一组
+    non_empty = [g for g in groups if g]
+    empty = [g for g in groups if not g]
+    if non_empty:
+        centers = {id(g): _centroid([points[i] for i in g]) for g in non_empty}
+        overall = _centroid(points)
+        ordered = [max(non_empty, key=lambda g: _dist(centers[id(g)], overall))]
+        rest = [g for g in non_empty if g is not ordered[0]]
+        while rest:
+            nxt = min(rest, key=lambda g: _dist(centers[id(g)], centers[id(ordered[-1])]))
+            ordered.append(nxt)
+            rest = [g for g in rest if g is not nxt]
+        groups = ordered + empty
+
+    days = []
+    previous_end: Optional[Point] = None
+    for group in groups:
+        route = order_route(points, group, start=previous_end)
+        days.append(route)
+        if route:
+            previous_end = points[route[-1]]
+    return days
@@ -1,18 +1,89 @@
 """LangChain工具封装模块 - 使用MCP适配器将MCP工具转换为LangChain Tool"""
 
+import asyncio
 import os
-from typing import List
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from langchain_core.tools import Tool
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from ..config import get_settings
+from .tool_cache import ToolResultCache, get_tool_cache, normalize_tool_name
+from .metrics import record_tool_call
+from .tool_projection import POI_TOOLS, project_tool_output
+from .poi_index import PoiSpatialIndex, get_poi_index
+from .poi_utils import extract_pois
+from .amap_rest import build_rest_tools, get_amap_rest_client, close_amap_rest_client
+from .tool_schema_cache import build_cached_tools, get_tool_schema_cache, server_fingerprint
 
+if TYPE_CHECKING:
+    # MCP适配器只在使用MCP后端时导入(REST后端启动时不加载)
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+    from .mcp_pool import MCPSessionPool
 
-# 全局MCP客户端和工具列表
+
+# 高德工具后端
+AMAP_BACKEND_MCP = "mcp"
+AMAP_BACKEND_REST = "rest"
+
+# 全局MCP客户端、会话池和工具列表
 _mcp_client = None
+_mcp_pool = None
 _amap_tools = None
+# 已连接MCP服务器的工具(工具名 -> 工具)及后台连接任务
+_mcp_live_tools: Optional[Dict[str, Tool]] = None
+_mcp_connect_task: Optional[asyncio.Task] = None
+_mcp_connect_lock = asyncio.Lock()
+# 工具初始化锁: 并发的首次调用只创建一次工具(只启动一组MCP服务器)
+_amap_tools_lock = asyncio.Lock()
+
+
+def get_amap_server_config() -> dict:
+    """
+    高德地图MCP服务器连接配置
+
+    Returns:
+        stdio连接配置
+    """
+    settings = get_settings()
+
+    if not settings.amap_api_key:
+        raise ValueError("高德地图API Key未配置,请在.env文件中设置AMAP_API_KEY")
 
+    return {
+        "command": "uvx",
+        "args": ["amap-mcp-server"],
+        "env": {
+            "AMAP_MAPS_API_KEY": settings.amap_api_key
+        },
+        "transport": "stdio"
+    }
 
-def get_mcp_client() -> MultiServerMCPClient:
+
+def get_mcp_pool() -> Optional["MCPSessionPool"]:
+    """
+    获取MCP会话池实例(单例模式)
+
+    Returns:
+        MCPSessionPool实例, MCP_POOL_SIZE为0时返回None
+    """
+    global _mcp_pool
+
+    settings = get_settings()
+    if settings.amap_backend == AMAP_BACKEND_REST or settings.mcp_pool_size <= 0:
+        return None
+
+    if _mcp_pool is None:
+        from .mcp_pool import MCPSessionPool
+
+        _mcp_pool = MCPSessionPool(
+            get_amap_server_config(),
+            size=settings.mcp_pool_size,
+            health_check_interval=settings.mcp_health_check_interval
+        )
+
+    return _mcp_pool
+
+
+def get_mcp_client() -> "MultiServerMCPClient":
     """
     获取MCP客户端实例(单例模式)
 
@@ -22,23 +93,10 @@ def get_mcp_client() -> MultiServerMCPClient:
     global _mcp_client
 
     if _mcp_client is None:
-        settings = get_settings()
-
-        if not settings.amap_api_key:
-            raise ValueError("高德地图API Key未配置,请在.env文件中设置AMAP_API_KEY")
+        from langchain_mcp_adapters.client import MultiServerMCPClient
 
         # 创建MCP客户端配置
-        # 高德地图MCP服务器配置
-        server_config = {
-            "amap": {
-                "command": "uvx",
-                "args": ["amap-mcp-server"],
-                "env": {
-                    "AMAP_MAPS_API_KEY": settings.amap_api_key
-                },
-                "transport": "stdio"
-            }
-        }
+        server_config = {"amap": get_amap_server_config()}
 
         # 创建MultiServerMCPClient
         # 注意: 此时尚未建立连接，连接将在 get_amap_tools 或 startup 中通过 __aenter__ 建立
@@ -50,31 +108,122 @@ def get_mcp_client() -> MultiServerMCPClient:
     return _mcp_client
 
 
+async def _load_mcp_tools() -> List[Tool]:
+    """
+    创建MCP工具
+
+    工具定义缓存命中时直接用缓存的定义创建工具,在后台连接MCP服务器,
+    调用在连接完成后转发给真实工具;未命中时等待连接完成。
+    """
+    global _mcp_connect_task
+
+    schema_cache = get_tool_schema_cache()
+    if schema_cache is not None:
+        schemas = schema_cache.load(server_fingerprint(get_amap_server_config()))
+        if schemas:
+            print(f"📦 使用缓存的MCP工具定义({len(schemas)}个),后台连接MCP服务器")
+            _mcp_connect_task = asyncio.create_task(_connect_in_background())
+            return build_cached_tools(schemas, _call_live_tool)
+
+    return list((await _connect_mcp_tools()).values())
+
+
+async def _connect_in_background():
+    try:
+        await _connect_mcp_tools()
+    except Exception as e:
+        # 首次工具调用时会重试连接
+        print(f"⚠️  后台连接MCP服务器失败: {str(e)}")
+
+
+async def _call_live_tool(tool_name: str, arguments: Dict[str, Any]) -> Any:
+    """调用已连接MCP服务器的工具(尚未连接时等待连接)"""
+    tool = (await _connect_mcp_tools()).get(tool_name)
+    if tool is None:
+        raise ValueError(f"MCP服务器未提供工具: {tool_name}")
+    return await tool.coroutine(**arguments)
+
+
+async def _connect_mcp_tools() -> Dict[str, Tool]:
+    """连接MCP服务器获取工具(只连接一次),并刷新工具定义缓存"""
+    global _mcp_live_tools
+
+    if _mcp_live_tools is not None:
+        return _mcp_live_tools
+
+    async with _mcp_connect_lock:
+        if _mcp_live_tools is None:
+            tools = await _discover_mcp_tools()
+            if not tools:
+                raise RuntimeError("MCP服务器未返回任何工具")
+            schema_cache = get_tool_schema_cache()
+            if schema_cache is not None and schema_cache.save(server_fingerprint(get_amap_server_config()), tools):
+                print(f"💾 MCP工具定义已缓存: {schema_cache.path}")
+            _mcp_live_tools = {tool.name: tool for tool in tools}
+
+    return _mcp_live_tools
+
+
+async def _discover_mcp_tools() -> List[Tool]:
+    """通过MCP服务器创建工具"""
+    # 获取MCP客户端
+    mcp_client = get_mcp_client()
+
+    # 建立连接 (因为 get_tools 需要活跃的 Session)
+    # 注意: 这里我们手动进入上下文，且不自动退出，以保持连接在应用生命周期内有效
+    # 真正的清理应该在应用关闭时调用 cleanup_mcp_client
+    # 只有当工具列表为空(首次初始化)时才建立连接，避免重复连接
+    # 注意: MultiServerMCPClient 内部会管理连接状态，但在单例模式下，显式调用一次较安全
+
+    mcp_pool = get_mcp_pool()
+    if mcp_pool is not None:
+        # 会话池: 多个常驻会话,每次调用借出一个空闲会话
+        await mcp_pool.start()
+        return mcp_pool.pooled_tools()
+
+    # 使用 get_tools() 获取工具
+    # 这会自动从MCP服务器发现所有可用工具并转换为LangChain Tool
+    return await mcp_client.get_tools()
+
+
 async def get_amap_tools() -> List[Tool]:
     """
     获取高德地图工具列表(单例模式)
-    使用LangChain MCP适配器自动从MCP服务器创建工具
+    默认使用LangChain MCP适配器自动从MCP服务器创建工具,
+    AMAP_BACKEND=rest 时使用直接调用高德Web服务的同名工具
 
     Returns:
         LangChain工具列表
     """
     global _amap_tools
 
-    if _amap_tools is None:
-        try:
-            # 获取MCP客户端
-            mcp_client = get_mcp_client()
+    if _amap_tools is not None:
+        return _amap_tools
 
-            # 建立连接 (因为 get_tools 需要活跃的 Session)
-            # 注意: 这里我们手动进入上下文，且不自动退出，以保持连接在应用生命周期内有效
-            # 真正的清理应该在应用关闭时调用 cleanup_mcp_client
-            # 只有当工具列表为空(首次初始化)时才建立连接，避免重复连接
-            # 注意: MultiServerMCPClient 内部会管理连接状态，但在单例模式下，显式调用一次较安全
+    async with _amap_tools_lock:
+        if _amap_tools is not None:
+            return _amap_tools
+        try:
+            settings = get_settings()
+            if settings.amap_backend == AMAP_BACKEND_REST:
+                # REST后端: 直接以异步HTTP调用高德Web服务,不启动MCP子进程
+                tools = build_rest_tools(get_amap_rest_client())
+            else:
+                tools = await _load_mcp_tools()
 
-            # 使用 get_tools() 获取工具
-            # 这会自动从MCP服务器发现所有可用工具并转换为LangChain Tool
-            _amap_tools = await mcp_client.get_tools()
+            # 为每个工具挂上POI索引、调用指标和结果缓存,Agent工具调用和call_tool都会经过这几层
+            # 缓存在外层,指标只统计实际发往高德(MCP服务器或REST接口)的调用
+            tool_cache = get_tool_cache()
+            poi_index = get_poi_index()
+            for tool in tools:
+                if poi_index is not None and normalize_tool_name(tool.name) in POI_TOOLS:
+                    _attach_poi_index(tool, poi_index)
+                _attach_metrics(tool)
+                if tool_cache is not None:
+                    _attach_cache(tool, tool_cache)
 
+            # 包装完成后才对外可见
+            _amap_tools = tools
             print(f"✅ 高德地图LangChain工具初始化成功")
             print(f"   工具数量: {len(_amap_tools)}")
             print("   可用工具:")
@@ -82,15 +231,134 @@ async def get_amap_tools() -> List[Tool]:
                 print(f"     - {tool.name}")
 
         except Exception as e:
-            print(f"❌ 创建MCP工具失败: {str(e)}")
+            print(f"❌ 创建高德工具失败: {str(e)}")
             import traceback
             traceback.print_exc()
-            # 如果MCP适配器失败，返回空列表
+            # 如果工具创建失败，返回空列表
             _amap_tools = []
 
     return _amap_tools
 
 
+def _attach_poi_index(tool: Tool, poi_index: PoiSpatialIndex):
+    """
+    将POI搜索工具的底层协程替换为把结果中的POI写入空间索引的版本
+
+    Args:
+        tool: POI搜索工具(maps_text_search / maps_around_search)
+        poi_index: POI空间索引
+    """
+    coroutine = getattr(tool, "coroutine", None)
+    if coroutine is None:
+        return
+
+    async def indexing_coroutine(**arguments):
+        result = await coroutine(**arguments)
+        try:
+            for text in _result_texts(result):
+                poi_index.add_pois(arguments.get("city", ""), extract_pois(text))
+        except Exception as e:
+            print(f"⚠️  POI索引更新失败: {str(e)}")
+        return result
+
+    tool.coroutine = indexing_coroutine
+
+
+def _result_texts(result) -> List[str]:
+    """工具结果中的文本部分(MCP适配器返回 (content, artifact),content为字符串或列表)"""
+    if isinstance(result, tuple) and len(result) == 2:
+        result = result[0]
+    if isinstance(result, str):
+        return [result]
+    if isinstance(result, list):
+        return [item for item in result if isinstance(item, str)]
+    return []
+
+
+def _attach_metrics(tool: Tool):
+    """将工具的底层协程替换为记录调用次数和耗时的版本"""
+    coroutine = getattr(tool, "coroutine", None)
+    if coroutine is None:
+        return
+
+    async def measured_coroutine(**arguments):
+        start = time.perf_counter()
+        success = False
+        try:
+            result = await coroutine(**arguments)
+            success = True
+            return result
+        finally:
+            record_tool_call(normalize_tool_name(tool.name), time.perf_counter() - start, success)
+
+    tool.coroutine = measured_coroutine
+
+
+def _attach_cache(tool: Tool, tool_cache: ToolResultCache):
+    """
+    将工具的底层协程替换为带缓存的版本
+
+    Args:
+        tool: MCP适配器生成的LangChain工具
+        tool_cache: 工具结果缓存
+    """
+    coroutine = getattr(tool, "coroutine", None)
+    if coroutine is None:
+        return
+
+    async def cached_coroutine(**arguments):
+        return await tool_cache.call(tool.name, arguments, lambda: coroutine(**arguments))
+
+    tool.coroutine = cached_coroutine
+
+
+def get_projected_tools(tools: List[Tool]) -> List[Tool]:
+    """
+    获取输出经过精简的工具副本(供检索Agent使用)
+
+    原始JSON中大量字段(类型编码、商圈、照片等)对规划无用,
+    副本将POI搜索和天气工具的输出转换为紧凑表格后再交给LLM。
+    call_tool 仍使用原始工具,返回完整JSON。
+
+    Args:
+        tools: get_amap_tools 返回的工具列表
+
+    Returns:
+        工具副本列表
+    """
+    projected = []
+    for tool in tools:
+        coroutine = getattr(tool, "coroutine", None)
+        if coroutine is None:
+            projected.append(tool)
+            continue
+        projected.append(tool.model_copy(update={"coroutine": _projecting(tool.name, coroutine)}))
+    return projected
+
+
+def _projecting(tool_name: str, coroutine):
+    """包装工具协程,对文本输出做精简投影"""
+
+    async def projected_coroutine(**arguments):
+        result = await coroutine(**arguments)
+        # MCP适配器返回 (content, artifact),content为字符串或字符串列表
+        if isinstance(result, tuple) and len(result) == 2:
+            content, artifact = result
+            if isinstance(content, str):
+                return project_tool_output(tool_name, content), artifact
+            if isinstance(content, list):
+                return [
+                    project_tool_output(tool_name, c) if isinstance(c, str) else c
+                    for c in content
+                ], artifact
+            return result
+        if isinstance(result, str):
+            return project_tool_output(tool_name, result)
+        return result
+
+    return projected_coroutine
+
+
 async def call_tool(tool_name: str, arguments: dict) -> str:
     """
     通过MCP客户端调用指定工具
@@ -143,10 +411,23 @@ async def call_tool(tool_name: str, arguments: dict) -> str:
 
 async def cleanup_mcp_client():
     """
-    清理MCP客户端资源
+    清理MCP客户端资源(及REST后端的连接池)
     建议在 FastAPI 的 shutdown 事件中调用此函数
     """
-    global _mcp_client
+    global _mcp_client, _mcp_pool, _mcp_live_tools, _mcp_connect_task
+    await close_amap_rest_client()
+    if _mcp_connect_task is not None and not _mcp_connect_task.done():
+        _mcp_connect_task.cancel()
+    _mcp_connect_task = None
+    _mcp_live_tools = None
+    if _mcp_pool:
+        try:
+            await _mcp_pool.close()
+            print("✅ MCP会话池已关闭")
+        except Exception as e:
+            print(f"⚠️ 关闭MCP会话池时发生错误: {e}")
+        finally:
+            _mcp_pool = None
     if _mcp_client:
         try:
             print("✅ MCP客户端连接已关闭")
@@ -0,0 +1,566 @@
+"""LLM网关 - 按提供商限制并发和每分钟token数,按优先级排队,遇到429时按Retry-After退避
+
+所有规划请求共用同一个LLM实例。没有并发控制时,高峰期的调用同时打到提供商,
+集体收到429后又按相同的节奏重试。网关在 BaseChatModel 外包一层:
+
+- 每个提供商一个网关: 并发名额 + token桶(每分钟token预算),名额不足时排队
+- 排队按优先级出队: 行程规划调用优先于景点/天气/酒店检索调用
+- 收到429时整个网关暂停到 Retry-After(无该响应头时按带抖动的指数退避),
+  并将并发上限减半;此后每连续成功一轮并发上限加1,逐步回到配置值
+- 5xx、超时、连接错误等临时错误只让该调用按带抖动的指数退避重试,不影响其他调用
+  (提供商SDK自身的重试已关闭,由网关统一重试)
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+from ..config import get_settings
+from .metrics import record_llm_concurrency_limit, record_llm_queue_depth, record_llm_queue_wait, record_llm_rate_limited
+
+
+# 排队优先级(数值小的先出队)
+PRIORITY_PLANNER = 0
+PRIORITY_RETRIEVAL = 1
+PRIORITY_NAMES = {PRIORITY_PLANNER: "planner", PRIORITY_RETRIEVAL: "retrieval"}
+# Agent名称(见 metrics.llm_config) -> 优先级,其余调用按检索优先级排队
+AGENT_PRIORITIES = {"planner": PRIORITY_PLANNER}
+
+# 粗略估算: 中文提示词约2个字符1个token
+CHARS_PER_TOKEN = 2
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """是否为限流错误(HTTP 429)"""
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+        getattr(error, "code", None),
+    ):
+        if status == 429:
+            return True
+    return False
+
+
+# 临时错误的异常类名(openai/httpx/google等SDK),按类名判断以免导入未使用的SDK
+_TRANSIENT_ERROR_NAMES = {
+    "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "TimeoutException", "TransportError", "NetworkError", "RemoteProtocolError",
+    "ServiceUnavailable", "DeadlineExceeded",
+}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """是否为可重试的临时错误(HTTP 5xx、超时、连接错误)"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in _TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+        getattr(error, "code", None),
+    ):
+        if isinstance(status, int) and 500 <= status < 600:
+            return True
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    从限流错误的响应头中读取建议的等待时间
+
+    Args:
+        error: 限流错误
+
+    Returns:
+        秒数, 响应头缺失或无法解析时返回None
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(float(retry_after_ms) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        # HTTP日期格式
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Waiter:
+    """排队中的调用"""
+
+    __slots__ = ("tokens", "future")
+
+    def __init__(self, tokens: int, future: asyncio.Future):
+        self.tokens = tokens
+        self.future = future
+
+
+class GatewayLease:
+    """已获得的调用名额,调用结束后填入实际token数用于校正token桶"""
+
+    __slots__ = ("reserved", "used")
+
+    def __init__(self, reserved: int):
+        self.reserved = reserved
+        self.used: Optional[int] = None
+
+
+class LLMGateway:
+    """
+    单个LLM提供商的网关
+
+    - slot(): 按优先级排队获取调用名额(并发数和token预算都满足时才放行)
+    - retry_delay(): 调用失败时判断能否重试并返回重试前的等待时间;
+      429时暂停放行并减半并发上限,临时错误只退避该调用
+    - on_success(): 连续成功后逐步恢复并发上限
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        tokens_per_minute: int = 0,
+        max_retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0
+    ):
+        """
+        初始化
+
+        Args:
+            provider: 提供商名称(用于指标标签)
+            max_concurrency: 最大并发调用数
+            tokens_per_minute: 每分钟token预算, 0表示不限制
+            max_retries: 遇到429或临时错误时的最多重试次数
+            backoff_base: 指数退避基数(秒)
+            backoff_max: 指数退避上限(秒)
+        """
+        self.provider = provider
+        self.max_concurrency = max(max_concurrency, 1)
+        self.tokens_per_minute = max(tokens_per_minute, 0)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.transient_errors = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+        self._limit = self.max_concurrency
+        self._active = 0
+        self._successes = 0
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._tokens = float(self.tokens_per_minute)
+        self._tokens_updated = time.monotonic()
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        record_llm_concurrency_limit(provider, self._limit)
+
+    @asynccontextmanager
+    async def slot(self, priority: int, tokens: int):
+        """
+        获取一个调用名额
+
+        Args:
+            priority: 排队优先级(PRIORITY_PLANNER / PRIORITY_RETRIEVAL)
+            tokens: 预估的token数(提示词 + 输出)
+        """
+        if self.tokens_per_minute:
+            # 单次调用的预估超过整个预算时按预算计,避免永远排不上
+            tokens = min(tokens, self.tokens_per_minute)
+        lease = await self._acquire(priority, tokens)
+        try:
+            yield lease
+        finally:
+            self._release(lease)
+
+    def retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """
+        调用失败时的重试等待时间
+
+        Args:
+            error: 调用抛出的异常
+            attempt: 本次调用已重试的次数
+
+        Returns:
+            重试前的等待时间(秒), 不可重试或重试次数用完时返回None
+        """
+        if attempt >= self.max_retries:
+            return None
+        if is_rate_limit_error(error):
+            return self.on_rate_limited(error, attempt)
+        if is_transient_error(error):
+            self.transient_errors += 1
+            return self._backoff(attempt)
+        return None
+
+    def on_rate_limited(self, error: BaseException, attempt: int) -> float:
+        """
+        记录一次429
+
+        Args:
+            error: 限流错误
+            attempt: 本次调用已重试的次数
+
+        Returns:
+            重试前的等待时间(秒)
+        """
+        self.rate_limited += 1
+        record_llm_rate_limited(self.provider)
+
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # 加少量抖动,暂停结束时排队的调用不会在同一时刻发出
+            delay = retry_after + random.uniform(0, self.backoff_base)
+        else:
+            delay = self._backoff(attempt)
+
+        now = time.monotonic()
+        # 同一波429只减半一次
+        if now >= self._paused_until:
+            self._limit = max(1, self._limit // 2)
+            self._successes = 0
+            record_llm_concurrency_limit(self.provider, self._limit)
+        self._paused_until = max(self._paused_until, now + delay)
+        return delay
+
+    def _backoff(self, attempt: int) -> float:
+        """带抖动的指数退避(等待时间在 [上限/2, 上限] 内随机)"""
+        backoff = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return random.uniform(backoff / 2, backoff)
+
+    def on_success(self):
+        """记录一次成功调用,每连续成功一轮(当前并发上限次)上限加1"""
+        if self._limit >= self.max_concurrency:
+            return
+        self._successes += 1
+        if self._successes >= self._limit:
+            self._limit += 1
+            self._successes = 0
+            record_llm_concurrency_limit(self.provider, self._limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """网关状态"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "concurrency_limit": self._limit,
+            "active": self._active,
+            "queued": self._queued(),
+            "tokens_per_minute": self.tokens_per_minute,
+            "tokens_available": round(self._refill()) if self.tokens_per_minute else None,
+            "paused_seconds": round(max(self._paused_until - time.monotonic(), 0.0), 3),
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "transient_errors": self.transient_errors,
+            "avg_wait_ms": round(self.wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+        }
+
+    async def _acquire(self, priority: int, tokens: int) -> GatewayLease:
+        start = time.perf_counter()
+        if not self._heap and self._can_start(tokens):
+            self._start(tokens)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._heap, (priority, next(self._seq), _Waiter(tokens, future)))
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 已分配到名额但调用方被取消,归还名额
+                    self._release(GatewayLease(tokens))
+                else:
+                    self._update_depth()
+                raise
+
+        waited = time.perf_counter() - start
+        self.calls += 1
+        self.waits += 1
+        self.wait_seconds += waited
+        record_llm_queue_wait(self.provider, PRIORITY_NAMES.get(priority, str(priority)), waited)
+        return GatewayLease(tokens)
+
+    def _release(self, lease: GatewayLease):
+        self._active -= 1
+        if self.tokens_per_minute and lease.used is not None:
+            # 按实际用量校正预留(少用的退回,多用的补扣)
+            self._refill()
+            self._tokens = min(self._tokens - (lease.used - lease.reserved), float(self.tokens_per_minute))
+        self._dispatch()
+
+    def _can_start(self, tokens: int) -> bool:
+        if time.monotonic() < self._paused_until or self._active >= self._limit:
+            return False
+        return not self.tokens_per_minute or self._refill() >= tokens
+
+    def _start(self, tokens: int):
+        self._active += 1
+        if self.tokens_per_minute:
+            self._tokens -= tokens
+
+    def _refill(self) -> float:
+        """按经过的时间补充token桶,返回当前可用token数"""
+        now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._tokens_updated) * self.tokens_per_minute / 60.0,
+            float(self.tokens_per_minute)
+        )
+        self._tokens_updated = now
+        return self._tokens
+
+    def _dispatch(self):
+        """按优先级放行排队的调用,放行不了时安排定时重试"""
+        while self._heap:
+            _, _, waiter = self._heap[0]
+            if waiter.future.done():
+                heapq.heappop(self._heap)
+                continue
+            if not self._can_start(waiter.tokens):
+                break
+            heapq.heappop(self._heap)
+            self._start(waiter.tokens)
+            waiter.future.set_result(None)
+
+        self._update_depth()
+        if self._heap and self._timer is None:
+            delay = self._blocked_for(self._heap[0][2].tokens)
+            if delay is not None:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _blocked_for(self, tokens: int) -> Optional[float]:
+        """队首调用还需等待的时间, 只受并发限制时返回None(有调用结束时会重新放行)"""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self._active >= self._limit:
+            return None
+        if self.tokens_per_minute:
+            missing = tokens - self._refill()
+            if missing > 0:
+                return missing * 60.0 / self.tokens_per_minute
+        return 0.0
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _queued(self) -> int:
+        return sum(1 for _, _, waiter in self._heap if not waiter.future.done())
+
+    def _update_depth(self):
+        record_llm_queue_depth(self.provider, self._queued())
+
+
+class GatewayChatModel(BaseChatModel):
+    """
+    经过网关调用的ChatModel
+
+    包装提供商的ChatModel,异步调用(ainvoke/astream,以及Agent中的工具调用)在网关中排队。
+    排队优先级取自调用config中的 metadata["agent"](见 metrics.llm_config)。
+    同步调用不经过网关。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    inner: BaseChatModel
+    gateway: LLMGateway
+    completion_tokens_estimate: int = 1000
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.inner._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    def bind_tools(self, tools, **kwargs):
+        """使用被包装模型的工具格式绑定工具,调用仍经过网关"""
+        bound = self.inner.bind_tools(tools, **kwargs)
+        return self.bind(**bound.kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        return self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        priority = _priority_of(run_manager)
+        tokens = self._estimate_tokens(messages, kwargs)
+        attempt = 0
+        while True:
+            async with self.gateway.slot(priority, tokens) as lease:
+                try:
+                    result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                except Exception as e:
+                    delay = self.gateway.retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    error = e
+                else:
+                    self.gateway.on_success()
+                    lease.used = _result_tokens(result)
+                    return result
+            attempt += 1
+            await self._wait_retry(error, delay, attempt)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        priority = _priority_of(run_manager)
+        tokens = self._estimate_tokens(messages, kwargs)
+        attempt = 0
+        while True:
+            started = False
+            async with self.gateway.slot(priority, tokens) as lease:
+                used = 0
+                try:
+                    async for chunk in self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                        started = True
+                        used += _chunk_tokens(chunk)
+                        yield chunk
+                except Exception as e:
+                    # 已经输出了内容的流不能重试
+                    delay = None if started else self.gateway.retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    error = e
+                else:
+                    self.gateway.on_success()
+                    lease.used = used or None
+                    return
+            attempt += 1
+            await self._wait_retry(error, delay, attempt)
+
+    async def _wait_retry(self, error: BaseException, delay: float, attempt: int):
+        """释放名额后等待重试(429时网关本身也暂停到同一时间)"""
+        reason = "LLM限流(429)" if is_rate_limit_error(error) else f"LLM调用失败({type(error).__name__})"
+        print(f"⏳ {reason}, {delay:.1f}s 后重试({attempt}/{self.gateway.max_retries})")
+        await asyncio.sleep(delay)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        return self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _estimate_tokens(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> int:
+        """预估本次调用的token数: 提示词字符数换算 + 输出上限(未指定时使用配置的估计值)"""
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        completion = kwargs.get("max_tokens") or self.completion_tokens_estimate
+        return prompt_chars // CHARS_PER_TOKEN + completion
+
+
+def _priority_of(run_manager: Optional[AsyncCallbackManagerForLLMRun]) -> int:
+    metadata = getattr(run_manager, "metadata", None) or {}
+    return AGENT_PRIORITIES.get(metadata.get("agent"), PRIORITY_RETRIEVAL)
+
+
+def _result_tokens(result: ChatResult) -> Optional[int]:
+    """调用结果中的实际token数, 提供商未返回用量时为None"""
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    total = 0
+    for generation in result.generations:
+        metadata = getattr(generation.message, "usage_metadata", None)
+        if metadata:
+            total += metadata.get("total_tokens", 0)
+    return total or None
+
+
+def _chunk_tokens(chunk: ChatGenerationChunk) -> int:
+    metadata = getattr(chunk.message, "usage_metadata", None)
+    return metadata.get("total_tokens", 0) if metadata else 0
+
+
+# 全局网关实例(每个提供商一个)
+_gateways: Dict[str, LLMGateway] = {}
+
+
+def get_llm_gateway(provider: str) -> LLMGateway:
+    """
+    获取提供商的LLM网关(单例模式)
+
+    Args:
+        provider: 提供商名称(nvidia / google),并发数和token预算读取 LLM_<PROVIDER>_* 配置
+    """
+    if provider not in _gateways:
+        settings = get_settings()
+        _gateways[provider] = LLMGateway(
+            provider,
+            max_concurrency=getattr(settings, f"llm_{provider}_max_concurrency"),
+            tokens_per_minute=getattr(settings, f"llm_{provider}_tokens_per_minute"),
+            max_retries=settings.llm_max_retries,
+            backoff_base=settings.llm_backoff_base,
+            backoff_max=settings.llm_backoff_max
+        )
+    return _gateways[provider]
+
+
+def with_gateway(llm: BaseChatModel, provider: str) -> BaseChatModel:
+    """
+    为提供商的ChatModel套上网关(未启用网关时原样返回)
+
+    Args:
+        llm: 提供商的ChatModel(自身的重试应关闭,由网关统一退避重试)
+        provider: 提供商名称
+    """
+    settings = get_settings()
+    if not settings.llm_gateway_enabled:
+        return llm
+    return GatewayChatModel(
+        inner=llm,
+        gateway=get_llm_gateway(provider),
+        completion_tokens_estimate=settings.llm_completion_tokens_estimate
+    )
+
+
+def gateway_stats() -> Dict[str, Dict[str, Any]]:
+    """各提供商网关的状态"""
+    return {provider: gateway.stats() for provider, gateway in _gateways.items()}
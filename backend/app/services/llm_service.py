@@ -1,10 +1,13 @@
-"""LLM服务模块"""
+"""LLM服务模块
+
+各提供商的LangChain集成包只在对应的获取函数中导入,
+未使用的提供商(及其依赖的SDK)不会拖慢启动。
+"""
 
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.language_models import BaseChatModel
-from langchain_openai import ChatOpenAI
 from ..config import get_settings
+from .llm_gateway import with_gateway
 
 # 全局LLM实例
 _llm_instance = None
@@ -21,6 +24,8 @@ def get_llm_google() -> BaseChatModel:
     global _llm_instance
     
     if _llm_instance is None:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
         settings = get_settings()
         
         # 从环境变量或配置中读取Gemini配置
@@ -35,8 +40,11 @@ def get_llm_google() -> BaseChatModel:
             google_api_key=api_key,
             model=model,
             temperature=0.7,
-            convert_system_message_to_human=True  # Gemini需要将system消息转换为human消息
+            convert_system_message_to_human=True,  # Gemini需要将system消息转换为human消息
+            # 启用LLM网关时由网关统一排队和退避重试(429、5xx、超时、连接错误)
+            max_retries=0 if settings.llm_gateway_enabled else 6
         )
+        _llm_instance = with_gateway(_llm_instance, "google")
         
         print(f"✅ LLM服务初始化成功")
         print(f"   提供商: Google Gemini")
@@ -56,6 +64,8 @@ def get_llm_nvidia() -> BaseChatModel:
     global _llm_instance
 
     if _llm_instance is None:
+        from langchain_openai import ChatOpenAI
+
         settings = get_settings()
 
         # 从环境变量或配置中读取NVIDIA配置
@@ -74,13 +84,19 @@ def get_llm_nvidia() -> BaseChatModel:
             # NVIDIA API无需转换system消息，保持默认即可
             # 可选：添加超时和重试配置，提升稳定性
             request_timeout=30,
-            max_retries=3
+            # 启用LLM网关时由网关统一排队和退避重试(429、5xx、超时、连接错误),避免SDK各自重试造成重试风暴
+            max_retries=0 if settings.llm_gateway_enabled else 3,
+            stream_usage=True  # 流式输出时也返回token用量,用于指标统计
         )
+        _llm_instance = with_gateway(_llm_instance, "nvidia")
 
         print(f"✅ LLM服务初始化成功")
         print(f"   提供商: NVIDIA")
         print(f"   模型: {model}")
         print(f"   API端点: https://integrate.api.nvidia.com/v1")
+        if settings.llm_gateway_enabled:
+            print(f"   网关: 最大并发 {settings.llm_nvidia_max_concurrency}, "
+                  f"每分钟token {settings.llm_nvidia_tokens_per_minute or '不限'}")
 
     return _llm_instance
 
@@ -0,0 +1,255 @@
+"""MCP会话池 - 维护多个常驻的高德MCP服务器会话,并发工具调用不再串行排队"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import load_mcp_tools
+from .metrics import record_mcp_pool_wait
+
+
+class _PooledSession:
+    """
+    池中的单个MCP会话
+
+    stdio会话的上下文必须在同一个任务中进入和退出,
+    因此每个会话由一个后台任务持有,直到收到关闭信号或子进程退出。
+    """
+
+    def __init__(self, index: int, connection: Dict[str, Any]):
+        self.index = index
+        self.connection = connection
+        self.session = None
+        self.tools: Dict[str, BaseTool] = {}
+        self.last_used = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def alive(self) -> bool:
+        """会话是否可用(后台任务仍在运行且已完成初始化)"""
+        return (
+            self._task is not None
+            and not self._task.done()
+            and self._ready is not None
+            and self._ready.is_set()
+        )
+
+    async def start(self, timeout: float):
+        """
+        启动MCP服务器子进程并完成会话初始化
+
+        Raises:
+            RuntimeError: 启动失败或超时
+        """
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+
+        ready_waiter = asyncio.create_task(self._ready.wait())
+        try:
+            await asyncio.wait({self._task, ready_waiter}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            ready_waiter.cancel()
+
+        if not self._ready.is_set():
+            await self.close()
+            raise RuntimeError(f"MCP会话#{self.index}启动失败: {self._error or '超时'}")
+        self.last_used = time.monotonic()
+
+    async def _run(self):
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                tools = await load_mcp_tools(session)
+                self.session = session
+                self.tools = {tool.name: tool for tool in tools}
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self._error = e
+            print(f"⚠️  MCP会话#{self.index}已退出: {str(e)}")
+        finally:
+            self.session = None
+
+    async def ping(self, timeout: float) -> bool:
+        """健康检查"""
+        if not self.alive or self.session is None:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        """关闭会话并结束子进程"""
+        if self._stop is not None:
+            self._stop.set()
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+        self._task = None
+
+
+class MCPSessionPool:
+    """
+    MCP会话池
+
+    - 启动时建立size个常驻会话,每次工具调用借出一个空闲会话,用完归还
+    - 借出时检查会话: 子进程已退出或空闲过久且ping失败的会话会被重新拉起
+    - 记录等待空闲会话的时间
+    """
+
+    def __init__(
+        self,
+        connection: Dict[str, Any],
+        size: int,
+        health_check_interval: float = 60.0,
+        start_timeout: float = 60.0
+    ):
+        """
+        初始化
+
+        Args:
+            connection: MCP服务器连接配置(同MultiServerMCPClient的单个服务器配置)
+            size: 会话数
+            health_check_interval: 会话空闲超过该时间(秒)后,借出前先ping检查
+            start_timeout: 单个会话的启动超时(秒)
+        """
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.start_timeout = start_timeout
+        self.respawns = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._slots = [_PooledSession(i, connection) for i in range(size)]
+        self._free: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        """启动所有会话(重复调用无副作用)"""
+        async with self._start_lock:
+            if self._free is not None:
+                return
+
+            results = await asyncio.gather(
+                *(slot.start(self.start_timeout) for slot in self._slots),
+                return_exceptions=True
+            )
+            failures = [r for r in results if isinstance(r, Exception)]
+            if len(failures) == len(self._slots):
+                raise RuntimeError(f"MCP会话池启动失败: {failures[0]}")
+            for failure in failures:
+                print(f"⚠️  {failure},将在借出时重试")
+
+            # 启动失败的会话也放入空闲队列,借出时会重新拉起
+            self._free = asyncio.Queue()
+            for slot in self._slots:
+                self._free.put_nowait(slot)
+
+            print(f"✅ MCP会话池启动成功: {self.size - len(failures)}/{self.size} 个会话可用")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """借出一个健康的会话"""
+        await self.start()
+
+        wait_start = time.perf_counter()
+        slot: _PooledSession = await self._free.get()
+        waited = time.perf_counter() - wait_start
+        self.waits += 1
+        self.wait_seconds += waited
+        record_mcp_pool_wait(waited)
+
+        try:
+            await self._ensure_healthy(slot)
+            yield slot
+        finally:
+            slot.last_used = time.monotonic()
+            self._free.put_nowait(slot)
+
+    async def call(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        借出会话调用工具
+
+        Args:
+            tool_name: 工具名称
+            arguments: 工具参数
+
+        Returns:
+            MCP适配器工具的原始返回值
+        """
+        async with self.acquire() as slot:
+            tool = slot.tools.get(tool_name)
+            if tool is None:
+                raise ValueError(f"未找到工具: {tool_name}")
+            try:
+                return await tool.coroutine(**arguments)
+            except Exception:
+                # 调用失败时确认会话是否还活着,子进程已崩溃则立即重启
+                if not await slot.ping(timeout=5):
+                    await self._respawn(slot, quiet=True)
+                raise
+
+    def pooled_tools(self) -> List[BaseTool]:
+        """
+        获取通过会话池调用的LangChain工具
+
+        工具定义取自池中的会话,调用时每次借出一个空闲会话执行。
+        """
+        template = next((slot for slot in self._slots if slot.tools), None)
+        if template is None:
+            return []
+        return [
+            tool.model_copy(update={"coroutine": self._dispatcher(tool.name)})
+            for tool in template.tools.values()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """会话池状态"""
+        return {
+            "size": self.size,
+            "alive": sum(1 for slot in self._slots if slot.alive),
+            "free": self._free.qsize() if self._free is not None else 0,
+            "respawns": self.respawns,
+            "waits": self.waits,
+            "avg_wait_ms": round(self.wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+        }
+
+    async def close(self):
+        """关闭所有会话"""
+        await asyncio.gather(*(slot.close() for slot in self._slots), return_exceptions=True)
+        self._free = None
+
+    def _dispatcher(self, tool_name: str):
+        async def pooled_coroutine(**arguments):
+            return await self.call(tool_name, arguments)
+
+        return pooled_coroutine
+
+    async def _ensure_healthy(self, slot: _PooledSession):
+        """借出前检查会话,必要时重新拉起"""
+        if not slot.alive:
+            await self._respawn(slot)
+        elif time.monotonic() - slot.last_used > self.health_check_interval:
+            if not await slot.ping(timeout=5):
+                await self._respawn(slot)
+
+    async def _respawn(self, slot: _PooledSession, quiet: bool = False):
+        """重启会话"""
+        print(f"🔄 重启MCP会话#{slot.index}...")
+        await slot.close()
+        self.respawns += 1
+        try:
+            await slot.start(self.start_timeout)
+        except Exception:
+            if not quiet:
+                raise
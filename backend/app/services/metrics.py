@@ -0,0 +1,243 @@
+"""运行指标 - 阶段耗时、LLM token、工具调用、缓存命中,按Prometheus格式汇总"""
+
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+# ============ Prometheus指标 ============
+
+STAGE_SECONDS = Histogram(
+    "trip_stage_seconds", "旅行规划各阶段耗时(秒)", ["stage"],
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180)
+)
+LLM_SECONDS = Histogram(
+    "llm_request_seconds", "单次LLM调用耗时(秒)", ["agent"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120)
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM token数", ["agent", "type"])
+AGENT_ITERATIONS = Histogram(
+    "agent_iterations", "AgentExecutor单次调用的工具调用轮数", ["agent"],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10)
+)
+TOOL_SECONDS = Histogram(
+    "tool_call_seconds", "高德工具调用耗时(秒)", ["tool", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+MCP_POOL_WAIT_SECONDS = Histogram(
+    "mcp_pool_wait_seconds", "等待空闲MCP会话的时间(秒)",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "llm_queue_wait_seconds", "LLM调用在网关中排队的时间(秒)", ["provider", "priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60)
+)
+LLM_QUEUE_DEPTH = Gauge("llm_queue_depth", "LLM网关中排队的调用数", ["provider"])
+LLM_CONCURRENCY_LIMIT = Gauge("llm_concurrency_limit", "LLM网关当前的并发上限(429后减半,逐步恢复)", ["provider"])
+LLM_RATE_LIMITED = Counter("llm_rate_limited_total", "LLM提供商返回429的次数", ["provider"])
+
+
+class _CacheCollector:
+    """采集时读取各缓存的命中统计"""
+
+    def collect(self):
+        from .plan_cache import get_plan_cache
+        from .tool_cache import get_tool_cache
+        from .distance_service import get_distance_service
+        from .photo_cache import get_photo_cache
+        from .city_snapshot import get_snapshot_store
+
+        caches = {
+            "plan": get_plan_cache(),
+            "tool": get_tool_cache(),
+            "distance": get_distance_service(),
+            "photo": get_photo_cache(),
+            "snapshot": get_snapshot_store(),
+        }
+        hits = CounterMetricFamily("cache_hits", "缓存命中次数", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "缓存未命中次数", labels=["cache"])
+        hit_rate = GaugeMetricFamily("cache_hit_rate", "缓存命中率", labels=["cache"])
+        for name, cache in caches.items():
+            if cache is None:
+                continue
+            stats = cache.stats()
+            total = stats["hits"] + stats["misses"]
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            hit_rate.add_metric([name], stats["hits"] / total if total else 0.0)
+        yield hits
+        yield misses
+        yield hit_rate
+
+
+REGISTRY.register(_CacheCollector())
+
+
+def render_metrics() -> bytes:
+    """Prometheus文本格式的全部指标"""
+    return generate_latest(REGISTRY)
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+# ============ 单次请求的指标汇总 ============
+
+class RequestMetrics:
+    """单次规划请求的指标汇总"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.llm: Dict[str, Dict[str, float]] = {}
+        self.tools: Dict[str, Dict[str, float]] = {}
+        self.agent_iterations: Dict[str, int] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        """指标汇总(秒数保留3位小数)"""
+        return {
+            "stages": {k: round(v, 3) for k, v in self.stages.items()},
+            "llm": {k: {f: round(v, 3) for f, v in d.items()} for k, d in self.llm.items()},
+            "tools": {k: {f: round(v, 3) for f, v in d.items()} for k, d in self.tools.items()},
+            "agent_iterations": dict(self.agent_iterations),
+        }
+
+    def server_timing(self) -> str:
+        """Server-Timing响应头"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
+
+
+_current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def start_request_metrics() -> RequestMetrics:
+    """为当前请求开始收集指标(并发子任务会继承同一个汇总对象)"""
+    metrics = RequestMetrics()
+    _current_metrics.set(metrics)
+    return metrics
+
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    """当前请求的指标汇总,不在请求上下文中时返回None"""
+    return _current_metrics.get()
+
+
+def record_stage(stage: str, seconds: float):
+    """记录阶段耗时"""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.stages[stage] = seconds
+
+
+def record_llm_call(agent: str, seconds: float, prompt_tokens: int, completion_tokens: int):
+    """记录一次LLM调用"""
+    LLM_SECONDS.labels(agent=agent).observe(seconds)
+    LLM_TOKENS.labels(agent=agent, type="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(agent=agent, type="completion").inc(completion_tokens)
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        entry = metrics.llm.setdefault(
+            agent, {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+        )
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["prompt_tokens"] += prompt_tokens
+        entry["completion_tokens"] += completion_tokens
+
+
+def record_agent_iterations(agent: str, iterations: int):
+    """记录一次AgentExecutor调用的工具调用轮数"""
+    AGENT_ITERATIONS.labels(agent=agent).observe(iterations)
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.agent_iterations[agent] = metrics.agent_iterations.get(agent, 0) + iterations
+
+
+def record_mcp_pool_wait(seconds: float):
+    """记录一次等待空闲MCP会话的时间"""
+    MCP_POOL_WAIT_SECONDS.observe(seconds)
+
+
+def record_llm_queue_wait(provider: str, priority: str, seconds: float):
+    """记录一次LLM调用的排队时间"""
+    LLM_QUEUE_WAIT_SECONDS.labels(provider=provider, priority=priority).observe(seconds)
+
+
+def record_llm_queue_depth(provider: str, depth: int):
+    """记录LLM网关的排队调用数"""
+    LLM_QUEUE_DEPTH.labels(provider=provider).set(depth)
+
+
+def record_llm_concurrency_limit(provider: str, limit: int):
+    """记录LLM网关当前的并发上限"""
+    LLM_CONCURRENCY_LIMIT.labels(provider=provider).set(limit)
+
+
+def record_llm_rate_limited(provider: str):
+    """记录一次429"""
+    LLM_RATE_LIMITED.labels(provider=provider).inc()
+
+
+def record_tool_call(tool: str, seconds: float, success: bool):
+    """记录一次工具调用"""
+    TOOL_SECONDS.labels(tool=tool, status="ok" if success else "error").observe(seconds)
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        entry = metrics.tools.setdefault(tool, {"calls": 0, "errors": 0, "seconds": 0.0})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        if not success:
+            entry["errors"] += 1
+
+
+class LLMMetricsHandler(AsyncCallbackHandler):
+    """LangChain回调: 记录每次LLM调用的耗时和token数"""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self._starts: Dict[UUID, float] = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    async def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        start = self._starts.pop(run_id, None)
+        seconds = time.perf_counter() - start if start is not None else 0.0
+        prompt_tokens, completion_tokens = _token_usage(response)
+        record_llm_call(self.agent, seconds, prompt_tokens, completion_tokens)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._starts.pop(run_id, None)
+
+
+def _token_usage(response: LLMResult) -> tuple:
+    """从LLM结果中提取 (prompt_tokens, completion_tokens)"""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+
+    # 流式输出时用量记录在消息的usage_metadata中
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                return metadata.get("input_tokens", 0), metadata.get("output_tokens", 0)
+    return 0, 0
+
+
+def llm_callbacks(agent: str) -> List[AsyncCallbackHandler]:
+    """LLM指标回调列表,用于 config={"callbacks": ...}"""
+    return [LLMMetricsHandler(agent)]
+
+
+def llm_config(agent: str) -> Dict[str, Any]:
+    """LLM调用的config: 指标回调 + Agent名称(LLM网关据此确定排队优先级)"""
+    return {"callbacks": llm_callbacks(agent), "metadata": {"agent": agent}}
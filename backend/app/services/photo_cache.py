@@ -0,0 +1,180 @@
+"""景点图片缓存 - 景点名称到图片URL的持久化缓存,未找到图片的结果也缓存(负缓存)"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from ..config import get_settings
+
+
+class PhotoCache:
+    """
+    景点图片URL缓存
+
+    内存LRU + SQLite持久化。找到图片的条目按ttl过期,
+    未找到图片的条目(url为None)按较短的negative_ttl过期,避免反复查询注定没有结果的名称。
+    """
+
+    def __init__(self, path: Optional[str], ttl: float, negative_ttl: float, max_entries: int):
+        """
+        初始化
+
+        Args:
+            path: SQLite文件路径,为空时只使用内存缓存
+            ttl: 找到图片的条目的过期时间(秒)
+            negative_ttl: 未找到图片的条目的过期时间(秒)
+            max_entries: 内存与磁盘中保留的最大条目数
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS photo_cache ("
+                    "name TEXT PRIMARY KEY, url TEXT, created_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  图片缓存数据库不可用,仅使用内存缓存: {str(e)}")
+                self._db = None
+
+    def get(self, name: str) -> Tuple[bool, Optional[str]]:
+        """
+        查询缓存
+
+        Args:
+            name: 景点名称
+
+        Returns:
+            (是否命中, 图片URL), 命中的负缓存条目返回 (True, None)
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(name)
+            if entry is None:
+                entry = self._load(name)
+                if entry is not None:
+                    self._memory[name] = entry
+                    self._evict_memory()
+
+            if entry is not None and now - entry[0] > self._ttl_for(entry[1]):
+                self._delete(name)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            self._memory.move_to_end(name)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, name: str, url: Optional[str]):
+        """
+        写入缓存
+
+        Args:
+            name: 景点名称
+            url: 图片URL, None表示未找到图片
+        """
+        now = time.time()
+
+        with self._lock:
+            self._memory[name] = (now, url)
+            self._memory.move_to_end(name)
+            self._evict_memory()
+
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO photo_cache (name, url, created_at) VALUES (?, ?, ?)",
+                        (name, url, now)
+                    )
+                    self._db.execute(
+                        "DELETE FROM photo_cache WHERE name NOT IN ("
+                        "SELECT name FROM photo_cache ORDER BY created_at DESC LIMIT ?)",
+                        (self.max_entries,)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️  写入图片缓存失败: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory),
+            "persistent": self._db is not None,
+        }
+
+    def _ttl_for(self, url: Optional[str]) -> float:
+        return self.ttl if url else self.negative_ttl
+
+    def _evict_memory(self):
+        """超出容量时淘汰最久未使用的内存条目"""
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, name: str) -> Optional[Tuple[float, Optional[str]]]:
+        """从SQLite读取条目"""
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT created_at, url FROM photo_cache WHERE name = ?", (name,)
+            ).fetchone()
+            return (row[0], row[1]) if row is not None else None
+        except sqlite3.Error as e:
+            print(f"⚠️  读取图片缓存失败: {str(e)}")
+            return None
+
+    def _delete(self, name: str):
+        """删除条目"""
+        self._memory.pop(name, None)
+        if self._db is None:
+            return
+        try:
+            self._db.execute("DELETE FROM photo_cache WHERE name = ?", (name,))
+            self._db.commit()
+        except sqlite3.Error:
+            pass
+
+
+# 全局缓存实例
+_photo_cache = None
+
+
+def get_photo_cache() -> Optional[PhotoCache]:
+    """获取景点图片缓存实例(单例模式),未启用时返回None"""
+    global _photo_cache
+
+    settings = get_settings()
+    if not settings.photo_cache_enabled:
+        return None
+
+    if _photo_cache is None:
+        _photo_cache = PhotoCache(
+            path=settings.photo_cache_path,
+            ttl=settings.photo_cache_ttl,
+            negative_ttl=settings.photo_cache_negative_ttl,
+            max_entries=settings.photo_cache_max_entries
+        )
+
+    return _photo_cache
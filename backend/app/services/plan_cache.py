@@ -0,0 +1,311 @@
+"""旅行计划缓存 - 相同需求直接复用已生成的计划"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple
+from ..config import get_settings
+from ..models.schemas import TripRequest, TripPlan
+
+
+# 访问时间批量写回: 累计条数或距上次写回的时间(秒)达到阈值时写回
+TOUCH_BATCH_SIZE = 50
+TOUCH_FLUSH_INTERVAL = 60.0
+
+
+# 月份 -> 季节
+_SEASONS = {
+    12: "winter", 1: "winter", 2: "winter",
+    3: "spring", 4: "spring", 5: "spring",
+    6: "summer", 7: "summer", 8: "summer",
+    9: "autumn", 10: "autumn", 11: "autumn",
+}
+
+
+def make_plan_key(request: TripRequest) -> str:
+    """
+    生成请求的规范化缓存键
+
+    偏好排序去重、额外要求去除首尾空白,具体日期只保留天数和所在季节,
+    使"北京 3天 历史文化 经济型酒店"这类常见需求在不同日期也能命中同一条缓存。
+
+    Args:
+        request: 旅行请求
+
+    Returns:
+        缓存键(JSON字符串)
+    """
+    try:
+        season = _SEASONS[datetime.strptime(request.start_date, "%Y-%m-%d").month]
+    except ValueError:
+        season = "unknown"
+
+    canonical = {
+        "city": request.city.strip(),
+        "days": request.travel_days,
+        "season": season,
+        "transportation": request.transportation.strip(),
+        "accommodation": request.accommodation.strip(),
+        "preferences": sorted({p.strip() for p in request.preferences if p.strip()}),
+        "free_text": (request.free_text_input or "").strip(),
+    }
+    return json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+
+
+def rebase_plan(plan: TripPlan, request: TripRequest) -> TripPlan:
+    """
+    将缓存的计划平移到请求的开始日期
+
+    天气信息与具体日期绑定,日期发生平移时不再沿用。
+
+    Args:
+        plan: 缓存的旅行计划
+        request: 当前请求
+
+    Returns:
+        日期平移后的新计划
+    """
+    rebased = plan.model_copy(deep=True)
+    try:
+        offset = (
+            datetime.strptime(request.start_date, "%Y-%m-%d")
+            - datetime.strptime(plan.start_date, "%Y-%m-%d")
+        )
+    except ValueError:
+        return rebased
+
+    if offset == timedelta(0):
+        return rebased
+
+    def shift(value: str) -> str:
+        try:
+            return (datetime.strptime(value, "%Y-%m-%d") + offset).strftime("%Y-%m-%d")
+        except ValueError:
+            return value
+
+    rebased.start_date = request.start_date
+    rebased.end_date = request.end_date
+    for day in rebased.days:
+        day.date = shift(day.date)
+    rebased.weather_info = []
+    return rebased
+
+
+class PlanCache:
+    """
+    旅行计划缓存
+
+    内存中维护容量有限的LRU,同时写入SQLite持久化,服务重启后仍可命中。
+    条目超过TTL即视为过期。SQLite读写都在线程中进行,不阻塞事件循环。
+    """
+
+    def __init__(self, path: Optional[str], ttl: float, max_entries: int):
+        """
+        初始化
+
+        Args:
+            path: SQLite文件路径,为空时只使用内存缓存
+            ttl: 过期时间(秒)
+            max_entries: 内存与磁盘中保留的最大条目数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[float, TripPlan]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # 命中时只记录访问时间,批量写回磁盘(键 -> 最近访问时间)
+        self._touched: Dict[str, float] = {}
+        self._last_flush = time.time()
+
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS plan_cache ("
+                    "key TEXT PRIMARY KEY, plan TEXT NOT NULL, "
+                    "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  计划缓存数据库不可用,仅使用内存缓存: {str(e)}")
+                self._db = None
+
+    async def get(self, request: TripRequest) -> Optional[TripPlan]:
+        """
+        查询缓存
+
+        内存未命中时在线程中读取SQLite;命中时只在内存中记录访问时间,批量写回磁盘。
+
+        Args:
+            request: 旅行请求
+
+        Returns:
+            已平移到请求日期的计划,未命中时返回None
+        """
+        key = make_plan_key(request)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load, key)
+            if entry is not None:
+                with self._lock:
+                    self._memory[key] = entry
+                    self._evict_memory()
+
+        if entry is not None and now - entry[0] > self.ttl:
+            with self._lock:
+                self._memory.pop(key, None)
+                self._touched.pop(key, None)
+            if self._db is not None:
+                await asyncio.to_thread(self._delete, key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+            self._touched[key] = now
+            self.hits += 1
+            flush = self._db is not None and (
+                len(self._touched) >= TOUCH_BATCH_SIZE or now - self._last_flush >= TOUCH_FLUSH_INTERVAL
+            )
+        if flush:
+            await asyncio.to_thread(self._flush_touches)
+
+        return rebase_plan(entry[1], request)
+
+    async def set(self, request: TripRequest, plan: TripPlan):
+        """
+        写入缓存(SQLite写入在线程中进行)
+
+        Args:
+            request: 旅行请求
+            plan: 生成的旅行计划
+        """
+        key = make_plan_key(request)
+        now = time.time()
+
+        with self._lock:
+            self._memory[key] = (now, plan)
+            self._memory.move_to_end(key)
+            self._evict_memory()
+
+        if self._db is not None:
+            await asyncio.to_thread(self._write, key, plan.model_dump_json(), now)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory),
+            "persistent": self._db is not None,
+        }
+
+    def _evict_memory(self):
+        """超出容量时淘汰最久未使用的内存条目"""
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _write(self, key: str, plan_json: str, now: float):
+        """写入SQLite并按最近访问时间和过期时间清理(在线程中执行)"""
+        self._flush_touches()
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plan_cache (key, plan, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, plan_json, now, now)
+                )
+                # 磁盘按最近访问时间淘汰
+                self._db.execute(
+                    "DELETE FROM plan_cache WHERE key NOT IN ("
+                    "SELECT key FROM plan_cache ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+                self._db.execute("DELETE FROM plan_cache WHERE created_at < ?", (now - self.ttl,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  写入计划缓存失败: {str(e)}")
+
+    def _load(self, key: str) -> Optional[Tuple[float, TripPlan]]:
+        """从SQLite读取条目(在线程中执行)"""
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT created_at, plan FROM plan_cache WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            return row[0], TripPlan.model_validate_json(row[1])
+        except Exception as e:
+            print(f"⚠️  读取计划缓存失败: {str(e)}")
+            return None
+
+    def _flush_touches(self):
+        """将批量记录的访问时间写回SQLite(一次提交)"""
+        with self._lock:
+            touched = list(self._touched.items())
+            self._touched.clear()
+            self._last_flush = time.time()
+        if not touched or self._db is None:
+            return
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "UPDATE plan_cache SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, key) for key, accessed_at in touched]
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _delete(self, key: str):
+        """删除SQLite中的条目(在线程中执行)"""
+        with self._db_lock:
+            try:
+                self._db.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+
+# 全局缓存实例
+_plan_cache = None
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """获取旅行计划缓存实例(单例模式),未启用时返回None"""
+    global _plan_cache
+
+    settings = get_settings()
+    if not settings.plan_cache_enabled:
+        return None
+
+    if _plan_cache is None:
+        _plan_cache = PlanCache(
+            path=settings.plan_cache_path,
+            ttl=settings.plan_cache_ttl,
+            max_entries=settings.plan_cache_max_entries
+        )
+
+    return _plan_cache
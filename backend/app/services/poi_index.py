@@ -0,0 +1,308 @@
+"""POI空间索引 - 按城市索引后端见过的所有POI,支持最近邻和半径查询,无需再调用高德
+
+每个城市一张均匀网格(默认边长约1公里),POI按坐标落入网格单元。
+最近邻查询从查询点所在单元向外逐圈扩展,找到k个结果且下一圈不可能更近时停止;
+半径查询只扫描与圆相交的单元。
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from ..config import get_settings
+from ..models.schemas import Location
+from .tool_projection import PoiRecord, to_poi_record
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+Cell = Tuple[int, int]
+
+
+def normalize_city(city: str) -> str:
+    """城市名归一化: "北京市" 与 "北京" 视为同一城市"""
+    city = (city or "").strip()
+    if len(city) > 2 and city.endswith("市"):
+        city = city[:-1]
+    return city
+
+
+def _haversine_km(lng1: float, lat1: float, lng2: float, lat2: float) -> float:
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class _IndexedPoi:
+    """索引中的POI: 精简记录 + 完整的高德类型(如 "住宿服务;宾馆酒店;经济型连锁酒店")"""
+
+    __slots__ = ("record", "full_type", "city", "cell")
+
+    def __init__(self, record: PoiRecord, full_type: str, city: str, cell: Cell):
+        self.record = record
+        self.full_type = full_type
+        self.city = city
+        self.cell = cell
+
+    def matches(self, poi_types: Optional[Set[str]]) -> bool:
+        """类型过滤: 任一类型词出现在完整类型中即匹配"""
+        return not poi_types or any(poi_type in self.full_type for poi_type in poi_types)
+
+
+class _CityGrid:
+    """单个城市的网格"""
+
+    def __init__(self, cell_km: float, ref_lat: float):
+        self.cell_km = cell_km
+        self.lat_step = cell_km / KM_PER_DEGREE
+        # 经度方向的单元宽度按城市参考纬度换算,城市范围内近似为等距网格
+        self.lng_step = cell_km / (KM_PER_DEGREE * max(math.cos(math.radians(ref_lat)), 0.01))
+        self.cells: Dict[Cell, Dict[str, _IndexedPoi]] = {}
+        self.min_cell: Optional[Cell] = None
+        self.max_cell: Optional[Cell] = None
+
+    def cell_of(self, lng: float, lat: float) -> Cell:
+        return int(math.floor(lng / self.lng_step)), int(math.floor(lat / self.lat_step))
+
+    def add(self, key: str, poi: _IndexedPoi):
+        self.cells.setdefault(poi.cell, {})[key] = poi
+        x, y = poi.cell
+        if self.min_cell is None:
+            self.min_cell = self.max_cell = poi.cell
+        else:
+            self.min_cell = (min(self.min_cell[0], x), min(self.min_cell[1], y))
+            self.max_cell = (max(self.max_cell[0], x), max(self.max_cell[1], y))
+
+    def remove(self, key: str, cell: Cell):
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.cells[cell]
+
+    def ring(self, center: Cell, radius: int) -> Iterable[Dict[str, _IndexedPoi]]:
+        """与中心单元切比雪夫距离恰为radius的单元中的POI"""
+        cx, cy = center
+        if radius == 0:
+            bucket = self.cells.get(center)
+            if bucket:
+                yield bucket
+            return
+        for dx in range(-radius, radius + 1):
+            for dy in (-radius, radius):
+                bucket = self.cells.get((cx + dx, cy + dy))
+                if bucket:
+                    yield bucket
+        for dy in range(-radius + 1, radius):
+            for dx in (-radius, radius):
+                bucket = self.cells.get((cx + dx, cy + dy))
+                if bucket:
+                    yield bucket
+
+    def max_ring(self, center: Cell) -> int:
+        """覆盖所有非空单元所需的最大圈数"""
+        if self.min_cell is None:
+            return -1
+        cx, cy = center
+        return max(
+            abs(cx - self.min_cell[0]), abs(cx - self.max_cell[0]),
+            abs(cy - self.min_cell[1]), abs(cy - self.max_cell[1])
+        )
+
+
+class PoiSpatialIndex:
+    """
+    POI空间索引
+
+    - 按 (城市, POI id) 去重,同一POI再次出现时更新记录
+    - 超出容量时淘汰最早加入的POI
+    - 线程安全(写入来自工具调用,查询来自规划和API)
+    """
+
+    def __init__(self, cell_km: float = 1.0, max_entries: int = 50000):
+        """
+        初始化
+
+        Args:
+            cell_km: 网格单元边长(公里)
+            max_entries: 最多索引的POI数
+        """
+        self.cell_km = cell_km
+        self.max_entries = max_entries
+        self.queries = 0
+        self._cities: Dict[str, _CityGrid] = {}
+        self._entries: "OrderedDict[Tuple[str, str], _IndexedPoi]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_pois(self, city: str, pois: List[Dict[str, Any]]) -> int:
+        """
+        将高德POI加入索引
+
+        Args:
+            city: 搜索时指定的城市(POI自带cityname时优先使用)
+            pois: 高德POI字典列表
+
+        Returns:
+            加入或更新的POI数
+        """
+        added = 0
+        with self._lock:
+            for poi in pois:
+                record = to_poi_record(poi)
+                if record is None or record.lng is None or record.lat is None:
+                    continue
+                poi_city = normalize_city(poi.get("cityname") if isinstance(poi.get("cityname"), str) else city)
+                if not poi_city:
+                    continue
+                full_type = poi.get("type") if isinstance(poi.get("type"), str) else record.type
+                self._add(poi_city, record, full_type)
+                added += 1
+        return added
+
+    def nearest(
+        self,
+        city: str,
+        location: Location,
+        k: int = 5,
+        poi_types: Optional[Set[str]] = None,
+        max_km: Optional[float] = None
+    ) -> List[Tuple[PoiRecord, float]]:
+        """
+        最近邻查询
+
+        Args:
+            city: 城市
+            location: 查询点
+            k: 返回数量
+            poi_types: 类型过滤(如 {"住宿服务"} 或 {"经济型连锁酒店"}),为空时不过滤
+            max_km: 最大距离(公里)
+
+        Returns:
+            按距离升序的 (POI, 距离公里) 列表
+        """
+        with self._lock:
+            self.queries += 1
+            grid = self._cities.get(normalize_city(city))
+            if grid is None or k <= 0:
+                return []
+
+            center = grid.cell_of(location.longitude, location.latitude)
+            last_ring = grid.max_ring(center)
+            if max_km is not None:
+                last_ring = min(last_ring, int(math.ceil(max_km / grid.cell_km)) + 1)
+
+            found: List[Tuple[float, PoiRecord]] = []
+            for radius in range(last_ring + 1):
+                for bucket in grid.ring(center, radius):
+                    for poi in bucket.values():
+                        if not poi.matches(poi_types):
+                            continue
+                        distance = _haversine_km(location.longitude, location.latitude, poi.record.lng, poi.record.lat)
+                        if max_km is None or distance <= max_km:
+                            found.append((distance, poi.record))
+                # 第radius圈之外的单元到查询点的距离至少为 radius * cell_km
+                if len(found) >= k:
+                    found.sort(key=lambda item: item[0])
+                    if found[k - 1][0] <= radius * grid.cell_km:
+                        break
+
+            found.sort(key=lambda item: item[0])
+            return [(record, distance) for distance, record in found[:k]]
+
+    def within(
+        self,
+        city: str,
+        location: Location,
+        radius_km: float,
+        poi_types: Optional[Set[str]] = None,
+        limit: int = 0
+    ) -> List[Tuple[PoiRecord, float]]:
+        """
+        半径查询
+
+        Args:
+            city: 城市
+            location: 中心点
+            radius_km: 半径(公里)
+            poi_types: 类型过滤,为空时不过滤
+            limit: 最多返回数量, 0表示不限制
+
+        Returns:
+            按距离升序的 (POI, 距离公里) 列表
+        """
+        with self._lock:
+            self.queries += 1
+            grid = self._cities.get(normalize_city(city))
+            if grid is None:
+                return []
+
+            cx, cy = grid.cell_of(location.longitude, location.latitude)
+            span = int(math.ceil(radius_km / grid.cell_km))
+            found: List[Tuple[float, PoiRecord]] = []
+            for x in range(cx - span, cx + span + 1):
+                for y in range(cy - span, cy + span + 1):
+                    bucket = grid.cells.get((x, y))
+                    if not bucket:
+                        continue
+                    for poi in bucket.values():
+                        if not poi.matches(poi_types):
+                            continue
+                        distance = _haversine_km(location.longitude, location.latitude, poi.record.lng, poi.record.lat)
+                        if distance <= radius_km:
+                            found.append((distance, poi.record))
+
+        found.sort(key=lambda item: item[0])
+        if limit > 0:
+            found = found[:limit]
+        return [(record, distance) for distance, record in found]
+
+    def stats(self) -> Dict[str, Any]:
+        """索引状态"""
+        with self._lock:
+            return {
+                "pois": len(self._entries),
+                "cities": len(self._cities),
+                "cells": sum(len(grid.cells) for grid in self._cities.values()),
+                "queries": self.queries,
+            }
+
+    def _add(self, city: str, record: PoiRecord, full_type: str):
+        grid = self._cities.get(city)
+        if grid is None:
+            grid = self._cities[city] = _CityGrid(self.cell_km, record.lat)
+
+        poi_id = record.id or f"{record.name}|{record.address}"
+        key = (city, poi_id)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            grid.remove(poi_id, previous.cell)
+
+        indexed = _IndexedPoi(record, full_type, city, grid.cell_of(record.lng, record.lat))
+        grid.add(poi_id, indexed)
+        self._entries[key] = indexed
+
+        while len(self._entries) > self.max_entries:
+            (old_city, old_id), old = self._entries.popitem(last=False)
+            self._cities[old_city].remove(old_id, old.cell)
+
+
+# 全局索引实例
+_poi_index = None
+
+
+def get_poi_index() -> Optional[PoiSpatialIndex]:
+    """获取POI空间索引实例(单例模式),未启用时返回None"""
+    global _poi_index
+
+    settings = get_settings()
+    if not settings.poi_index_enabled:
+        return None
+
+    if _poi_index is None:
+        _poi_index = PoiSpatialIndex(
+            cell_km=settings.poi_index_cell_km,
+            max_entries=settings.poi_index_max_entries
+        )
+
+    return _poi_index
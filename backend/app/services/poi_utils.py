@@ -0,0 +1,79 @@
+"""POI结果处理工具 - 解析、合并、去重高德POI搜索结果"""
+
+import json
+from typing import Any, Callable, Dict, Hashable, List
+
+
+def extract_pois(result: str) -> List[Dict[str, Any]]:
+    """
+    从maps_text_search等工具的输出中提取POI列表
+
+    Args:
+        result: 工具返回的JSON字符串
+
+    Returns:
+        POI字典列表,无法解析时返回空列表
+    """
+    try:
+        data = json.loads(result)
+    except (TypeError, json.JSONDecodeError):
+        return []
+
+    if isinstance(data, dict):
+        pois = data.get("pois", [])
+    elif isinstance(data, list):
+        pois = data
+    else:
+        return []
+    return [poi for poi in pois if isinstance(poi, dict)]
+
+
+def poi_key(poi: Dict[str, Any]) -> str:
+    """POI去重键: 优先使用高德POI id,缺失时使用名称+地址"""
+    poi_id = poi.get("id")
+    if poi_id:
+        return str(poi_id)
+    return f"{poi.get('name', '')}|{poi.get('address', '')}"
+
+
+def merge_poi_results(
+    result_lists: List[List[Any]],
+    limit: int = 0,
+    key_func: Callable[[Any], Hashable] = poi_key
+) -> List[Any]:
+    """
+    合并多次搜索的POI结果,按POI id去重并排序
+
+    排序规则: 被越多关键词搜到的POI越靠前;次数相同时,在各次搜索中的最好名次越靠前越优先。
+
+    Args:
+        result_lists: 每个关键词搜索得到的POI列表(保持高德返回的顺序,多页结果按页码拼接成一个列表)
+        limit: 最多保留的POI数量, 0表示不限制
+        key_func: 去重键,默认按POI字典的id(城市快照中直接以行号合并)
+
+    Returns:
+        合并后的POI列表
+    """
+    merged: Dict[Hashable, Any] = {}
+    hit_counts: Dict[Hashable, int] = {}
+    best_ranks: Dict[Hashable, int] = {}
+
+    for pois in result_lists:
+        seen = set()
+        for rank, poi in enumerate(pois):
+            key = key_func(poi)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            if key not in merged:
+                merged[key] = poi
+                hit_counts[key] = 0
+                best_ranks[key] = rank
+            hit_counts[key] += 1
+            best_ranks[key] = min(best_ranks[key], rank)
+
+    ranked = sorted(merged, key=lambda k: (-hit_counts[k], best_ranks[k]))
+    if limit > 0:
+        ranked = ranked[:limit]
+    return [merged[key] for key in ranked]
@@ -0,0 +1,65 @@
+"""请求合并 - 相同的请求正在处理时,后续请求等待同一结果"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    """一次正在进行的调用及其等待者数量"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    单飞(single-flight)调用合并
+
+    同一个key的调用正在进行时,后续调用不再执行,而是等待第一次调用的结果。
+    某个等待者被取消(如客户端断开)时不影响其他等待者;
+    只有当所有等待者都已离开时,才取消底层调用。
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.coalesced = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入一次调用
+
+        Args:
+            key: 调用的唯一标识
+            func: 实际执行调用的无参协程函数
+
+        Returns:
+            调用结果
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                print(f"⚠️  所有等待者均已离开,取消调用: {key}")
+                # 先移除记录再取消: 任务清理期间到达的相同请求应发起新调用,而不是加入即将取消的调用
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def inflight(self) -> int:
+        """正在进行的调用数"""
+        return len(self._flights)
+
+    def _forget(self, key: str, flight: _Flight):
+        """调用结束后移除记录(避免误删同key的新调用)"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
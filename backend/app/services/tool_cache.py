@@ -0,0 +1,187 @@
+"""高德工具结果缓存 - 按工具设置TTL,并合并并发的相同调用"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from ..config import get_settings
+from .amap_parsers import is_success_result
+
+
+# 各工具的缓存时间(秒), None 表示永不过期, 未列出的工具不缓存
+TOOL_TTLS: Dict[str, Optional[float]] = {
+    "maps_weather": 30 * 60,
+    "maps_text_search": 24 * 3600,
+    "maps_around_search": 24 * 3600,
+    "maps_search_detail": 7 * 24 * 3600,
+    "maps_geo": None,
+    "maps_regeocode": None,
+    "maps_ip_location": 24 * 3600,
+    "maps_distance": 3600,
+    "maps_direction_walking": 3600,
+    "maps_direction_driving": 3600,
+    "maps_direction_bicycling": 3600,
+    "maps_direction_transit_integrated": 3600,
+    "maps_direction_walking_by_address": 3600,
+    "maps_direction_driving_by_address": 3600,
+    "maps_direction_transit_integrated_by_address": 3600,
+}
+
+_MISSING = object()
+
+
+def normalize_tool_name(tool_name: str) -> str:
+    """去掉工具名的 amap_ 前缀,统一为 maps_xxx 形式"""
+    if tool_name.startswith("amap_"):
+        return tool_name[len("amap_"):]
+    return tool_name
+
+
+def make_tool_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """
+    生成工具调用的缓存键
+
+    参数按键排序,值统一转为去除首尾空白的字符串(布尔值转为小写),
+    忽略值为None的参数,使 citylimit=True 与 citylimit="true" 命中同一条缓存。
+    """
+    canonical = {}
+    for key, value in arguments.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = str(value).lower()
+        canonical[key] = str(value).strip()
+    return f"{normalize_tool_name(tool_name)}:{json.dumps(canonical, ensure_ascii=False, sort_keys=True)}"
+
+
+class ToolResultCache:
+    """
+    工具结果缓存
+
+    - 结果按工具各自的TTL保存,超出容量时淘汰最久未使用的条目
+    - 相同的调用正在进行时,后续调用共享同一个任务而不是重复请求MCP服务器
+    - 调用失败的结果不缓存(包括以文本形式返回的高德错误,如配额超限、Key无效)
+    """
+
+    def __init__(self, max_entries: int, ttls: Optional[Dict[str, Optional[float]]] = None):
+        """
+        初始化
+
+        Args:
+            max_entries: 最大缓存条目数
+            ttls: 各工具的缓存时间(秒),默认使用TOOL_TTLS
+        """
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else TOOL_TTLS
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def call(
+        self,
+        tool_name: str,
+        arguments: Dict[str, Any],
+        invoke: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        带缓存地执行一次工具调用
+
+        Args:
+            tool_name: 工具名称
+            arguments: 工具参数
+            invoke: 实际执行调用的无参协程函数
+
+        Returns:
+            工具结果
+        """
+        name = normalize_tool_name(tool_name)
+        if name not in self.ttls:
+            return await invoke()
+
+        key = make_tool_key(name, arguments)
+        cached = self._get(key)
+        if cached is not _MISSING:
+            self.hits += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(invoke())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, name, t))
+
+        # shield: 某个调用方被取消时不影响共享同一任务的其他调用方
+        return await asyncio.shield(task)
+
+    def contains(self, tool_name: str, arguments: Dict[str, Any]) -> bool:
+        """是否已缓存该调用的未过期结果(不计入命中统计)"""
+        name = normalize_tool_name(tool_name)
+        if name not in self.ttls:
+            return False
+        return self._get(make_tool_key(name, arguments)) is not _MISSING
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中统计"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+
+    def _get(self, key: str) -> Any:
+        """读取未过期的条目,不存在时返回_MISSING"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at is not None and time.monotonic() > expires_at:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _on_done(self, key: str, name: str, task: asyncio.Task):
+        """调用结束: 移出进行中列表,成功且高德未返回错误时写入缓存"""
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if not is_success_result(task.result()):
+            print(f"⚠️  {name} 返回错误结果,不写入缓存")
+            return
+
+        ttl = self.ttls.get(name)
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (expires_at, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# 全局缓存实例
+_tool_cache = None
+
+
+def get_tool_cache() -> Optional[ToolResultCache]:
+    """获取工具结果缓存实例(单例模式),未启用时返回None"""
+    global _tool_cache
+
+    settings = get_settings()
+    if not settings.tool_cache_enabled:
+        return None
+
+    if _tool_cache is None:
+        _tool_cache = ToolResultCache(max_entries=settings.tool_cache_max_entries)
+
+    return _tool_cache
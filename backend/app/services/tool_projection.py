@@ -0,0 +1,209 @@
+"""工具输出精简 - 将高德MCP工具的原始JSON投影为紧凑记录,并渲染为表格供提示词使用"""
+
+import json
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field
+from .poi_utils import extract_pois
+from .tool_cache import normalize_tool_name
+
+
+class PoiRecord(BaseModel):
+    """POI精简记录"""
+    id: str = Field(default="", description="POI ID")
+    name: str = Field(..., description="名称")
+    address: str = Field(default="", description="地址")
+    lng: Optional[float] = Field(default=None, description="经度")
+    lat: Optional[float] = Field(default=None, description="纬度")
+    rating: str = Field(default="", description="评分")
+    cost: str = Field(default="", description="人均消费/价格")
+    type: str = Field(default="", description="类型")
+
+
+class WeatherRecord(BaseModel):
+    """单日天气精简记录"""
+    date: str = Field(..., description="日期")
+    day_weather: str = Field(default="", description="白天天气")
+    night_weather: str = Field(default="", description="夜间天气")
+    day_temp: str = Field(default="", description="白天温度")
+    night_temp: str = Field(default="", description="夜间温度")
+    wind_direction: str = Field(default="", description="风向")
+    wind_power: str = Field(default="", description="风力")
+
+
+# 返回POI列表的工具
+POI_TOOLS = ("maps_text_search", "maps_around_search")
+
+POI_TABLE_HEADER = "id|名称|地址|经度,纬度|评分|人均|类型"
+
+
+def _text(value: Any) -> str:
+    """高德字段取值: 空列表/None 视为空字符串"""
+    if value is None or isinstance(value, (list, dict)):
+        return ""
+    return str(value).strip()
+
+
+def _cell(value: str) -> str:
+    """表格单元格: 去掉分隔符和换行"""
+    return value.replace("|", "/").replace("\n", " ")
+
+
+def _parse_location(value: Any) -> tuple:
+    """解析 "lng,lat" 形式的坐标"""
+    try:
+        lng, lat = str(value).split(",")
+        return float(lng), float(lat)
+    except (ValueError, AttributeError):
+        return None, None
+
+
+def to_poi_record(poi: Dict[str, Any]) -> Optional[PoiRecord]:
+    """
+    将高德POI字典投影为PoiRecord
+
+    Args:
+        poi: 高德POI字典
+
+    Returns:
+        PoiRecord, 缺少名称时返回None
+    """
+    name = _text(poi.get("name"))
+    if not name:
+        return None
+
+    biz_ext = poi.get("biz_ext") if isinstance(poi.get("biz_ext"), dict) else {}
+    lng, lat = _parse_location(poi.get("location"))
+    # 类型只保留最末一级,如 "风景名胜;公园广场;公园" -> "公园"
+    poi_type = _text(poi.get("type")).split(";")[-1]
+
+    return PoiRecord(
+        id=_text(poi.get("id")),
+        name=name,
+        address=_text(poi.get("address")),
+        lng=lng,
+        lat=lat,
+        rating=_text(poi.get("rating")) or _text(biz_ext.get("rating")),
+        cost=_text(poi.get("cost")) or _text(biz_ext.get("cost")),
+        type=poi_type,
+    )
+
+
+def project_pois(pois: List[Dict[str, Any]]) -> List[PoiRecord]:
+    """批量投影POI,跳过无效项"""
+    records = []
+    for poi in pois:
+        record = to_poi_record(poi)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def project_weather(result: str) -> List[WeatherRecord]:
+    """
+    解析maps_weather的输出
+
+    兼容 {"forecasts": [{...每日...}]} 与高德Web服务的 {"forecasts": [{"casts": [...]}]} 两种结构
+
+    Args:
+        result: 工具返回的JSON字符串
+
+    Returns:
+        每日天气记录列表,无法解析时返回空列表
+    """
+    try:
+        data = json.loads(result)
+    except (TypeError, json.JSONDecodeError):
+        return []
+    if not isinstance(data, dict):
+        return []
+
+    forecasts = data.get("forecasts") or []
+    if forecasts and isinstance(forecasts[0], dict) and "casts" in forecasts[0]:
+        forecasts = forecasts[0].get("casts") or []
+
+    records = []
+    for cast in forecasts:
+        if not isinstance(cast, dict) or not cast.get("date"):
+            continue
+        records.append(WeatherRecord(
+            date=_text(cast.get("date")),
+            day_weather=_text(cast.get("dayweather")),
+            night_weather=_text(cast.get("nightweather")),
+            day_temp=_text(cast.get("daytemp")),
+            night_temp=_text(cast.get("nighttemp")),
+            wind_direction=_text(cast.get("daywind")),
+            wind_power=_text(cast.get("daypower")),
+        ))
+    return records
+
+
+def render_poi_table(records: List[PoiRecord]) -> str:
+    """将POI记录渲染为紧凑的竖线分隔表格"""
+    lines = [POI_TABLE_HEADER]
+    for r in records:
+        location = f"{r.lng:.6f},{r.lat:.6f}" if r.lng is not None and r.lat is not None else ""
+        cells = [r.id, r.name, r.address, location, r.rating, r.cost, r.type]
+        lines.append("|".join(_cell(c) for c in cells))
+    return "\n".join(lines)
+
+
+def parse_poi_table(text: str) -> List[PoiRecord]:
+    """
+    解析render_poi_table生成的表格
+
+    Args:
+        text: 表格文本
+
+    Returns:
+        POI记录列表,文本不是POI表格时返回空列表
+    """
+    lines = text.strip().splitlines() if text else []
+    if not lines or lines[0].strip() != POI_TABLE_HEADER:
+        return []
+
+    records = []
+    for line in lines[1:]:
+        cells = line.split("|")
+        if len(cells) != 7 or not cells[1]:
+            continue
+        lng, lat = _parse_location(cells[3])
+        records.append(PoiRecord(
+            id=cells[0], name=cells[1], address=cells[2], lng=lng, lat=lat,
+            rating=cells[4], cost=cells[5], type=cells[6]
+        ))
+    return records
+
+
+def render_weather_table(records: List[WeatherRecord]) -> str:
+    """将天气记录渲染为紧凑的竖线分隔表格"""
+    lines = ["日期|白天|夜间|白天温度|夜间温度|风向|风力"]
+    for r in records:
+        cells = [r.date, r.day_weather, r.night_weather, r.day_temp, r.night_temp, r.wind_direction, r.wind_power]
+        lines.append("|".join(_cell(c) for c in cells))
+    return "\n".join(lines)
+
+
+def project_tool_output(tool_name: str, result: str) -> str:
+    """
+    将工具原始输出转换为供LLM阅读的紧凑表格
+
+    无法识别的工具或无法解析的输出原样返回。
+
+    Args:
+        tool_name: 工具名称(可带 amap_ 前缀)
+        result: 工具原始输出
+
+    Returns:
+        紧凑文本
+    """
+    name = normalize_tool_name(tool_name)
+
+    if name in POI_TOOLS:
+        records = project_pois(extract_pois(result))
+        return render_poi_table(records) if records else result
+
+    if name == "maps_weather":
+        records = project_weather(result)
+        return render_weather_table(records) if records else result
+
+    return result
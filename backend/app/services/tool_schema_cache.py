@@ -0,0 +1,181 @@
+"""MCP工具定义缓存 - 将MCP服务器发现的工具定义持久化到磁盘,启动时无需等待服务器即可创建LangChain工具
+
+首次启动MCP服务器(uvx 解析安装 amap-mcp-server)可能需要数秒。
+缓存命中时先用磁盘上的工具定义创建工具,调用时才转发给真实的MCP会话;
+后台连接服务器后再用最新的工具定义刷新缓存。
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from langchain_core.tools import BaseTool, StructuredTool
+from ..config import get_settings
+
+
+# 缓存格式版本,字段变化时递增使旧缓存失效
+SCHEMA_CACHE_VERSION = 1
+
+ToolCaller = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+def server_fingerprint(connection: Dict[str, Any]) -> str:
+    """
+    MCP服务器标识: 启动命令和参数的摘要(不包含环境变量,避免API Key写入缓存文件)
+
+    Args:
+        connection: MCP服务器连接配置
+
+    Returns:
+        十六进制摘要
+    """
+    identity = json.dumps(
+        {"command": connection.get("command"), "args": connection.get("args"), "transport": connection.get("transport")},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+class ToolSchemaCache:
+    """
+    MCP工具定义缓存
+
+    文件内容为 {version, fingerprint, saved_at, tools: [{name, description, args_schema, response_format}]},
+    服务器配置变化(fingerprint不同)或格式版本不同时视为未命中。
+    """
+
+    def __init__(self, path: str):
+        """
+        初始化
+
+        Args:
+            path: 缓存文件路径
+        """
+        self.path = path
+
+    def load(self, fingerprint: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        读取工具定义
+
+        Args:
+            fingerprint: MCP服务器标识
+
+        Returns:
+            工具定义列表, 未命中时返回None
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  MCP工具定义缓存读取失败: {str(e)}")
+            return None
+
+        if data.get("version") != SCHEMA_CACHE_VERSION or data.get("fingerprint") != fingerprint:
+            return None
+        tools = data.get("tools")
+        if not isinstance(tools, list) or not tools:
+            return None
+        return tools
+
+    def save(self, fingerprint: str, tools: List[BaseTool]) -> bool:
+        """
+        写入工具定义(内容未变化时不重写文件)
+
+        Args:
+            fingerprint: MCP服务器标识
+            tools: MCP适配器创建的LangChain工具
+
+        Returns:
+            是否写入了文件
+        """
+        schemas = [_describe(tool) for tool in tools]
+        schemas = [schema for schema in schemas if schema is not None]
+        if not schemas or schemas == self.load(fingerprint):
+            return False
+
+        data = {
+            "version": SCHEMA_CACHE_VERSION,
+            "fingerprint": fingerprint,
+            "saved_at": time.time(),
+            "tools": schemas,
+        }
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 先写临时文件再替换,其他进程不会读到写了一半的文件
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            return True
+        except Exception as e:
+            print(f"⚠️  MCP工具定义缓存写入失败: {str(e)}")
+            return False
+
+
+def _describe(tool: BaseTool) -> Optional[Dict[str, Any]]:
+    """提取工具定义,参数结构不是JSON Schema字典时返回None"""
+    args_schema = tool.args_schema
+    if not isinstance(args_schema, dict):
+        args_schema = getattr(args_schema, "model_json_schema", lambda: None)()
+    if not isinstance(args_schema, dict):
+        return None
+    return {
+        "name": tool.name,
+        "description": tool.description or "",
+        "args_schema": args_schema,
+        "response_format": getattr(tool, "response_format", "content"),
+    }
+
+
+def build_cached_tools(schemas: List[Dict[str, Any]], caller: ToolCaller) -> List[BaseTool]:
+    """
+    用缓存的工具定义创建LangChain工具
+
+    Args:
+        schemas: ToolSchemaCache.load 返回的工具定义
+        caller: 实际调用工具的协程函数 (工具名, 参数) -> MCP适配器工具的原始返回值
+
+    Returns:
+        LangChain工具列表
+    """
+    return [
+        StructuredTool(
+            name=schema["name"],
+            description=schema.get("description", ""),
+            args_schema=schema["args_schema"],
+            coroutine=_forwarder(schema["name"], caller),
+            response_format=schema.get("response_format", "content"),
+        )
+        for schema in schemas
+    ]
+
+
+def _forwarder(tool_name: str, caller: ToolCaller):
+    async def forwarding_coroutine(**arguments):
+        return await caller(tool_name, arguments)
+
+    return forwarding_coroutine
+
+
+# 全局缓存实例
+_tool_schema_cache = None
+
+
+def get_tool_schema_cache() -> Optional[ToolSchemaCache]:
+    """获取MCP工具定义缓存实例(单例模式),未配置路径时返回None"""
+    global _tool_schema_cache
+
+    settings = get_settings()
+    if not settings.mcp_schema_cache_path:
+        return None
+
+    if _tool_schema_cache is None:
+        _tool_schema_cache = ToolSchemaCache(settings.mcp_schema_cache_path)
+
+    return _tool_schema_cache
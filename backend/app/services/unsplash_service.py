@@ -1,61 +1,62 @@
 """Unsplash图片服务"""
 
-import requests
-from typing import List, Optional
+import asyncio
+import httpx
+from typing import Dict, List, Optional
 from ..config import get_settings
+from .photo_cache import get_photo_cache
+from .single_flight import SingleFlight
+
 
 class UnsplashService:
-    """Unsplash图片服务类"""
-    
+    """
+    Unsplash图片服务类
+
+    - 异步HTTP客户端,复用keep-alive连接,不再阻塞事件循环
+    - 景点图片URL经 PhotoCache 持久化缓存,未找到图片的结果同样缓存
+    - 同一景点的并发查询合并为一次
+    """
+
     def __init__(self):
         """初始化服务"""
         settings = get_settings()
         self.access_key = settings.unsplash_access_key
         self.base_url = "https://api.unsplash.com"
-    
-    def search_photos(self, query: str, per_page: int = 5) -> List[dict]:
+        self.timeout = settings.unsplash_timeout
+        self.concurrency = settings.unsplash_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._flights = SingleFlight()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency
+                )
+            )
+        return self._client
+
+    async def search_photos(self, query: str, per_page: int = 5) -> List[dict]:
         """
         搜索图片
-        
+
         Args:
             query: 搜索关键词
             per_page: 每页数量
-            
+
         Returns:
             图片列表
         """
         try:
-            url = f"{self.base_url}/search/photos"
-            params = {
-                "query": query,
-                "per_page": per_page,
-                "client_id": self.access_key
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            results = data.get("results", [])
-            
-            # 提取图片URL
-            photos = []
-            for photo in results:
-                photos.append({
-                    "id": photo.get("id"),
-                    "url": photo.get("urls", {}).get("regular"),
-                    "thumb": photo.get("urls", {}).get("thumb"),
-                    "description": photo.get("description") or photo.get("alt_description"),
-                    "photographer": photo.get("user", {}).get("name")
-                })
-            
-            return photos
-            
+            return await self._search(query, per_page)
         except Exception as e:
             print(f"❌ Unsplash搜索失败: {str(e)}")
             return []
-    
-    def get_photo_url(self, query: str) -> Optional[str]:
+
+    async def get_photo_url(self, query: str) -> Optional[str]:
         """
         获取单张图片URL
 
@@ -65,11 +66,101 @@ class UnsplashService:
         Returns:
             图片URL
         """
-        photos = self.search_photos(query, per_page=1)
+        photos = await self.search_photos(query, per_page=1)
         if photos:
             return photos[0].get("url")
         return None
 
+    async def get_attraction_photo(self, name: str) -> Optional[str]:
+        """
+        获取景点图片URL(带缓存)
+
+        先搜索 "<名称> China landmark",没有结果时再只用名称搜索。
+        两次都没有结果时缓存为"无图片";请求出错时不缓存,下次重试。
+
+        Args:
+            name: 景点名称
+
+        Returns:
+            图片URL, 未找到时返回None
+        """
+        photo_cache = get_photo_cache()
+        if photo_cache is not None:
+            found, url = photo_cache.get(name)
+            if found:
+                return url
+
+        return await self._flights.run(name, lambda: self._resolve_attraction_photo(name))
+
+    async def get_attraction_photos(self, names: List[str]) -> Dict[str, Optional[str]]:
+        """
+        批量获取景点图片URL
+
+        Args:
+            names: 景点名称列表(重复的名称只查询一次)
+
+        Returns:
+            景点名称 -> 图片URL(未找到时为None)
+        """
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+
+        async def resolve(name: str) -> Optional[str]:
+            async with semaphore:
+                return await self.get_attraction_photo(name)
+
+        unique_names = list(dict.fromkeys(names))
+        urls = await asyncio.gather(*(resolve(name) for name in unique_names))
+        return dict(zip(unique_names, urls))
+
+    async def close(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _resolve_attraction_photo(self, name: str) -> Optional[str]:
+        try:
+            photos = await self._search(f"{name} China landmark", per_page=1)
+            if not photos:
+                # 如果没找到,尝试只用景点名称搜索
+                photos = await self._search(name, per_page=1)
+        except Exception as e:
+            print(f"❌ Unsplash搜索失败: {str(e)}")
+            return None
+
+        url = photos[0].get("url") if photos else None
+        photo_cache = get_photo_cache()
+        if photo_cache is not None:
+            photo_cache.set(name, url)
+        return url
+
+    async def _search(self, query: str, per_page: int) -> List[dict]:
+        """搜索图片,请求失败时抛出异常"""
+        params = {
+            "query": query,
+            "per_page": per_page,
+            "client_id": self.access_key
+        }
+
+        response = await self._get_client().get("/search/photos", params=params)
+        response.raise_for_status()
+
+        data = response.json()
+        results = data.get("results", [])
+
+        # 提取图片URL
+        photos = []
+        for photo in results:
+            photos.append({
+                "id": photo.get("id"),
+                "url": photo.get("urls", {}).get("regular"),
+                "thumb": photo.get("urls", {}).get("thumb"),
+                "description": photo.get("description") or photo.get("alt_description"),
+                "photographer": photo.get("user", {}).get("name")
+            })
+
+        return photos
+
 
 # 全局服务实例
 _unsplash_service = None
@@ -78,9 +169,17 @@ _unsplash_service = None
 def get_unsplash_service() -> UnsplashService:
     """获取Unsplash服务实例(单例模式)"""
     global _unsplash_service
-    
+
     if _unsplash_service is None:
         _unsplash_service = UnsplashService()
-    
+
     return _unsplash_service
 
+
+async def close_unsplash_service():
+    """关闭Unsplash服务的连接池"""
+    global _unsplash_service
+
+    if _unsplash_service is not None:
+        await _unsplash_service.close()
+        _unsplash_service = None
@@ -0,0 +1,159 @@
+"""高德Web服务本地桩服务器
+
+返回固定的高德REST格式数据,用于在不访问高德、不消耗配额的情况下测试REST后端。
+
+用法(在 backend 目录下):
+    # 启动桩服务器,然后以 AMAP_BACKEND=rest AMAP_REST_BASE_URL=http://127.0.0.1:8765 启动后端
+    python scripts/amap_stub_server.py --port 8765
+
+    # 压测REST后端: 启动桩服务器并发调用 maps_text_search,统计单次调用耗时
+    python scripts/amap_stub_server.py --bench 500 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _poi(index: int, keywords: str) -> dict:
+    return {
+        "id": f"B000A{index:05d}",
+        "name": f"{keywords}{index}",
+        "type": "风景名胜;风景名胜;国家级景点",
+        "address": f"测试路{index}号",
+        "location": f"{116.30 + index * 0.01:.6f},{39.90 + (index % 5) * 0.01:.6f}",
+        "biz_ext": {"rating": "4.6", "cost": "60.00"},
+        "photos": [{"url": f"http://store.is.autonavi.com/showpic/{index}"}],
+    }
+
+
+def _casts() -> list:
+    return [
+        {
+            "date": f"2025-06-{day:02d}", "week": str(day % 7 + 1),
+            "dayweather": "晴", "nightweather": "多云", "daytemp": "30", "nighttemp": "20",
+            "daywind": "南", "nightwind": "南", "daypower": "1-3", "nightpower": "1-3",
+        }
+        for day in range(1, 5)
+    ]
+
+
+def stub_response(path: str, params: dict) -> dict:
+    """根据接口路径返回固定数据"""
+    ok = {"status": "1", "info": "OK", "infocode": "10000"}
+    keywords = params.get("keywords", "景点")
+
+    if path in ("/v3/place/text", "/v3/place/around"):
+        return {**ok, "count": "10", "pois": [_poi(i, keywords) for i in range(10)]}
+    if path == "/v3/place/detail":
+        return {**ok, "count": "1", "pois": [_poi(0, params.get("id", "POI"))]}
+    if path == "/v3/weather/weatherInfo":
+        return {**ok, "count": "1", "forecasts": [{"city": "北京市", "adcode": "110000", "casts": _casts()}]}
+    if path == "/v3/geocode/geo":
+        return {**ok, "count": "1", "geocodes": [
+            {"formatted_address": params.get("address", ""), "adcode": "110000", "location": "116.397428,39.90923"}
+        ]}
+    if path == "/v3/geocode/regeo":
+        return {**ok, "regeocode": {"formatted_address": "北京市东城区", "addressComponent": {"adcode": "110101"}}}
+    if path == "/v3/distance":
+        return {**ok, "results": [{"origin_id": "1", "dest_id": "1", "distance": "1200", "duration": "300"}]}
+    if path.startswith("/v3/direction/") or path.startswith("/v4/direction/"):
+        return {**ok, "route": {"origin": params.get("origin"), "destination": params.get("destination"),
+                                "paths": [{"distance": "1200", "duration": "900", "steps": []}]}}
+    return {"status": "0", "info": "INVALID_PATH", "infocode": "20000"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """支持keep-alive的桩接口处理器"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if not params.get("key"):
+            payload = {"status": "0", "info": "INVALID_USER_KEY", "infocode": "10001"}
+        else:
+            payload = stub_response(url.path, params)
+
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int) -> ThreadingHTTPServer:
+    """在后台线程启动桩服务器"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def bench(base_url: str, calls: int, concurrency: int) -> dict:
+    """并发调用REST后端的 maps_text_search 工具"""
+    from app.services.amap_rest import AmapRestClient, build_rest_tools
+
+    client = AmapRestClient(api_key="stub", base_url=base_url, max_connections=concurrency)
+    tool = next(t for t in build_rest_tools(client) if t.name == "maps_text_search")
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await tool.ainvoke({"keywords": f"景点{i}", "city": "北京", "citylimit": "true"})
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+
+    latencies.sort()
+    return {
+        "calls": calls,
+        "concurrency": concurrency,
+        "total_s": round(elapsed, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--bench", type=int, default=0, help="压测调用次数, 0表示只启动桩服务器")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    if args.bench:
+        print(json.dumps(asyncio.run(bench(base_url, args.bench, args.concurrency)), ensure_ascii=False))
+        server.shutdown()
+        return
+
+    print(f"高德桩服务器已启动: {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
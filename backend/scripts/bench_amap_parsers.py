@@ -0,0 +1,91 @@
+"""高德工具输出解析性能测试
+
+构造不同规模的POI搜索结果,测量 parse_pois 的耗时;
+并对比POI详情解析中旧的贪婪正则提取与新的单次解码。
+
+用法(在 backend 目录下):
+    python scripts/bench_amap_parsers.py
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.amap_parsers import decode_result, parse_pois, parse_weather  # noqa: E402
+
+REPEAT = 20
+
+
+def make_poi_payload(count: int) -> str:
+    pois = [
+        {
+            "id": f"B000A{i:06d}",
+            "name": f"景点{i}",
+            "type": "风景名胜;风景名胜;国家级景点",
+            "typecode": "110202",
+            "address": f"测试路{i}号",
+            "location": f"{116.3 + (i % 100) * 0.001:.6f},{39.9 + (i // 100) * 0.001:.6f}",
+            "tel": "010-12345678",
+            "biz_ext": {"rating": "4.6", "cost": "60.00"},
+            "photos": [{"title": [], "url": f"http://store.is.autonavi.com/showpic/{i}"}] * 3,
+            "business_area": [],
+            "indoor_data": {"cpid": [], "floor": [], "truefloor": []},
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"suggestion": {"keywords": [], "cities": []}, "count": str(count), "pois": pois},
+                      ensure_ascii=False)
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def legacy_detail(result: str):
+    """旧实现: 贪婪正则截取第一个 { 到最后一个 } 再解码"""
+    match = re.search(r'\{.*\}', result, re.DOTALL)
+    return json.loads(match.group()) if match else None
+
+
+def main():
+    print(f"{'POI数':>8}{'负载(KB)':>10}{'json.loads(ms)':>16}{'parse_pois(ms)':>16}{'单个POI(us)':>14}")
+    for count in (20, 200, 2000, 10000):
+        payload = make_poi_payload(count)
+        decode_ms = timed(json.loads, payload)
+        parse_ms = timed(parse_pois, payload)
+        assert len(parse_pois(payload)) == count
+        print(f"{count:>8}{len(payload.encode()) / 1024:>10.1f}{decode_ms:>16.3f}{parse_ms:>16.3f}"
+              f"{parse_ms / count * 1000:>14.2f}")
+
+    weather = json.dumps({"forecasts": [{"city": "北京市", "casts": [
+        {"date": f"2025-06-0{d}", "dayweather": "晴", "nightweather": "多云",
+         "daytemp": "30", "nighttemp": "20", "daywind": "南", "daypower": "1-3"}
+        for d in range(1, 5)
+    ]}]}, ensure_ascii=False)
+    print(f"\nparse_weather: {timed(parse_weather, weather) * 1000:.1f}us")
+
+    print(f"\n{'详情负载':>10}{'贪婪正则(ms)':>14}{'decode_result(ms)':>19}")
+    for count in (200, 2000):
+        # 带说明文字前后缀的输出,两种实现都需要先定位JSON
+        wrapped = "查询结果如下:\n" + make_poi_payload(count) + "\n以上为详情"
+        print(f"{count:>10}{timed(legacy_detail, wrapped):>14.3f}{timed(decode_result, wrapped):>19.3f}")
+
+    # 后缀中含有 } 时贪婪正则会截取到错误的结尾
+    wrapped = "查询结果如下:\n" + make_poi_payload(1) + "\n备注: {无}"
+    try:
+        legacy_detail(wrapped)
+        legacy_ok = "成功"
+    except json.JSONDecodeError:
+        legacy_ok = "解码失败"
+    print(f"\n后缀含大括号: 贪婪正则{legacy_ok}, decode_result {'成功' if decode_result(wrapped) else '失败'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""启动导入耗时测试
+
+在新的解释器中以 python -X importtime 导入应用模块,汇总总耗时和累计耗时最高的模块。
+用于跟踪冷启动时间(自动扩容的实例在导入完成前无法就绪)。
+
+用法(在 backend 目录下):
+    python scripts/bench_import_time.py
+    python scripts/bench_import_time.py --module app.api.main --top 30 --repeat 5
+    # 超过预算(毫秒)时以非零状态码退出,可用于CI
+    python scripts/bench_import_time.py --budget 800
+    # 输出JSON,便于保存历史结果对比
+    python scripts/bench_import_time.py --json > import_time.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str) -> Tuple[float, Dict[str, int]]:
+    """
+    导入一次模块
+
+    Returns:
+        (顶层模块的累计耗时毫秒, 模块名 -> 累计耗时微秒)
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        # 最后几行通常是导入错误
+        tail = "\n".join(completed.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"导入 {module} 失败:\n{tail}")
+
+    # 每行格式: "import time:   self [us] | cumulative | imported package"
+    cumulative: Dict[str, int] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative[parts[2].strip()] = int(parts[1].strip())
+
+    if module not in cumulative:
+        raise RuntimeError(f"importtime 输出中未找到 {module}")
+    return cumulative[module] / 1000, cumulative
+
+
+def top_packages(cumulative: Dict[str, int], top: int) -> List[Tuple[str, float]]:
+    """累计耗时最高的顶层包(如 langchain_core、numpy),避免同一个包的子模块重复计算"""
+    packages: Dict[str, int] = {}
+    for name, micros in cumulative.items():
+        root = name.split(".")[0]
+        packages[root] = max(packages.get(root, 0), micros)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return [(name, micros / 1000) for name, micros in ranked[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.api.main", help="要导入的模块")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数(取中位数)")
+    parser.add_argument("--top", type=int, default=20, help="显示累计耗时最高的包数")
+    parser.add_argument("--budget", type=float, default=0.0, help="导入耗时预算(毫秒), 0表示不检查")
+    parser.add_argument("--json", action="store_true", help="输出JSON")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(args.repeat, 1))]
+    totals = [total for total, _ in runs]
+    median_total = statistics.median(totals)
+    # 各包耗时取总耗时为中位数的那一次
+    _, cumulative = min(runs, key=lambda run: abs(run[0] - median_total))
+    packages = top_packages(cumulative, args.top)
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "python": sys.version.split()[0],
+            "runs_ms": [round(total, 1) for total in totals],
+            "median_ms": round(median_total, 1),
+            "top_packages_ms": {name: round(ms, 1) for name, ms in packages},
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"导入 {args.module}: 中位数 {median_total:.1f} ms "
+              f"(共{len(totals)}次: {', '.join(f'{total:.1f}' for total in totals)})")
+        print(f"\n累计耗时最高的 {len(packages)} 个包:")
+        for name, ms in packages:
+            print(f"  {ms:9.1f} ms  {name}")
+
+    if args.budget > 0 and median_total > args.budget:
+        print(f"\n❌ 超出预算: {median_total:.1f} ms > {args.budget:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""日志方案事件循环延迟对比
+
+分别在子进程中运行旧的同步 LoggerWriter 方案和新的队列日志方案,
+在持续打印大段文本(模拟完整LLM输出)的同时测量事件循环的调度延迟。
+
+两种方案都把单条消息截断到 MAX_MESSAGE_CHARS,差异只来自写入发生在哪个线程。
+控制台写入很快(本地文件/终端)时两者的循环延迟差别在测量噪声内;
+--console-delay-ms 模拟会阻塞的控制台(如日志采集端处理不过来、管道写满),
+这时旧方案的每次写入都阻塞事件循环,队列方案只阻塞后台线程。
+
+用法(在 backend 目录下):
+    python scripts/bench_logging.py
+    python scripts/bench_logging.py --console-delay-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from logging.handlers import TimedRotatingFileHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TICK = 0.005            # 探测任务的调度间隔(秒)
+PAYLOAD_CHARS = 20000   # 单次打印的字符数
+PRINTS = 1000           # 打印次数
+PRINT_INTERVAL = 0.001  # 两次打印之间的间隔(秒),日志在请求处理过程中陆续产生
+DRAIN = 0.5             # 打印结束后继续探测的时间(秒),包含后台线程写完剩余日志的阶段
+MAX_MESSAGE_CHARS = 2000  # 两种方案使用相同的截断长度,只比较写入方式
+
+
+class SlowStream:
+    """每次写入前等待一段时间的控制台(模拟写入被阻塞)"""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, message):
+        time.sleep(self.delay)
+        return self.stream.write(message)
+
+    def flush(self):
+        self.stream.flush()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+
+def setup_legacy(log_dir: str):
+    """旧方案: 每次写入都同步刷新控制台并写文件"""
+    logger = logging.getLogger("LegacyLogger")
+    logger.setLevel(logging.INFO)
+    handler = TimedRotatingFileHandler(
+        os.path.join(log_dir, "app.log"), when="midnight", interval=1, backupCount=7, encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logger.addHandler(handler)
+
+    class LoggerWriter:
+        def __init__(self, level, original_stream):
+            self.level = level
+            self.terminal = original_stream
+
+        def write(self, message):
+            if len(message) > MAX_MESSAGE_CHARS:
+                message = f"{message[:MAX_MESSAGE_CHARS]}...(省略{len(message) - MAX_MESSAGE_CHARS}字符)\n"
+            self.terminal.write(message)
+            self.terminal.flush()
+            if message and message.strip():
+                logger.log(self.level, message.strip())
+
+        def flush(self):
+            self.terminal.flush()
+
+    sys.stdout = LoggerWriter(logging.INFO, sys.stdout)
+
+
+def setup_queue(log_dir: str):
+    """新方案: 队列日志"""
+    from app.logging_setup import setup_logging
+    setup_logging(level="INFO", log_dir=log_dir, max_message_chars=MAX_MESSAGE_CHARS)
+
+
+async def measure_lag() -> dict:
+    """打印负载运行期间,探测任务每次被调度的延迟"""
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - start - TICK)
+
+    print_costs = []
+
+    async def workload():
+        payload = "行程规划结果: " + "x" * PAYLOAD_CHARS
+        for _ in range(PRINTS):
+            # print() 在事件循环线程上同步执行的时间即为阻塞时间
+            start = time.perf_counter()
+            print(payload)
+            print_costs.append(time.perf_counter() - start)
+            await asyncio.sleep(PRINT_INTERVAL)
+        await asyncio.sleep(DRAIN)
+        done.set()
+
+    start = time.perf_counter()
+    await asyncio.gather(probe(), workload())
+    elapsed = time.perf_counter() - start
+
+    lags.sort()
+    print_costs.sort()
+    return {
+        "workload_s": round(elapsed, 3),
+        "print_mean_us": round(statistics.mean(print_costs) * 1e6, 1),
+        "print_p99_us": round(print_costs[int(len(print_costs) * 0.99) - 1] * 1e6, 1),
+        "lag_mean_ms": round(statistics.mean(lags) * 1000, 3),
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1] * 1000, 3),
+        "lag_max_ms": round(lags[-1] * 1000, 3),
+    }
+
+
+def run_child(mode: str, output: str, console_delay_ms: float):
+    if console_delay_ms > 0:
+        sys.stdout = sys.__stdout__ = SlowStream(sys.__stdout__, console_delay_ms / 1000)
+    with tempfile.TemporaryDirectory() as log_dir:
+        if mode == "legacy":
+            setup_legacy(log_dir)
+        else:
+            setup_queue(log_dir)
+        result = asyncio.run(measure_lag())
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["legacy", "queue"])
+    parser.add_argument("--output")
+    parser.add_argument("--console-delay-ms", type=float, default=0.0, help="每次控制台写入的模拟阻塞时间(毫秒)")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_child(args.mode, args.output, args.console_delay_ms)
+        return
+
+    results = {}
+    for mode in ("legacy", "queue"):
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            output = f.name
+        # 控制台输出重定向到临时文件(真实的写入开销),只比较事件循环延迟
+        with tempfile.TemporaryFile() as console:
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--output", output,
+                 "--console-delay-ms", str(args.console_delay_ms)],
+                stdout=console, stderr=console, check=True
+            )
+        with open(output, encoding="utf-8") as f:
+            results[mode] = json.load(f)
+        os.unlink(output)
+
+    print(f"{'方案':<8}{'总耗时(s)':>10}{'print平均(us)':>14}{'printP99(us)':>14}"
+          f"{'循环延迟平均(ms)':>18}{'循环延迟P99(ms)':>18}{'循环延迟最大(ms)':>18}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['workload_s']:>10}{r['print_mean_us']:>14}{r['print_p99_us']:>14}"
+              f"{r['lag_mean_ms']:>18}{r['lag_p99_ms']:>18}{r['lag_max_ms']:>18}")
+
+
+if __name__ == "__main__":
+    main()
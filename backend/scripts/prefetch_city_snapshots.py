@@ -0,0 +1,106 @@
+"""预取城市离线快照
+
+通过现有的高德工具(call_tool,遵循 AMAP_BACKEND 配置)搜索各城市的景点和酒店关键词,
+按POI id增量合并进该城市的快照文件。服务启动时会内存映射这些快照。
+
+用法(在 backend 目录下):
+    # 预取配置中的全部城市(SNAPSHOT_CITIES)
+    python scripts/prefetch_city_snapshots.py
+
+    # 只刷新指定城市
+    python scripts/prefetch_city_snapshots.py --cities 北京,上海
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import get_settings  # noqa: E402
+from app.services.city_snapshot import KIND_ATTRACTION, KIND_HOTEL, CitySnapshotStore  # noqa: E402
+from app.services.amap_parsers import is_success_result  # noqa: E402
+from app.services.langchain_tools import call_tool, cleanup_mcp_client  # noqa: E402
+from app.services.poi_utils import extract_pois  # noqa: E402
+
+
+async def search_pages(city: str, keywords: str, pages: int, semaphore: asyncio.Semaphore):
+    """
+    搜索一个关键词的前pages页
+
+    Raises:
+        RuntimeError: 高德返回错误(配额超限、Key无效等以普通文本返回,不会抛出异常),
+                      该关键词保留上一版快照中的结果,不会被空结果覆盖
+    """
+    results = []
+    for page in range(1, pages + 1):
+        arguments = {"keywords": keywords, "city": city, "citylimit": "true"}
+        if page > 1:
+            arguments["page"] = str(page)
+        async with semaphore:
+            result = await call_tool("maps_text_search", arguments)
+        if not is_success_result(result):
+            raise RuntimeError(f"第{page}页返回错误: {str(result)[:200]}")
+        results.append(extract_pois(result))
+    return results
+
+
+async def prefetch_city(store: CitySnapshotStore, city: str, pages: int, semaphore: asyncio.Semaphore) -> str:
+    """预取单个城市并写入快照"""
+    settings = get_settings()
+    start = time.perf_counter()
+    builder = store.builder(city)
+
+    jobs = [(KIND_ATTRACTION, keywords, pages) for keywords in settings.get_snapshot_keywords(KIND_ATTRACTION)]
+    jobs += [(KIND_HOTEL, keywords, 1) for keywords in settings.get_snapshot_keywords(KIND_HOTEL)]
+    results = await asyncio.gather(
+        *(search_pages(city, keywords, job_pages, semaphore) for _, keywords, job_pages in jobs),
+        return_exceptions=True
+    )
+
+    added = failed = 0
+    for (kind, keywords, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            # 失败的关键词保留上一版快照中的结果
+            failed += 1
+            print(f"  ⚠️  {city}/{keywords} 搜索失败: {str(result)}")
+            continue
+        added += builder.add_search(kind, keywords, result)
+
+    builder.prune(settings.snapshot_max_age * 4)
+    meta = store.write(builder)
+    return (
+        f"{city}: {meta['rows']} 个POI(新增{added}), {len(jobs) - failed}/{len(jobs)} 个关键词, "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+
+
+async def main_async(cities, concurrency: int):
+    settings = get_settings()
+    store = CitySnapshotStore(settings.snapshot_dir, settings.snapshot_max_age)
+    semaphore = asyncio.Semaphore(concurrency)
+    pages = max(settings.attraction_search_pages, 1)
+    try:
+        for city in cities:
+            print(await prefetch_city(store, city, pages, semaphore))
+    finally:
+        await cleanup_mcp_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", help="逗号分隔的城市列表,默认使用 SNAPSHOT_CITIES")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的高德搜索数")
+    args = parser.parse_args()
+
+    cities = (
+        [city.strip() for city in args.cities.split(",") if city.strip()]
+        if args.cities else get_settings().get_snapshot_cities_list()
+    )
+    asyncio.run(main_async(cities, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
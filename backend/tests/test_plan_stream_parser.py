@@ -0,0 +1,67 @@
+"""行程规划流式输出解析测试"""
+
+import json
+
+from app.agents.plan_stream_parser import PlanStreamParser
+
+
+PLAN = {
+    "city": "北京",
+    "start_date": "2025-06-01",
+    "end_date": "2025-06-02",
+    "days": [
+        {
+            "date": f"2025-06-0{i + 1}",
+            "day_index": i,
+            "description": f"第{i + 1}天",
+            "transportation": "地铁",
+            "accommodation": "酒店",
+        }
+        for i in range(2)
+    ],
+    "weather_info": [{"date": "2025-06-01", "day_weather": "晴"}],
+    "overall_suggestions": "注意防晒",
+    "budget": {"total": 1000},
+}
+
+FENCED = "```json\n" + json.dumps(PLAN, ensure_ascii=False) + "\n```"
+PREAMBLE = "I will use {city} template.\n"
+
+
+def _feed_all(parser: PlanStreamParser, text: str, chunk_size: int):
+    days = []
+    for i in range(0, len(text), chunk_size):
+        days.extend(parser.feed(text[i:i + chunk_size]))
+    return days
+
+
+def _assert_full_plan(parser: PlanStreamParser, days):
+    assert parser.finished
+    assert [day.day_index for day in days] == [0, 1]
+    assert [day.day_index for day in parser.days] == [0, 1]
+    assert len(parser.weather_info) == 1
+    assert parser.fields["city"] == "北京"
+    assert parser.fields["budget"] == {"total": 1000}
+
+
+def test_plain_json():
+    parser = PlanStreamParser()
+    _assert_full_plan(parser, parser.feed(json.dumps(PLAN, ensure_ascii=False)))
+
+
+def test_braces_in_prose_before_fence():
+    parser = PlanStreamParser()
+    _assert_full_plan(parser, parser.feed(PREAMBLE + FENCED))
+
+
+def test_braces_in_prose_before_fence_streamed():
+    # 逐字符输入时说明文字中的括号先于代码块标记闭合
+    for chunk_size in (1, 3, 17):
+        parser = PlanStreamParser()
+        _assert_full_plan(parser, _feed_all(parser, PREAMBLE + FENCED, chunk_size))
+
+
+def test_braces_in_prose_without_fence():
+    parser = PlanStreamParser()
+    text = 'Using {"template": "x"} now: ' + json.dumps(PLAN, ensure_ascii=False)
+    _assert_full_plan(parser, _feed_all(parser, text, 5))
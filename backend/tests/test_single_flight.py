@@ -0,0 +1,59 @@
+"""请求合并测试"""
+
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "plan"
+
+        results = await asyncio.gather(*(flights.run("key", work) for _ in range(3)))
+        return results, calls, flights
+
+    results, calls, flights = asyncio.run(scenario())
+    assert results == ["plan"] * 3
+    assert calls == 1
+    assert flights.coalesced == 2
+    assert flights.inflight() == 0
+
+
+def test_call_arriving_while_flight_is_cancelling_starts_fresh_flight():
+    async def scenario():
+        flights = SingleFlight()
+        cancelling = asyncio.Event()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            if calls > 1:
+                return "fresh"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                # 模拟取消后的清理耗时(如关闭连接)
+                cancelling.set()
+                await asyncio.sleep(0.05)
+                raise
+
+        first = asyncio.ensure_future(flights.run("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await cancelling.wait()
+
+        second = await flights.run("key", work)
+        return second, calls, first
+
+    second, calls, first = asyncio.run(scenario())
+    assert first.cancelled()
+    assert second == "fresh"
+    assert calls == 2
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import type { TripFormData, TripPlanResponse } from '@/types'
+import type { TripFormData, TripPlanResponse, AttractionPhotosResponse } from '@/types'
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'
 
@@ -48,6 +48,22 @@ export async function generateTripPlan(formData: TripFormData): Promise<TripPlan
   }
 }
 
+// 单次批量获取景点图片的最大数量(与后端 PHOTO_BATCH_MAX 默认值一致)
+export const PHOTO_BATCH_MAX = 100
+
+/**
+ * 批量获取景点图片(单次最多 PHOTO_BATCH_MAX 个景点)
+ */
+export async function getAttractionPhotos(names: string[]): Promise<AttractionPhotosResponse> {
+  try {
+    const response = await apiClient.post<AttractionPhotosResponse>('/api/poi/photos', { names })
+    return response.data
+  } catch (error: any) {
+    console.error('获取景点图片失败:', error)
+    throw new Error(error.response?.data?.detail || error.message || '获取景点图片失败')
+  }
+}
+
 /**
  * 健康检查
  */
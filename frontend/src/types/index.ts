@@ -93,3 +93,9 @@ export interface TripPlanResponse {
   data?: TripPlan
 }
 
+
+export interface AttractionPhotosResponse {
+  success: boolean
+  message: string
+  data: Record<string, string | null>
+}